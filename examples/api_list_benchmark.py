@@ -0,0 +1,110 @@
+"""Benchmark the serialization of GET /v1/nodes.
+
+Usage: python api_list_benchmark.py [nodes] [limit] [fields]
+
+Fills a temporary sqlite database with the given number of nodes, then
+builds the response of GET /v1/nodes?limit=<limit>&fields=<fields> both
+through the wsme objects of the nodes, as the API used to, and through
+the dicts of NodeCollection.serialize. Checks that both documents are the
+same and reports the best time of each. fields is a comma separated list,
+all the fields by default.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from oslo_db.sqlalchemy import enginefacade
+import pecan
+from wsme.rest import json as wsme_json
+
+from xcat3.api.controllers.v1 import node as api_node
+from xcat3.api.controllers.v1 import types
+from xcat3.common import context
+from xcat3.conf import CONF
+from xcat3.db.sqlalchemy import api as db_api
+from xcat3.db.sqlalchemy import models
+from xcat3 import objects
+
+REPEAT = 5
+
+
+class FakeRequest(object):
+    public_url = 'http://localhost:3010'
+
+
+def create_nodes(count):
+    with db_api._session_for_write() as session:
+        for i in range(count):
+            node = models.Node()
+            node.update({
+                'name': 'node%d' % i, 'mgt': 'ipmi', 'arch': 'x86_64',
+                'type': 'baremetal', 'state': 'active', 'status': 'booted',
+                'control_info': {'bmc_address': '11.0.%d.%d' % (
+                    i // 256, i % 256), 'bmc_username': 'admin',
+                    'bmc_password': 'password'}})
+            session.add(node)
+
+
+def wsme_document(ctx, limit, fields):
+    nodes = objects.Node.list(ctx, limit, sort_key='id', sort_dir='asc',
+                              filters={}, fields=None)
+    collection = api_node.NodeCollection.convert_with_links(
+        nodes, limit, fields=fields, sort_key='id', sort_dir='asc')
+    return wsme_json.encode_result(collection, api_node.NodeCollection)
+
+
+def dict_document(ctx, limit, fields):
+    if fields is None:
+        fields = api_node._api_fields()
+    nodes = objects.Node.list_fields(
+        ctx, [f for f in api_node._api_fields() if f in fields], limit,
+        sort_key='id', sort_dir='asc', filters={})
+    document = api_node.NodeCollection.serialize(nodes, limit,
+                                                 sort_key='id',
+                                                 sort_dir='asc')
+    return wsme_json.encode_result(document, types.jsontype)
+
+
+def best_time(func, *args):
+    best = None
+    for i in range(REPEAT):
+        start = time.time()
+        result = func(*args)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    count = 5000
+    limit = 1000
+    fields = None
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        limit = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        fields = sys.argv[3].split(',')
+    root = tempfile.mkdtemp()
+    CONF([], project='xcat3')
+    CONF.set_override('connection', 'sqlite:///%s' % os.path.join(
+        root, 'nodes.sqlite'), 'database')
+    CONF.set_override('max_limit', limit, 'api')
+    try:
+        models.Base.metadata.create_all(enginefacade.writer.get_engine())
+        objects.register_all()
+        create_nodes(count)
+        pecan.core.state.request = FakeRequest()
+        ctx = context.get_admin_context()
+        old, old_body = best_time(wsme_document, ctx, limit, fields)
+        new, new_body = best_time(dict_document, ctx, limit, fields)
+        same = json.loads(old_body) == json.loads(new_body)
+        print('%d nodes of %d, %d bytes: wsme objects %.1fms, dicts %.1fms, '
+              '%.1fx faster, same document: %s' % (
+                  limit, count, len(new_body), old * 1000, new * 1000,
+                  old / new, same))
+    finally:
+        shutil.rmtree(root)
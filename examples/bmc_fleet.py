@@ -0,0 +1,109 @@
+"""Serve a fleet of simulated IPMI BMCs on localhost.
+
+Every virtual BMC listens on its own loopback address, starting from
+--base-address, on --port. The matching node definitions are written to
+name.json and data.json in the format of create_nodes.py, so the fleet can
+be driven end to end through the API with node_time.sh:
+
+    python bmc_fleet.py --count 10000 --latency uniform:0.005,0.05 \
+        --drop-rate 0.001 --power random
+
+The conductor must be able to reach the addresses, i.e. run on the same
+host. Each virtual BMC uses a socket, the open files limit is raised to
+its hard limit, which may need to be raised as well for large fleets.
+"""
+import argparse
+import random
+import resource
+import socket
+import struct
+import time
+
+import eventlet
+
+from xcat3.plugins.control import ipmi_sim
+
+import create_nodes
+
+
+def bmc_address(base, i):
+    return socket.inet_ntoa(struct.pack(
+        '!I', struct.unpack('!I', socket.inet_aton(base))[0] + i))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Simulated BMC fleet.')
+    parser.add_argument('--count', type=int, default=1000,
+                        help='number of virtual BMCs')
+    parser.add_argument('--base-address', default='127.16.0.1',
+                        help='address of the first virtual BMC')
+    parser.add_argument('--port', type=int, default=6230,
+                        help='UDP port of the virtual BMCs')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--latency', default=None,
+                        help='answer latency in seconds, const:S, '
+                             'uniform:LOW,HIGH, normal:MEAN,STDDEV or '
+                             'exp:MEAN')
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help='ratio of the packets silently dropped')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='ratio of the commands answered with an error')
+    parser.add_argument('--power', choices=('on', 'off', 'random'),
+                        default='off', help='initial power state')
+    parser.add_argument('--no-nodes', action='store_true',
+                        help='do not write name.json and data.json')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    latency = None
+    if args.latency:
+        latency = ipmi_sim.latency_distribution(args.latency)
+
+    def control_info(i):
+        return {'bmc_address': bmc_address(args.base_address, i),
+                'bmc_port': args.port,
+                'bmc_username': args.username,
+                'bmc_password': args.password}
+
+    bmcs = []
+    for i in range(args.count):
+        if args.power == 'random':
+            power_on = random.random() < 0.5
+        else:
+            power_on = args.power == 'on'
+        bmcs.append(ipmi_sim.VirtualBMC(
+            bmc_address(args.base_address, i), args.port, args.username,
+            args.password, power_on=power_on, error_rate=args.error_rate))
+    if not args.no_nodes:
+        names, nodes = create_nodes.gen_data(args.count,
+                                             control_info=control_info)
+        create_nodes.write_to_file('name.json', names)
+        create_nodes.write_to_file('data.json', nodes)
+
+    simulator = ipmi_sim.BMCSimulator(bmcs, latency=latency,
+                                      drop_rate=args.drop_rate)
+    simulator.start()
+    print('Serving %d virtual BMCs from %s to %s on port %d' % (
+        args.count, bmcs[0].address, bmcs[-1].address, args.port))
+    received = 0
+    try:
+        while True:
+            eventlet.sleep(10)
+            powered = sum(1 for bmc in bmcs if bmc.power_on)
+            print('%s: %.0f packets/s, %d dropped, %d powered on' % (
+                time.strftime('%H:%M:%S'),
+                (simulator.received - received) / 10.0, simulator.dropped,
+                powered))
+            received = simulator.received
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Benchmark the boot file server with simultaneous downloads on localhost.
+
+Usage: python boot_benchmark.py [clients] [size_mib] [http|tftp]
+
+Serves a random file of size_mib MiB and makes the given number of
+clients download it at the same time, then reports the time taken, the
+aggregate throughput, the highest number of clients served at once and
+how many times the file was opened. The clients run in the same process
+as the server, so the throughput is a lower bound.
+"""
+import os
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+import eventlet
+from eventlet.green import socket
+
+from xcat3.conf import CONF
+from xcat3.plugins.boot import fileserver
+from xcat3.plugins.boot import tftp
+
+HTTP_PORT = 18017
+TFTP_PORT = 18069
+FILE_NAME = 'images/rootimg.gz'
+BLKSIZE = 1468
+WINDOW = 16
+
+
+def max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def http_download(address):
+    sock = socket.create_connection(address)
+    try:
+        sock.sendall(('GET /%s HTTP/1.1\r\nHost: benchmark\r\n'
+                      'Connection: close\r\n\r\n' % FILE_NAME).encode())
+        head = b''
+        while b'\r\n\r\n' not in head:
+            data = sock.recv(4096)
+            if not data:
+                raise IOError('connection closed in the headers')
+            head += data
+        head, body = head.split(b'\r\n\r\n', 1)
+        received = len(body)
+        buf = bytearray(64 * 1024)
+        while True:
+            count = sock.recv_into(buf)
+            if not count:
+                return received
+            received += count
+    finally:
+        sock.close()
+
+
+def tftp_download(address):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(1)
+    request = (struct.pack('!H', tftp.OP_RRQ) + FILE_NAME.encode() +
+               b'\x00octet\x00blksize\x00%d\x00windowsize\x00%d\x00' %
+               (BLKSIZE, WINDOW))
+    try:
+        sock.sendto(request, address)
+        received = 0
+        expected = 1
+        peer = None
+        while True:
+            try:
+                data, peer = sock.recvfrom(65536)
+            except socket.timeout:
+                if peer is None:
+                    sock.sendto(request, address)
+                else:
+                    # Ask for the blocks following the last one received.
+                    sock.sendto(struct.pack('!HH', tftp.OP_ACK,
+                                            (expected - 1) & 0xffff), peer)
+                continue
+            opcode, number = struct.unpack('!HH', data[:4])
+            if opcode == tftp.OP_ERROR:
+                raise IOError(data[4:-1])
+            if opcode == tftp.OP_OACK:
+                sock.sendto(struct.pack('!HH', tftp.OP_ACK, 0), peer)
+                continue
+            if number != expected & 0xffff:
+                continue
+            received += len(data) - 4
+            expected += 1
+            last = len(data) - 4 < BLKSIZE
+            if last or (expected - 1) % WINDOW == 0:
+                sock.sendto(struct.pack('!HH', tftp.OP_ACK, number), peer)
+            if last:
+                return received
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    clients = 2000
+    size = 16
+    protocol = 'http'
+    if len(sys.argv) > 1:
+        clients = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        size = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        protocol = sys.argv[3]
+    root = tempfile.mkdtemp()
+    path = os.path.join(root, FILE_NAME)
+    os.makedirs(os.path.dirname(path))
+    with open(path, 'wb') as f:
+        for i in range(size):
+            f.write(os.urandom(1024 * 1024))
+    CONF([], project='xcat3')
+    CONF.set_override('root_dir', root, 'boot')
+    CONF.set_override('host_ip', '127.0.0.1', 'boot')
+    CONF.set_override('http_port', HTTP_PORT, 'boot')
+    CONF.set_override('tftp_port', TFTP_PORT, 'boot')
+    CONF.set_override('max_connections', clients, 'boot')
+    server = fileserver.BootFileServer()
+    server.start()
+    download = http_download if protocol == 'http' else tftp_download
+    address = ('127.0.0.1', HTTP_PORT if protocol == 'http' else TFTP_PORT)
+    try:
+        base = max_rss_kb()
+        pool = eventlet.GreenPool(clients)
+        start = time.time()
+        sizes = list(pool.imap(lambda i: download(address), range(clients)))
+        elapsed = time.time() - start
+        total = sum(sizes)
+        complete = sum(1 for s in sizes if s == size * 1024 * 1024)
+        stats = server.stats()
+        print('%s: %d clients downloaded %d MiB in %.2fs, %.0f MiB/s, '
+              '%d complete' % (protocol, clients, size, elapsed,
+                               total / elapsed / 1024 / 1024, complete))
+        print('peak %d clients served at once, %d rejected, file opened '
+              '%d times for %d requests, %.1f KiB per client' % (
+                  stats['peak'], stats['rejected'], stats['files_opened'],
+                  stats['http_requests'] + stats['tftp_transfers'],
+                  float(max_rss_kb() - base) / clients))
+    finally:
+        server.stop()
+        shutil.rmtree(root)
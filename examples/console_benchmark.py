@@ -0,0 +1,90 @@
+"""Benchmark the console service against simulated BMCs on localhost.
+
+Usage: python console_benchmark.py [count] [lines_per_second]
+
+Opens the Serial over LAN console of count simulated BMCs listening on
+127.5.x.y, makes every node print lines at the given rate for a while,
+then reports the memory used per console and the output throughput.
+The simulator runs in the same process, so the memory figures are an
+upper bound.
+"""
+import resource
+import sys
+import tempfile
+import time
+
+import eventlet
+
+from xcat3.conductor import console
+from xcat3.conf import CONF
+from xcat3.plugins.control import ipmi
+from xcat3.plugins.control import ipmi_sim
+
+PORT = 6230
+DURATION = 10
+
+
+class FakeNode(object):
+    def __init__(self, i):
+        self.name = 'node%d' % i
+        self.mgt = 'ipmi'
+        self.control_info = {
+            'bmc_address': '127.5.%d.%d' % (i // 250, i % 250 + 1),
+            'bmc_port': PORT, 'bmc_username': 'admin',
+            'bmc_password': 'password'}
+
+
+def max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+if __name__ == "__main__":
+    CONF([], project='xcat3')
+    CONF.set_override('log_dir', tempfile.mkdtemp(), 'console')
+    CONF.set_override('port', 0, 'console')
+    CONF.set_override('websocket_port', 0, 'console')
+    count = 1000
+    rate = 1.0
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        rate = float(sys.argv[2])
+    nodes = [FakeNode(i) for i in range(count)]
+    bmcs = [ipmi_sim.VirtualBMC(node.control_info['bmc_address'], PORT,
+                                'admin', 'password') for node in nodes]
+    simulator = ipmi_sim.BMCSimulator(bmcs)
+    simulator.start()
+    manager = console.ConsoleManager('benchmark')
+    manager.start()
+    try:
+        base = max_rss_kb()
+        start = time.time()
+        result = manager.open({ipmi.IPMIPlugin(): nodes})
+        elapsed = time.time() - start
+        errors = sum(1 for r in result.values() if r != 'ok')
+        print('open: %d consoles in %.2fs, %d errors, %.1f KiB per idle '
+              'console' % (count, elapsed, errors,
+                           float(max_rss_kb() - base) / count))
+        line = b'[    1.234567] a kernel message of a typical length\r\n'
+        start = time.time()
+        sent = 0
+        while time.time() - start < DURATION:
+            for i, bmc in enumerate(bmcs):
+                simulator.console_write(bmc, line)
+                sent += 1
+                if i % 100 == 99:
+                    # The simulator does not retransmit, let the engine
+                    # drain its sockets before they overflow.
+                    eventlet.sleep(0)
+            eventlet.sleep(1.0 / rate)
+        eventlet.sleep(CONF.console.log_flush_interval * 2)
+        elapsed = time.time() - start
+        received = sum(c.backlog().count(b'\n')
+                       for c in manager.consoles.values())
+        print('output: %d lines sent, %d in the buffers, %.0f lines/s, '
+              '%.1f KiB per active console' % (
+                  sent, received, sent / elapsed,
+                  float(max_rss_kb() - base) / count))
+    finally:
+        manager.stop()
+        simulator.stop()
@@ -2,7 +2,13 @@ import json
 import sys
 
 
-def gen_data(n=10):
+def gen_data(n=10, control_info=None):
+    """Generate the node definitions
+
+    :param n: the number of nodes.
+    :param control_info: optional callable returning the control_info of
+                         the i-th node.
+    """
     nodes = {"nodes": []}
     names = {"nodes": []}
     num = [0, 0]
@@ -15,9 +21,12 @@ def gen_data(n=10):
         name = {'name': d['name']}
         d['mgt'] = 'ipmi'
         d['arch'] = 'x86_64' if i % 2 == 0 else 'ppc64le'
-        d['control_info'] = {
-            'bmc_address': '11.0.%d.%d' % (num[0], num[1]),
-            'bmc_username': 'admin', 'bmc_password': 'password'}
+        if control_info is None:
+            d['control_info'] = {
+                'bmc_address': '11.0.%d.%d' % (num[0], num[1]),
+                'bmc_username': 'admin', 'bmc_password': 'password'}
+        else:
+            d['control_info'] = control_info(i)
         d['nics_info'] = {
             'nics': [{'mac': '42:87:0a:05:%02x:%02x' % (num[0], num[1]),
                       'ip': '12.0.%d.%d' % (num[0], num[1]),
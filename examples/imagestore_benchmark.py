@@ -0,0 +1,74 @@
+"""Benchmark the import of the files of an OS image into the image store.
+
+Usage: python imagestore_benchmark.py [rootimg size in MiB]
+
+Imports a random root image, stored as is and gzip compressed, and a
+kernel with import_osimage, then imports them again, which is answered
+from the checksum cache, and a copy of the root image, which is read but
+stored only once.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from xcat3.conf import CONF
+from xcat3.plugins.os import imagestore
+
+
+class FakeDBAPI(object):
+    def __init__(self):
+        self.files = {}
+
+    def set_osimage_files(self, osimage_name, files):
+        self.files[osimage_name] = files
+
+
+def write_random(path, size):
+    with open(path, 'wb') as f:
+        for i in range(size):
+            # Half random, so that the compression has something to do.
+            f.write(os.urandom(512 * 1024) + b'\0' * 512 * 1024)
+
+
+def run(title, func):
+    start = time.time()
+    result = func()
+    print('%s: %.3fs' % (title, time.time() - start))
+    return result
+
+
+if __name__ == "__main__":
+    CONF([], project='xcat3')
+    size = 200
+    if len(sys.argv) > 1:
+        size = int(sys.argv[1])
+    root = tempfile.mkdtemp()
+    try:
+        rootimg = os.path.join(root, 'rootimg.cpio')
+        kernel = os.path.join(root, 'vmlinuz')
+        write_random(rootimg, size)
+        write_random(kernel, 8)
+        files = {'rootimg': rootimg, 'rootimg.gz': rootimg,
+                 'kernel': kernel}
+        store = imagestore.ImageStore(os.path.join(root, 'store'))
+        dbapi = FakeDBAPI()
+        try:
+            contents = run('first import', lambda: imagestore.import_osimage(
+                store, dbapi, 'compute', files, pack=('rootimg.gz',)))
+            run('second import', lambda: imagestore.import_osimage(
+                store, dbapi, 'compute', files, pack=('rootimg.gz',)))
+            copy = os.path.join(root, 'rootimg-copy.cpio')
+            shutil.copy(rootimg, copy)
+            content_id = run('import of a copy',
+                             lambda: store.add(copy)[0])
+            assert content_id == contents['rootimg']
+            print('%d checksum cache hits, %d files in the store' % (
+                store.checksums.hits,
+                sum(len(files) for _, _, files in os.walk(
+                    os.path.join(root, 'store', 'objects')))))
+        finally:
+            store.close()
+    finally:
+        shutil.rmtree(root)
@@ -0,0 +1,59 @@
+"""Benchmark the IPMI plugin against simulated BMCs on localhost.
+
+Usage: python ipmi_benchmark.py [count] [rounds]
+
+Every virtual BMC listens on 127.1.x.y:6230, the whole 127.0.0.0/8 network
+is routed to the loopback device on Linux. Raise the open files limit
+(ulimit -n) above count as every virtual BMC has its own socket.
+"""
+import sys
+import time
+
+from xcat3.conf import CONF
+from xcat3.plugins.control import ipmi
+from xcat3.plugins.control import ipmi_sim
+
+PORT = 6230
+
+
+class FakeNode(object):
+    def __init__(self, i):
+        self.name = 'node%d' % i
+        self.mgt = 'ipmi'
+        self.control_info = {
+            'bmc_address': '127.1.%d.%d' % (i // 250, i % 250 + 1),
+            'bmc_port': PORT,
+            'bmc_username': 'admin', 'bmc_password': 'password'}
+
+
+def run(func, nodes, *args):
+    start = time.time()
+    errors = 0
+    for node, result in func(nodes, *args):
+        if isinstance(result, Exception):
+            errors += 1
+    elapsed = time.time() - start
+    print('%s: %d nodes in %.2fs, %.0f nodes/s, %d errors' % (
+        func.__name__, len(nodes), elapsed, len(nodes) / elapsed, errors))
+
+
+if __name__ == "__main__":
+    CONF([], project='xcat3')
+    count = 100
+    rounds = 3
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        rounds = int(sys.argv[2])
+    nodes = [FakeNode(i) for i in range(count)]
+    simulator = ipmi_sim.BMCSimulator(
+        [ipmi_sim.VirtualBMC(node.control_info['bmc_address'], PORT,
+                             'admin', 'password') for node in nodes])
+    simulator.start()
+    plugin = ipmi.IPMIPlugin()
+    try:
+        for i in range(rounds):
+            run(plugin.set_power_state_many, nodes, 'power on')
+            run(plugin.get_power_state_many, nodes)
+    finally:
+        simulator.stop()
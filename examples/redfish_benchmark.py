@@ -0,0 +1,61 @@
+"""Benchmark the Redfish plugin against mock BMCs on localhost.
+
+Usage: python redfish_benchmark.py [count] [rounds]
+
+Every mock BMC listens on http://127.4.x.y:8000, the whole 127.0.0.0/8
+network is routed to the loopback device on Linux. Raise the open files
+limit (ulimit -n) above 2 * count as every mock BMC has a listening socket
+and keeps its client connections open.
+"""
+import sys
+import time
+
+from xcat3.conf import CONF
+from xcat3.plugins.control import redfish
+from xcat3.plugins.control import redfish_sim
+
+PORT = 8000
+
+
+class FakeNode(object):
+    def __init__(self, i):
+        self.name = 'node%d' % i
+        self.mgt = 'redfish'
+        self.control_info = {
+            'bmc_address': '127.4.%d.%d:%d' % (i // 250, i % 250 + 1, PORT),
+            'bmc_username': 'admin', 'bmc_password': 'password'}
+
+
+def run(func, nodes, *args):
+    start = time.time()
+    errors = 0
+    for node, result in func(nodes, *args):
+        if isinstance(result, Exception):
+            errors += 1
+    elapsed = time.time() - start
+    print('%s: %d nodes in %.2fs, %.0f nodes/s, %d errors' % (
+        func.__name__, len(nodes), elapsed, len(nodes) / elapsed, errors))
+
+
+if __name__ == "__main__":
+    CONF([], project='xcat3')
+    CONF.set_override('scheme', 'http', 'redfish')
+    count = 100
+    rounds = 3
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        rounds = int(sys.argv[2])
+    nodes = [FakeNode(i) for i in range(count)]
+    simulator = redfish_sim.RedfishSimulator(
+        [redfish_sim.VirtualRedfishBMC(
+            node.control_info['bmc_address'].split(':')[0], PORT,
+            'admin', 'password') for node in nodes])
+    simulator.start()
+    plugin = redfish.RedfishPlugin()
+    try:
+        for i in range(rounds):
+            run(plugin.set_power_state_many, nodes, 'power on')
+            run(plugin.get_power_state_many, nodes)
+    finally:
+        simulator.stop()
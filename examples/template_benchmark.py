@@ -0,0 +1,90 @@
+"""Benchmark the rendering of per node provisioning files.
+
+Usage: python template_benchmark.py [count] [workers]
+
+Renders a kickstart like template into one file per node with
+TemplateRenderer, a first time and again without any change, then renders
+a fifth of the nodes with utils.render_template which compiles the
+template for every file.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from xcat3.common import utils
+from xcat3.conf import CONF
+from xcat3.plugins.os import templates
+
+TEMPLATE = """\
+# Kickstart of {{ name }}
+url --url=http://{{ server }}/install/{{ osimage }}/
+network --device={{ mac }} --bootproto=static --ip={{ ip }} \
+--netmask=255.255.0.0 --hostname={{ name }}
+rootpw --iscrypted {{ password }}
+{% for disk in disks %}
+part /{{ disk.mount }} --ondisk={{ disk.device }} --size={{ disk.size }}
+{% endfor %}
+%packages
+{% for package in packages %}
+{{ package }}
+{% endfor %}
+%end
+%post
+curl -X PUT http://{{ server }}:3010/v1/nodes/{{ name }}/provision
+%end
+"""
+
+
+def params(i):
+    return {'name': 'node%05d' % i, 'server': '10.0.0.1',
+            'osimage': 'rhels7.3-x86_64-install-compute',
+            'mac': '42:00:00:%02x:%02x:%02x' % (i >> 16, (i >> 8) & 255,
+                                               i & 255),
+            'ip': '10.1.%d.%d' % (i // 250, i % 250 + 1),
+            'password': '$6$salt$hash',
+            'disks': [{'mount': 'boot', 'device': 'sda', 'size': 512},
+                      {'mount': '', 'device': 'sda', 'size': 20480}],
+            'packages': ['@core', 'openssh-server', 'ntp', 'xcat3-agent']}
+
+
+def run(title, func, count):
+    start = time.time()
+    result = func()
+    elapsed = time.time() - start
+    print('%s: %d files in %.2fs, %.0f files/s' % (
+        title, count, elapsed, count / elapsed))
+    return result
+
+
+if __name__ == "__main__":
+    CONF([], project='xcat3')
+    count = 10000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        CONF.set_override('template_workers', int(sys.argv[2]), 'provision')
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, 'compute.tmpl')
+        with open(path, 'w') as f:
+            f.write(TEMPLATE)
+        jobs = [(os.path.join(root, 'ks', 'node%05d.cfg' % i), params(i))
+                for i in range(count)]
+        renderer = templates.TemplateRenderer()
+        written, errors = run('first render',
+                              lambda: renderer.render(path, jobs), count)
+        print('%d written, %d errors' % (len(written), len(errors)))
+        written, errors = run('unchanged render',
+                              lambda: renderer.render(path, jobs), count)
+        print('%d written, %d errors' % (len(written), len(errors)))
+
+        def render_each():
+            for output, values in jobs[:count // 5]:
+                with open(output, 'w') as f:
+                    f.write(utils.render_template(path, values))
+
+        run('utils.render_template', render_each, count // 5)
+    finally:
+        shutil.rmtree(root)
@@ -32,7 +32,9 @@ def get_pecan_config():
 
 
 def setup_app(pecan_config=None, extra_hooks=None):
-    app_hooks = [hooks.ConfigHook(),
+    app_hooks = [hooks.CompressionHook(),
+                 hooks.NotModifiedHook(),
+                 hooks.ConfigHook(),
                  hooks.RPCHook(),
                  hooks.DBHook(),
                  hooks.ContextHook(pecan_config.app.acl_public_routes),
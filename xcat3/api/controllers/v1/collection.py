@@ -38,10 +38,14 @@ class Collection(base.APIBase):
         if not self.has_next(limit):
             return wtypes.Unset
 
-        resource_url = url or self._type
+        return self.next_link(url or self._type, limit, **kwargs)
+
+    @staticmethod
+    def next_link(resource_url, limit, **kwargs):
+        """Return the link to the subset following a full one."""
         q_args = ''.join(['%s=%s&' % (key, kwargs[key]) for key in kwargs])
         next_args = '?%(args)slimit=%(limit)d' % {'args': q_args,
                                                   'limit': limit}
 
-        return link.Link.make_link('next', pecan.request.public_url,
-                                   resource_url, next_args).href
+        return link.build_url(resource_url, next_args,
+                              base_url=pecan.request.public_url)
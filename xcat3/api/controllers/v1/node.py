@@ -14,14 +14,20 @@
 #    under the License.
 
 import datetime
+import json
 
 import pecan
 from oslo_log import log
+from oslo_utils import strutils
 from pecan import rest
+from webob import exc
 from xcat3.api import expose
+from xcat3.api import node_import
 import xcat3.conf
+import six
 from six.moves import http_client
 from xcat3.common import exception
+from xcat3.common.i18n import _
 from xcat3.api.controllers.v1 import types
 import wsme
 from wsme import types as wtypes
@@ -30,6 +36,8 @@ from xcat3.api.controllers import base
 from xcat3.api.controllers import link
 from xcat3.api.controllers.v1 import collection
 from xcat3.api.controllers.v1 import utils as api_utils
+from xcat3.api import status as status_queue
+from xcat3.common import jsonstream
 from xcat3.common import states as xcat3_states
 from xcat3 import objects
 
@@ -41,7 +49,13 @@ _DEFAULT_RETURN_FIELDS = ('name', 'reservation', 'created_at', 'nics_info',
                           'state', 'task_action', 'type', 'arch', 'mgt',
                           'updated_at')
 
-_REST_RESOURCE = ('power')
+_REST_RESOURCE = ('power', 'health', 'inventory', 'console', 'provision',
+                  'status', 'export', 'import', 'governor')
+
+# The columns of the nics in the export of the nodes.
+_EXPORT_NIC_FIELDS = ('uuid', 'mac', 'ip', 'netmask', 'type', 'extra')
+# The size of the chunks of the streamed export.
+_EXPORT_CHUNK_SIZE = 64 * 1024
 
 ALLOWED_TARGET_POWER_STATES = (xcat3_states.POWER_ON,
                                xcat3_states.POWER_OFF,
@@ -75,6 +89,47 @@ def _bulk_local_wrap(func, nodes, *args, **kwargs):
     return types.JsonType.validate(result)
 
 
+def _get_names(noderange, nodes):
+    """Return the names of the nodes of a noderange or of a collection.
+
+    :param noderange: a noderange, resolved by the database, or None.
+    :param nodes: the collection of the body when there is no noderange.
+    :raises: InvalidParameterValue if neither is given.
+    """
+    if noderange is not None:
+        return objects.Node.get_names(pecan.request.context, noderange)
+    if nodes is None:
+        raise exception.InvalidParameterValue(
+            _('A noderange or a list of nodes is required.'))
+    return [node.name for node in nodes.nodes if node.name]
+
+
+def _serialize_datetimes(node):
+    """Convert the datetimes of a node dict like wsme does."""
+    for k, v in node.items():
+        if isinstance(v, datetime.datetime):
+            node[k] = v.isoformat()
+    return node
+
+
+def _ndjson_chunks(nodes):
+    """Encode nodes as lines of JSON, grouped in chunks."""
+    lines = []
+    size = 0
+    for node in nodes:
+        line = json.dumps(_serialize_datetimes(node)).encode('utf-8')
+        lines.append(line)
+        size += len(line) + 1
+        if size >= _EXPORT_CHUNK_SIZE:
+            lines.append(b'')
+            yield b'\n'.join(lines)
+            lines = []
+            size = 0
+    if lines:
+        lines.append(b'')
+        yield b'\n'.join(lines)
+
+
 def _wait_rpc_result(futures, names):
     """Wait the result from rpc call.
 
@@ -120,6 +175,8 @@ class Node(base.APIBase):
     mgt = wsme.wsattr(wtypes.text)
     type = wsme.wsattr(wtypes.text)
     arch = wsme.wsattr(wtypes.text)
+    status = wsme.wsattr(wtypes.text, readonly=True)
+    """The last status reported by the node"""
     osimage_name = wsme.wsattr(wtypes.text)
     scripts_name = wsme.wsattr(wtypes.text)
     control_info = {wtypes.text: types.jsontype}
@@ -180,6 +237,22 @@ class Node(base.APIBase):
         return cls(name=node_name)
 
 
+_API_FIELDS = None
+
+
+def _api_fields():
+    """The fields of the objects exposed by the API, see Node.__init__.
+
+    Computed on first use, the objects are registered after the import of
+    the API.
+    """
+    global _API_FIELDS
+    if _API_FIELDS is None:
+        _API_FIELDS = tuple(k for k in objects.Node.fields
+                            if hasattr(Node, k))
+    return _API_FIELDS
+
+
 class NodePatchType(types.JsonPatchType):
     _api_base = Node
 
@@ -206,6 +279,24 @@ class NodeCollection(collection.Collection):
         collection.next = collection.get_next(limit, url=url, **kwargs)
         return collection
 
+    @staticmethod
+    def serialize(nodes, limit, url=None, **kwargs):
+        """Return the JSON document of a list of nodes.
+
+        It is the document of :meth:`convert_with_links`, built without
+        the wsme objects of the nodes and their links, which are not
+        serialized.
+
+        :param nodes: a list of dicts of the fields of the nodes, see
+                      :meth:`xcat3.objects.node.Node.list_fields`.
+        """
+        document = {'nodes': [_serialize_datetimes(node)
+                              for node in nodes]}
+        if nodes and len(nodes) == limit:
+            document['next'] = NodeCollection.next_link(url or 'nodes',
+                                                        limit, **kwargs)
+        return document
+
     @classmethod
     def sample(cls):
         sample = cls()
@@ -249,13 +340,14 @@ class NodeStates(base.APIBase):
 
 class NodePowerController(rest.RestController):
 
-    @expose.expose(types.jsontype, body=NodeCollection)
-    def get(self, nodes):
+    @expose.expose(types.jsontype, wtypes.text, body=NodeCollection)
+    def get(self, noderange=None, nodes=None):
         """List the states of the node.
 
-        :param node_name: The name of a node.
+        :param noderange: the nodes, e.g. node[001-500],-node042.
+        :param nodes: the nodes, when there is no noderange.
         """
-        names = [node.name for node in nodes.nodes if node.name]
+        names = _get_names(noderange, nodes)
         futures = pecan.request.rpcapi.get_power_state(
             pecan.request.context, names)
         result = _wait_rpc_result(futures, names)
@@ -265,11 +357,13 @@ class NodePowerController(rest.RestController):
                    wtypes.text,
                    body=NodeCollection,
                    status_code=http_client.ACCEPTED)
-    def put(self, target, nodes):
+    def put(self, target, noderange=None, nodes=None):
         """Set the power state of the node.
 
         :param target: The desired power state of the node.
-        :param nodes: the UUID or logical name of nodes.
+        :param noderange: the nodes, e.g. node[001-500],-node042.
+        :param nodes: the UUID or logical name of nodes, when there is no
+                      noderange.
         :raises: ClientSideError (HTTP 409) if a power operation is
                  already in progress.
         :raises: InvalidStateRequested (HTTP 400) if the requested target
@@ -283,7 +377,7 @@ class NodePowerController(rest.RestController):
         # node_obj = api_utils.get_node_obj(node)
         if (target in [xcat3_states.SOFT_REBOOT, xcat3_states.SOFT_POWER_OFF]):
             raise exception.NotAcceptable()
-        names = [node.name for node in nodes.nodes if node.name]
+        names = _get_names(noderange, nodes)
 
         futures = pecan.request.rpcapi.change_power_state(
             pecan.request.context, names, target=target)
@@ -293,8 +387,263 @@ class NodePowerController(rest.RestController):
         return result
 
 
+class NodeHealthController(rest.RestController):
+
+    @expose.expose(types.jsontype, body=NodeCollection)
+    def get(self, nodes):
+        """List the health of the BMCs of the nodes.
+
+        The BMC of a node is 'ok', 'unreachable' when the calls towards it
+        fail fast after consecutive timeouts, or 'probing' while a call
+        checks whether it answers again.
+
+        :param nodes: the logical name of nodes.
+        """
+        names = [node.name for node in nodes.nodes if node.name]
+        futures = pecan.request.rpcapi.get_bmc_health(
+            pecan.request.context, names)
+        result = _wait_rpc_result(futures, names)
+        return result
+
+
+class NodeGovernorController(rest.RestController):
+
+    @expose.expose(types.jsontype)
+    def get(self):
+        """Show the queues of the calls to the BMCs of each conductor.
+
+        The governor of a conductor paces the calls of the control plugins
+        by plugin and by subnet, see :mod:`xcat3.conductor.governor`. The
+        conductors which do not answer in time are reported with an error.
+        """
+        futures = pecan.request.rpcapi.get_governor_stats(
+            pecan.request.context)
+        done, not_done = pecan.request.rpcapi.wait_workers(futures,
+                                                           CONF.api.timeout)
+        result = {'conductors': {}}
+        for future in not_done:
+            result['conductors'][future.conductor] = {
+                'error': _('Timeout after waiting %d seconds') %
+                CONF.api.timeout}
+        for future in done:
+            if future.exception():
+                result['conductors'][future.conductor] = {
+                    'error': six.text_type(future.exception())}
+            else:
+                result['conductors'][future.conductor] = future.result()
+        return types.JsonType.validate(result)
+
+
+class NodeInventoryController(rest.RestController):
+
+    @expose.expose(types.jsontype, wtypes.text, body=NodeCollection)
+    def get(self, category=None, nodes=None):
+        """List the stored hardware inventory of the nodes.
+
+        The inventory is read from the database, see :meth:`put` to collect
+        it from the BMCs.
+
+        :param category: Optional, only return the components of the
+                         category, e.g. 'system'.
+        :param nodes: the logical name of nodes.
+        """
+        names = [node.name for node in nodes.nodes if node.name]
+        inventories = objects.Inventory.list_by_node_names(
+            pecan.request.context, names, category=category)
+        result = dict()
+        result['nodes'] = dict((name, 'not collected') for name in names)
+        for inv in inventories:
+            result['nodes'][inv.name] = {
+                'collected_at': inv.collected_at.isoformat(),
+                'updated_at': (inv.updated_at or inv.created_at).isoformat(),
+                'inventory': inv.items}
+        return types.JsonType.validate(result)
+
+    @expose.expose(types.jsontype, body=NodeCollection,
+                   status_code=http_client.ACCEPTED)
+    def put(self, nodes):
+        """Collect the hardware inventory of the nodes.
+
+        Only the inventories which changed since the last collection are
+        written to the database.
+
+        :param nodes: the logical name of nodes.
+        """
+        names = [node.name for node in nodes.nodes if node.name]
+        futures = pecan.request.rpcapi.collect_inventory(
+            pecan.request.context, names)
+        result = _wait_rpc_result(futures, names)
+        return result
+
+
+class NodeConsoleController(rest.RestController):
+
+    @expose.expose(types.jsontype, body=NodeCollection)
+    def get(self, nodes):
+        """Get how to attach to the serial consoles of the nodes.
+
+        A one time token is issued for each open console, it is either sent
+        as the first line of a connection to the raw TCP port of the
+        conductor, or passed in the query string of the websocket URL.
+
+        :param nodes: the logical name of nodes.
+        """
+        names = [node.name for node in nodes.nodes if node.name]
+        futures = pecan.request.rpcapi.get_console(
+            pecan.request.context, names)
+        result = _wait_rpc_result(futures, names)
+        return result
+
+    @expose.expose(types.jsontype, wtypes.text, body=NodeCollection,
+                   status_code=http_client.ACCEPTED)
+    def put(self, target, nodes):
+        """Open or close the serial consoles of the nodes.
+
+        :param target: 'on' to open the consoles, 'off' to close them.
+        :param nodes: the logical name of nodes.
+        :raises: ClientSideError (HTTP 400) if the target is not valid.
+        """
+        if target not in ('on', 'off'):
+            raise wsme.exc.ClientSideError(
+                _('Invalid console target %s, expected on or off.') % target,
+                status_code=http_client.BAD_REQUEST)
+        names = [node.name for node in nodes.nodes if node.name]
+        if target == 'on':
+            futures = pecan.request.rpcapi.start_console(
+                pecan.request.context, names)
+        else:
+            futures = pecan.request.rpcapi.stop_console(
+                pecan.request.context, names)
+        result = _wait_rpc_result(futures, names)
+        return result
+
+
+class NodeProvisionController(rest.RestController):
+
+    @expose.expose(types.jsontype, wtypes.text, body=NodeCollection,
+                   status_code=http_client.ACCEPTED)
+    def put(self, target, nodes):
+        """Move the nodes through the provisioning states.
+
+        :param target: the provisioning event, deploy, wait, done, fail or
+                       undeploy.
+        :param nodes: the logical name of nodes.
+        :raises: ClientSideError (HTTP 400) if the event is not valid.
+        """
+        if target not in xcat3_states.PROVISION_EVENTS:
+            raise wsme.exc.ClientSideError(
+                _('Invalid provisioning event %(target)s, expected one of '
+                  '%(events)s.') % {
+                    'target': target,
+                    'events': ', '.join(sorted(
+                        xcat3_states.PROVISION_EVENTS))},
+                status_code=http_client.BAD_REQUEST)
+        names = [node.name for node in nodes.nodes if node.name]
+        futures = pecan.request.rpcapi.set_provision_state(
+            pecan.request.context, names, target)
+        result = _wait_rpc_result(futures, names)
+        return result
+
+
+class NodeStatusController(rest.RestController):
+
+    @expose.expose(types.jsontype)
+    def get(self):
+        """Show the queue of the statuses reported by the nodes.
+
+        lag is the age in seconds of the oldest status not written to the
+        database yet.
+        """
+        return types.JsonType.validate(status_queue.get_queue().stats())
+
+    @expose.expose(types.jsontype, body=types.jsontype,
+                   status_code=http_client.ACCEPTED)
+    def post(self, statuses):
+        """Report the statuses of nodes, e.g. {"node1": "installing"}.
+
+        The request is answered once the statuses are queued, they are
+        written to the database in batches, see :mod:`xcat3.api.status`.
+        The statuses installing, booted and failed also move the nodes
+        being deployed through the provisioning states.
+
+        :param statuses: a dict of node name and status.
+        :raises: InvalidParameterValue (HTTP 400) if a status is not valid.
+        :raises: StatusQueueFull (HTTP 503) if too many statuses are
+                 waiting to be written.
+        """
+        queued = status_queue.get_queue().put(statuses)
+        return types.JsonType.validate({'queued': queued})
+
+
+class NodeExportController(rest.RestController):
+
+    @pecan.expose()
+    def get(self):
+        """Stream all the nodes with their nics, one JSON object per line.
+
+        The nodes are written as they are read, [api]export_batch_size
+        at a time, the memory used does not depend on the number of nodes.
+        The nics are in the 'nics' list of the 'nics_info' of each node.
+        """
+        nodes = objects.Node.iter_with_nics(pecan.request.context,
+                                            _api_fields(),
+                                            _EXPORT_NIC_FIELDS,
+                                            CONF.api.export_batch_size)
+        response = pecan.response
+        response.content_type = 'application/x-ndjson'
+        response.app_iter = _ndjson_chunks(nodes)
+        response.content_length = None
+        return response
+
+
+class NodeImportController(rest.RestController):
+
+    @pecan.expose('json')
+    def post(self, offset='0', skip_existing='false'):
+        """Create nodes from lines of JSON, a JSON array or {"nodes": [...]}.
+
+        The body is read and the nodes are created as the records arrive,
+        see :mod:`xcat3.api.node_import`. The records which are not valid
+        are reported with their index and skipped, the response is
+        answered 400 if the document cannot be read further, after
+        committing the records before the error.
+
+        :param offset: the number of records to skip, the committed offset
+                       of an interrupted import.
+        :param skip_existing: skip the nodes which exist instead of
+                              reporting them as errors.
+        :returns: the result of the import, with the 'committed' offset.
+        """
+        try:
+            offset = int(offset)
+            skip_existing = strutils.bool_from_string(skip_existing,
+                                                      strict=True)
+            if offset < 0:
+                raise ValueError(offset)
+        except ValueError:
+            raise exc.HTTPBadRequest(_('offset must be a positive integer '
+                                       'and skip_existing a boolean.'))
+        request = pecan.request
+        # Without a length, the body is chunked.
+        body = (request.body_file if request.content_length is not None
+                else request.body_file_raw)
+        importer = node_import.NodeImporter(skip_existing=skip_existing,
+                                            reserved=_REST_RESOURCE)
+        result = importer.run(jsonstream.RecordReader(body), offset)
+        if 'faultstring' in result:
+            pecan.response.status = http_client.BAD_REQUEST
+        return result
+
+
 class NodesController(rest.RestController):
     power = NodePowerController()
+    provision = NodeProvisionController()
+    status = NodeStatusController()
+    governor = NodeGovernorController()
+    export = NodeExportController()
+    health = NodeHealthController()
+    inventory = NodeInventoryController()
+    console = NodeConsoleController()
     invalid_sort_key_list = ['name']
 
     def _check_names_acceptable(self, names, error_msg):
@@ -339,14 +688,16 @@ class NodesController(rest.RestController):
                 _("The sort_key value %(key)s is an invalid field for "
                   "sorting") % {'key': sort_key})
         filters = {}
-        nodes = objects.Node.list(pecan.request.context, limit,
-                                  sort_key=sort_key, sort_dir=sort_dir,
-                                  filters=filters, fields=None)
+        if fields is None:
+            fields = _api_fields()
+        nodes = objects.Node.list_fields(pecan.request.context,
+                                         [f for f in _api_fields()
+                                          if f in fields], limit,
+                                         sort_key=sort_key,
+                                         sort_dir=sort_dir, filters=filters)
 
         parameters = {'sort_key': sort_key, 'sort_dir': sort_dir}
-        return NodeCollection.convert_with_links(nodes, limit,
-                                                 fields=fields,
-                                                 **parameters)
+        return NodeCollection.serialize(nodes, limit, **parameters)
 
     def _update_changed_fields(self, node, node_obj):
         """Update rpc_node based on changed fields in a node.
@@ -364,12 +715,18 @@ class NodesController(rest.RestController):
 
     @expose.expose(Node, types.name, types.listtype)
     def get_one(self, node_name, fields=None):
+        version = objects.Node.get_version(pecan.request.context, node_name)
+        # A missing node has no representation to match, even '*', it is
+        # answered 404 by get_api_node.
+        if version[0] and api_utils.check_etag(version):
+            return wsme.api.Response(None,
+                                     status_code=http_client.NOT_MODIFIED)
         node = Node.get_api_node(node_name)
         node_obj = api_utils.get_node_obj(node)
         return Node.convert_with_links(node_obj, fields=fields)
 
-    @expose.expose(NodeCollection, int, wtypes.text, wtypes.text, wtypes.text,
-                   types.listtype)
+    @expose.expose(types.jsontype, int, wtypes.text, wtypes.text,
+                   wtypes.text, types.listtype)
     def get_all(self, limit=None, sort_key='id', sort_dir='asc',
                 fields=None):
         """Retrieve a list of nodes.
@@ -382,7 +739,14 @@ class NodesController(rest.RestController):
         :param sort_dir: direction to sort. "asc" or "desc". Default: asc.
         :param fields: Optional, a list with a specified set of fields
                        of the resource to be returned.
+
+        The response has an ETag, an unchanged list is answered 304 Not
+        Modified to a request with a matching If-None-Match.
         """
+        if api_utils.check_etag(objects.Node.get_version(
+                pecan.request.context)):
+            return wsme.api.Response(None,
+                                     status_code=http_client.NOT_MODIFIED)
         if fields is None:
             fields = ['name']
         return self._get_nodes_collection(limit, sort_key, sort_dir,
@@ -397,19 +761,21 @@ class NodesController(rest.RestController):
         """
         return _bulk_local_wrap(self._create, nodes)
 
-    @expose.expose(types.jsontype, body=NodeCollection,
+    @expose.expose(types.jsontype, wtypes.text, body=NodeCollection,
                    status_code=http_client.ACCEPTED)
-    def delete(self, nodes):
+    def delete(self, noderange=None, nodes=None):
         """Delete nodes
 
         Dispatch the request to multiple conductors to perform the delete
         action.
 
-        :param nodes: nodes to delete, api format
+        :param noderange: the nodes to delete, e.g. rack3-node[01-40].
+        :param nodes: nodes to delete, api format, when there is no
+                      noderange.
         :return: json fomat result
         """
 
-        names = [node.name for node in nodes.nodes if node.name]
+        names = _get_names(noderange, nodes)
         # As node may be used by other request, try to acquire lock then
         # delete nodes
         futures = pecan.request.rpcapi.destroy_nodes(
@@ -444,3 +810,7 @@ class NodesController(rest.RestController):
         node_obj.save()
         api_node = Node.convert_with_links(node_obj)
         return api_node
+
+
+# import is a keyword, it cannot be the name of an attribute of the class.
+pecan.route(NodesController, 'import', NodeImportController())
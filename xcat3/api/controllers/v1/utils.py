@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import hashlib
 import inspect
 
 import jsonpatch
@@ -154,3 +155,28 @@ def is_valid_node_name(name):
     :returns: True if the name is valid, False otherwise.
     """
     return utils.is_valid_logical_name(name)
+
+
+def check_etag(version):
+    """Set the ETag of the response and compare it to the client's.
+
+    The ETag is weak, it is derived from the version of the resource and
+    the URL of the request, and is the same for all the content codings.
+
+    :param version: a value which changes when the resource changes.
+    :returns: True if the client has the current representation, the
+              response should then be 304 Not Modified.
+    """
+    digest = hashlib.sha1(repr((version, pecan.request.path_qs)).encode(
+        'utf-8')).hexdigest()
+    pecan.response.headers['ETag'] = 'W/"%s"' % digest
+    header = pecan.request.headers.get('If-None-Match')
+    if not header:
+        return False
+    for etag in header.split(','):
+        etag = etag.strip()
+        if etag.startswith('W/'):
+            etag = etag[2:]
+        if etag in ('*', '"%s"' % digest):
+            return True
+    return False
@@ -15,6 +15,7 @@
 # under the License.
 
 import re
+import zlib
 
 from oslo_config import cfg
 from oslo_context import context
@@ -29,6 +30,40 @@ LOG = log.getLogger(__name__)
 CHECKED_DEPRECATED_POLICY_ARGS = False
 
 
+def _accepts_gzip(header):
+    """Return whether an Accept-Encoding header allows gzip."""
+    qvalues = {}
+    for coding in (header or '').split(','):
+        name, sep, params = coding.partition(';')
+        qvalue = 1.0
+        for param in params.split(';'):
+            key, sep, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0.0
+        qvalues[name.strip().lower()] = qvalue
+    return qvalues.get('gzip', qvalues.get('*', 0.0)) > 0
+
+
+def _gzip_iter(app_iter, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for data in app_iter:
+            # Flushed so that a streamed body reaches the client as it is
+            # produced.
+            data = (compressor.compress(data) +
+                    compressor.flush(zlib.Z_SYNC_FLUSH))
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(app_iter, 'close', None)
+        if close is not None:
+            close()
+
+
 class ConfigHook(hooks.PecanHook):
     """Attach the config object to the request so controllers can get to it."""
 
@@ -36,6 +71,48 @@ class ConfigHook(hooks.PecanHook):
         state.request.cfg = cfg.CONF
 
 
+class CompressionHook(hooks.PecanHook):
+    """Compress the responses for the clients accepting gzip.
+
+    The bodies of [api]compression_min_size bytes or more are compressed
+    at once, the streamed bodies, whose size is not known, as they are
+    produced. It must be the first hook, its 'after' runs last.
+    """
+
+    def after(self, state):
+        response = state.response
+        level = cfg.CONF.api.compression_level
+        if (not level or response.content_encoding or
+                state.request.method == 'HEAD' or
+                response.status_int in (http_client.NO_CONTENT,
+                                        http_client.NOT_MODIFIED)):
+            return
+        length = response.content_length
+        if length is not None and length < cfg.CONF.api.compression_min_size:
+            return
+        response.vary = tuple(response.vary or ()) + ('Accept-Encoding',)
+        if not _accepts_gzip(state.request.headers.get('Accept-Encoding')):
+            return
+        if length is None:
+            response.app_iter = _gzip_iter(response.app_iter, level)
+        else:
+            compressor = zlib.compressobj(level, zlib.DEFLATED,
+                                          16 + zlib.MAX_WBITS)
+            response.body = (compressor.compress(response.body) +
+                             compressor.flush())
+        response.content_encoding = 'gzip'
+
+
+class NotModifiedHook(hooks.PecanHook):
+    """Remove the body rendered by wsme for the 304 responses."""
+
+    def after(self, state):
+        response = state.response
+        if response.status_int == http_client.NOT_MODIFIED:
+            response.body = b''
+            response.content_type = None
+
+
 class DBHook(hooks.PecanHook):
     """Attach the dbapi object to the request so controllers can get to it."""
 
@@ -82,17 +159,18 @@ class NoExceptionTracebackHook(hooks.PecanHook):
     # catches and handles all the errors, so 'on_error' dedicated for unhandled
     # exceptions never fired.
     def after(self, state):
-        # Omit empty body. Some errors may not have body at this level yet.
-        if not state.response.body:
-            return
-
         # Do nothing if there is no error.
         # Status codes in the range 200 (OK) to 399 (400 = BAD_REQUEST) are not
-        # an error.
+        # an error. Checked first, reading the body of a streamed response
+        # would load it in memory.
         if (http_client.OK <= state.response.status_int <
                 http_client.BAD_REQUEST):
             return
 
+        # Omit empty body. Some errors may not have body at this level yet.
+        if not state.response.body:
+            return
+
         json_body = state.response.json
         # Do not remove traceback when traceback config is set
         if cfg.CONF.debug_tracebacks_in_api:
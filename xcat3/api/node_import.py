@@ -0,0 +1,261 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Create nodes from a stream of records.
+
+The records are read one at a time by :class:`xcat3.common.jsonstream.
+RecordReader`, validated, and committed [api]import_batch_size at a time:
+one query finds the names and MAC addresses already used by a batch, one
+transaction creates the others. A record which is not valid is reported
+with its index and does not stop the import.
+
+The index of the record after the last batch committed is reported as
+'committed'. An interrupted import is resumed by sending the records again
+from that offset, with skip_existing so that the records committed by a
+batch whose result was lost are skipped rather than reported as conflicts.
+"""
+
+from oslo_log import log
+from oslo_utils import netutils
+import six
+
+from xcat3.common import exception
+from xcat3.common.i18n import _
+from xcat3.common import utils
+from xcat3.conf import CONF
+from xcat3.db import api as db_api
+
+LOG = log.getLogger(__name__)
+
+# The string fields of a node and the length of their column.
+_NODE_STRINGS = {'mgt': 36, 'type': 15, 'arch': 15}
+_NODE_DICTS = ('control_info', 'console_info')
+# Written by the export of the nodes but set by xcat3, ignored.
+_READONLY_FIELDS = ('reservation', 'status', 'created_at', 'updated_at')
+_NIC_STRINGS = {'ip': 36, 'netmask': 36, 'type': 36}
+# uuid is generated, primary is written by examples/create_nodes.py.
+_IGNORED_NIC_FIELDS = ('uuid', 'primary')
+# The errors reported, the others are only counted.
+_MAX_ERRORS = 1000
+
+
+def _check_string(values, key, length, what):
+    value = values.get(key)
+    if value is None:
+        return
+    if not isinstance(value, six.string_types) or len(value) > length:
+        raise exception.InvalidParameterValue(
+            _('%(what)s must be a string of at most %(length)d '
+              'characters.') % {'what': what, 'length': length})
+
+
+def _validate_nic(nic):
+    if not isinstance(nic, dict):
+        raise exception.InvalidParameterValue(_('A nic must be an object.'))
+    unknown = set(nic) - set(_NIC_STRINGS) - set(_IGNORED_NIC_FIELDS) - set(
+        ['mac', 'extra'])
+    if unknown:
+        raise exception.InvalidParameterValue(
+            _('Unknown fields of a nic: %s.') % ', '.join(sorted(unknown)))
+    mac = nic.get('mac')
+    if not isinstance(mac, six.string_types) or not netutils.is_valid_mac(
+            mac):
+        raise exception.InvalidMAC(mac=mac)
+    for key, length in _NIC_STRINGS.items():
+        _check_string(nic, key, length, key)
+    if nic.get('extra') is not None and not isinstance(nic['extra'], dict):
+        raise exception.InvalidParameterValue(
+            _('The extra of a nic must be an object.'))
+    values = dict((k, nic.get(k)) for k in _NIC_STRINGS)
+    values['mac'] = mac.lower()
+    values['extra'] = nic.get('extra')
+    return values
+
+
+def validate(record, reserved=()):
+    """Validate a record of node and return the values to create it.
+
+    :param record: the decoded record.
+    :param reserved: the names which cannot be given to a node.
+    :raises: InvalidParameterValue, InvalidName or InvalidMAC.
+    :returns: a dict of values for the create_nodes method of the database
+              API.
+    """
+    if not isinstance(record, dict):
+        raise exception.InvalidParameterValue(
+            _('A node must be an object.'))
+    name = record.get('name')
+    if not utils.is_valid_logical_name(name) or name in reserved:
+        raise exception.InvalidName(name=name)
+    unknown = (set(record) - set(['name', 'nics_info']) - set(_NODE_STRINGS) -
+               set(_NODE_DICTS) - set(_READONLY_FIELDS))
+    if unknown:
+        raise exception.InvalidParameterValue(
+            _('Unknown fields: %s.') % ', '.join(sorted(unknown)))
+    values = {'name': name}
+    for key, length in _NODE_STRINGS.items():
+        _check_string(record, key, length, key)
+        values[key] = record.get(key)
+    for key in _NODE_DICTS:
+        value = record.get(key)
+        if value is not None and not isinstance(value, dict):
+            raise exception.InvalidParameterValue(
+                _('%s must be an object.') % key)
+        values[key] = value
+    nics_info = record.get('nics_info') or {}
+    nics = nics_info.get('nics') if isinstance(nics_info, dict) else None
+    if nics is None:
+        nics = []
+    if not isinstance(nics, list):
+        raise exception.InvalidParameterValue(
+            _('nics_info must be an object with a list of nics.'))
+    values['nics_info'] = {'nics': [_validate_nic(nic) for nic in nics]}
+    return values
+
+
+class NodeImporter(object):
+    """Create the nodes of a stream of records in batches.
+
+    :param dbapi: the database API, the one of the process by default.
+    :param batch_size: the records committed at a time,
+                       [api]import_batch_size by default.
+    :param skip_existing: skip the records of the nodes which exist
+                          instead of reporting them.
+    :param reserved: the names which cannot be given to a node.
+    """
+
+    def __init__(self, dbapi=None, batch_size=None, skip_existing=False,
+                 reserved=()):
+        self.dbapi = dbapi or db_api.get_instance()
+        self.batch_size = batch_size or CONF.api.import_batch_size
+        self.skip_existing = skip_existing
+        self.reserved = reserved
+        self.committed = 0
+        self.created = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors = []
+
+    def _error(self, index, name, error):
+        self.failed += 1
+        if len(self.errors) < _MAX_ERRORS:
+            self.errors.append({'index': index, 'name': name,
+                                'error': six.text_type(error)})
+
+    def _create(self, batch):
+        names = [values['name'] for index, values in batch]
+        macs = [nic['mac'] for index, values in batch
+                for nic in values['nics_info']['nics']]
+        existing_names, existing_macs = self.dbapi.get_existing_nodes(names,
+                                                                      macs)
+        ready = []
+        for index, values in batch:
+            name = values['name']
+            if name in existing_names:
+                if self.skip_existing:
+                    self.skipped += 1
+                else:
+                    self._error(index, name,
+                                exception.DuplicateName(name=name))
+                continue
+            used = [nic['mac'] for nic in values['nics_info']['nics']
+                    if nic['mac'] in existing_macs]
+            if used:
+                self._error(index, name,
+                            exception.MACAlreadyExists(mac=used[0]))
+                continue
+            ready.append((index, values))
+        if ready:
+            try:
+                self.dbapi.create_nodes([values for index, values in ready])
+                self.created += len(ready)
+            except (exception.DuplicateName, exception.MACAlreadyExists):
+                # Created meanwhile by another request, find which ones.
+                for index, values in ready:
+                    try:
+                        self.dbapi.create_nodes([values])
+                        self.created += 1
+                    except (exception.DuplicateName,
+                            exception.MACAlreadyExists) as e:
+                        self._error(index, values['name'], e)
+
+    def _commit(self, batch, end):
+        if batch:
+            self._create(batch)
+        self.committed = end
+
+    def run(self, records, offset=0):
+        """Import the records.
+
+        :param records: an iterable of (record, error) tuples, like a
+                        :class:`xcat3.common.jsonstream.RecordReader`.
+        :param offset: the number of records to skip, already imported.
+        :returns: a dict of the result of the import. 'committed' is the
+                  offset to resume from, 'errors' the first errors of the
+                  records with their index and name, and 'faultstring'
+                  the error which stopped the import, if any.
+        """
+        self.committed = offset
+        batch = []
+        # The records in the batch and the names and MACs they use.
+        names = set()
+        macs = set()
+        index = 0
+        result = {}
+        iterator = iter(records)
+        while True:
+            try:
+                record, error = next(iterator)
+            except StopIteration:
+                break
+            except exception.InvalidParameterValue as e:
+                result['faultstring'] = six.text_type(e)
+                break
+            index += 1
+            if index <= offset:
+                continue
+            name = record.get('name') if isinstance(record, dict) else None
+            try:
+                if error is not None:
+                    raise exception.InvalidParameterValue(error)
+                values = validate(record, self.reserved)
+                if name in names:
+                    raise exception.DuplicateName(name=name)
+                nic_macs = [nic['mac'] for nic in values['nics_info']['nics']]
+                for mac in nic_macs:
+                    if mac in macs or nic_macs.count(mac) > 1:
+                        raise exception.MACAlreadyExists(mac=mac)
+            except exception.XCAT3Exception as e:
+                self._error(index - 1, name, e)
+                continue
+            names.add(name)
+            macs.update(nic_macs)
+            batch.append((index - 1, values))
+            if len(batch) >= self.batch_size:
+                self._commit(batch, index)
+                batch = []
+                names.clear()
+                macs.clear()
+        if index > self.committed:
+            self._commit(batch, index)
+        LOG.debug('Imported records %(start)d to %(end)d: %(created)d nodes '
+                  'created, %(skipped)d skipped, %(failed)d failed.',
+                  {'start': offset, 'end': self.committed,
+                   'created': self.created, 'skipped': self.skipped,
+                   'failed': self.failed})
+        result.update({'offset': offset,
+                       'committed': self.committed,
+                       'created': self.created,
+                       'skipped': self.skipped,
+                       'failed': self.failed,
+                       'errors': self.errors})
+        return result
@@ -0,0 +1,208 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""The statuses reported by the nodes while they are provisioned.
+
+The installers and the postscripts of thousands of nodes report their
+progress within a few seconds. A status is only queued in memory before
+the request is answered, and the queue is written every
+[api]status_flush_interval seconds with one UPDATE per distinct status
+instead of a locked read and a write per node. A node reporting again
+before its status is written replaces its pending status.
+
+Each API worker process has its own queue, written by a green thread
+started when the first status is received.
+"""
+
+import collections
+import time
+
+import eventlet
+from oslo_log import log
+import six
+
+from xcat3.common import exception
+from xcat3.common.i18n import _, _LE
+from xcat3.common import states
+from xcat3.conf import CONF
+from xcat3.db import api as db_api
+
+LOG = log.getLogger(__name__)
+
+# The length of the status column of the nodes.
+_MAX_STATUS_LENGTH = 36
+
+_QUEUE = None
+
+
+class StatusQueue(object):
+    """The statuses waiting to be written to the database.
+
+    :param dbapi: the database API, the one of the process by default.
+    """
+
+    def __init__(self, dbapi=None):
+        self.dbapi = dbapi or db_api.get_instance()
+        # node name: (status, time of the first status not written)
+        self._pending = {}
+        self._oldest = None
+        self._writing_oldest = None
+        self._thread = None
+        self.received = 0
+        self.coalesced = 0
+        self.written = 0
+        self.unknown = 0
+        self.flushes = 0
+        self.errors = 0
+        self.last_flush_duration = 0.0
+
+    @staticmethod
+    def _validate(statuses):
+        if not isinstance(statuses, dict):
+            raise exception.InvalidParameterValue(
+                _('The statuses must be an object of node name and status.'))
+        for name, status in statuses.items():
+            if (not isinstance(name, six.string_types) or
+                    not isinstance(status, six.string_types)):
+                raise exception.InvalidParameterValue(
+                    _('The status of node %s must be a string.') % name)
+            if not status or len(status) > _MAX_STATUS_LENGTH:
+                raise exception.InvalidParameterValue(
+                    _('The status of node %(node)s must have 1 to %(max)d '
+                      'characters.') % {'node': name,
+                                        'max': _MAX_STATUS_LENGTH})
+
+    def put(self, statuses):
+        """Queue the statuses of nodes.
+
+        :param statuses: a dict of node name and status.
+        :raises: InvalidParameterValue if a status is not valid.
+        :raises: StatusQueueFull if the new nodes would exceed
+                 [api]status_queue_size.
+        :returns: the number of statuses queued.
+        """
+        self._validate(statuses)
+        if not statuses:
+            return 0
+        new = sum(1 for name in statuses if name not in self._pending)
+        if len(self._pending) + new > CONF.api.status_queue_size:
+            raise exception.StatusQueueFull(
+                size=CONF.api.status_queue_size)
+        now = time.time()
+        for name, status in statuses.items():
+            previous = self._pending.get(name)
+            if previous is None:
+                self._pending[name] = (status, now)
+            else:
+                self._pending[name] = (status, previous[1])
+                self.coalesced += 1
+        if self._oldest is None:
+            self._oldest = now
+        self.received += len(statuses)
+        if self._thread is None:
+            self._thread = eventlet.spawn(self._run)
+        return len(statuses)
+
+    def _requeue(self, batch):
+        # Keep the statuses received during the failed write, they are
+        # newer.
+        for name, (status, received) in batch.items():
+            current = self._pending.get(name)
+            if current is not None:
+                status = current[0]
+            self._pending[name] = (status, received)
+        self._oldest = min(received for status, received in batch.values())
+
+    def flush(self):
+        """Write the pending statuses.
+
+        A batch which cannot be written is queued again.
+
+        :returns: the number of nodes found in the database.
+        """
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        self._writing_oldest, self._oldest = self._oldest, None
+        start = time.time()
+        names = collections.defaultdict(list)
+        for name, (status, received) in batch.items():
+            names[status].append(name)
+        statuses = []
+        for status, status_names in names.items():
+            event = states.STATUS_EVENTS.get(status)
+            transitions = (states.provision_transitions(event)
+                           if event else [])
+            statuses.append((status, transitions, status_names))
+        try:
+            found = self.dbapi.update_node_statuses(statuses)
+        except Exception:
+            LOG.exception(_LE('Failed to write the statuses of %d nodes, '
+                              'they are queued again.'), len(batch))
+            self.errors += 1
+            self._requeue(batch)
+            return 0
+        finally:
+            self._writing_oldest = None
+            self.last_flush_duration = time.time() - start
+        self.flushes += 1
+        self.written += found
+        if found < len(batch):
+            self.unknown += len(batch) - found
+            LOG.debug('%d nodes reporting a status were not found.',
+                      len(batch) - found)
+        return found
+
+    def _run(self):
+        interval = CONF.api.status_flush_interval
+        while True:
+            start = time.time()
+            self.flush()
+            eventlet.sleep(max(interval - (time.time() - start), 0))
+
+    def stop(self):
+        """Stop the writer thread and write the pending statuses."""
+        if self._thread is not None:
+            self._thread.kill()
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        """Return the counters of the queue.
+
+        lag is the age in seconds of the oldest status not written yet.
+        """
+        oldest = [t for t in (self._oldest, self._writing_oldest)
+                  if t is not None]
+        return {'pending': len(self._pending),
+                'lag': time.time() - min(oldest) if oldest else 0.0,
+                'received': self.received,
+                'coalesced': self.coalesced,
+                'written': self.written,
+                'unknown': self.unknown,
+                'flushes': self.flushes,
+                'errors': self.errors,
+                'last_flush_duration': self.last_flush_duration}
+
+
+def get_queue():
+    """Return the status queue of the API worker process."""
+    global _QUEUE
+    if _QUEUE is None:
+        _QUEUE = StatusQueue()
+    return _QUEUE
+
+
+def stop_queue():
+    """Write the statuses queued by the process, if any."""
+    if _QUEUE is not None:
+        _QUEUE.stop()
@@ -0,0 +1,162 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Create the nodes of a large file with the bulk import of the API.
+
+The file holds lines of JSON, like the export of the nodes, a JSON array
+or {"nodes": [...]} like examples/create_nodes.py. It is read one record
+at a time and sent in segments, each one a request to POST
+/v1/nodes/import. The records before the end of the last segment imported
+are recorded in <file>.import, and an interrupted import resumes after
+them when the command is run again. The records of the segment being
+imported during the interruption are sent again, the nodes already
+committed by the API are skipped.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import requests
+
+from xcat3.common.i18n import _
+from xcat3.common import jsonstream
+
+
+def _load_state(path, st):
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (IOError, ValueError):
+        return 0
+    if (state.get('size'), state.get('mtime')) != (st.st_size, st.st_mtime):
+        return 0
+    return state.get('committed', 0)
+
+
+def _save_state(path, st, committed):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'size': st.st_size, 'mtime': st.st_mtime,
+                   'committed': committed}, f)
+    os.rename(tmp, path)
+
+
+def _segments(reader, start, size):
+    """Yield (lines, indexes, end) of the records after start.
+
+    indexes are the indexes in the file of the records of the lines, the
+    records which are not valid JSON are only reported.
+    """
+    lines = []
+    indexes = []
+    end = start
+    for index, (record, error) in enumerate(reader):
+        if index < start:
+            continue
+        if error is not None:
+            print(_('record %(index)d: %(error)s') % {'index': index,
+                                                      'error': error})
+        else:
+            lines.append(json.dumps(record))
+            indexes.append(index)
+        if len(indexes) >= size:
+            end = index + 1
+            yield lines, indexes, end
+            lines = []
+            indexes = []
+    if reader.count > end:
+        yield lines, indexes, reader.count
+
+
+def _post(url, lines, skip_existing, timeout):
+    body = '\n'.join(lines) + '\n'
+    response = requests.post(
+        url, data=body.encode('utf-8'), timeout=timeout,
+        params={'skip_existing': 'true' if skip_existing else 'false'},
+        headers={'Content-Type': 'application/x-ndjson',
+                 'Accept': 'application/json'})
+    try:
+        result = response.json()
+    except ValueError:
+        result = {}
+    if response.status_code != requests.codes.ok:
+        raise RuntimeError(result.get('faultstring') or response.text)
+    return result
+
+
+def import_nodes(args):
+    url = args.url.rstrip('/') + '/v1/nodes/import'
+    state_path = args.file + '.import'
+    st = os.stat(args.file)
+    start = 0 if args.restart else _load_state(state_path, st)
+    if start:
+        print(_('Resuming after record %d.') % start)
+    totals = {'created': 0, 'skipped': 0, 'failed': 0}
+    # The segment sent again after an interruption was partly committed.
+    skip_existing = args.skip_existing or start > 0
+    with open(args.file, 'rb') as f:
+        reader = jsonstream.RecordReader(f)
+        try:
+            for lines, indexes, end in _segments(reader, start,
+                                                 args.segment):
+                if lines:
+                    result = _post(url, lines, skip_existing, args.timeout)
+                    for error in result['errors']:
+                        print(_('record %(index)d (%(name)s): %(error)s') %
+                              {'index': indexes[error['index']],
+                               'name': error['name'],
+                               'error': error['error']})
+                    for key in totals:
+                        totals[key] += result[key]
+                    if result['failed'] > len(result['errors']):
+                        print(_('%d more records failed.') %
+                              (result['failed'] - len(result['errors'])))
+                _save_state(state_path, st, end)
+                print(_('%(end)d records read: %(created)d nodes created, '
+                        '%(skipped)d skipped, %(failed)d failed.') %
+                      dict(totals, end=end))
+                skip_existing = args.skip_existing
+        except Exception as e:
+            print(_('The import stopped: %s') % e)
+            print(_('Run the command again to resume it.'))
+            return 2
+    if os.path.exists(state_path):
+        os.unlink(state_path)
+    return 1 if totals['failed'] else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=_('Create the nodes of a file of JSON records.'))
+    parser.add_argument('file',
+                        help=_('Lines of JSON, a JSON array or an object '
+                               'with the array of nodes in "nodes".'))
+    parser.add_argument('--url', default='http://127.0.0.1:3010',
+                        help=_('The URL of xcat3-api.'))
+    parser.add_argument('--segment', type=int, default=5000,
+                        help=_('The number of records sent by request.'))
+    parser.add_argument('--timeout', type=float, default=600,
+                        help=_('The timeout in seconds of a request.'))
+    parser.add_argument('--skip-existing', action='store_true',
+                        help=_('Skip the nodes which exist instead of '
+                               'reporting them.'))
+    parser.add_argument('--restart', action='store_true',
+                        help=_('Import the file from its beginning, even '
+                               'if a previous import was interrupted.'))
+    return import_nodes(parser.parse_args())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -159,6 +159,19 @@ class InvalidName(Invalid):
     _msg_fmt = _("Expected a logical name but received %(name)s.")
 
 
+class InvalidMAC(Invalid):
+    _msg_fmt = _("Expected a MAC address but received %(mac)s.")
+
+
+class InvalidNoderange(Invalid):
+    _msg_fmt = _("Invalid noderange %(noderange)s: %(reason)s.")
+
+
+class InvalidStateRequested(Invalid):
+    _msg_fmt = _('The requested action "%(action)s" can not be performed '
+                 'on node "%(node)s" while it is in state "%(state)s".')
+
+
 class InvalidParameterValue(Invalid):
     _msg_fmt = "%(err)s"
 
@@ -270,6 +283,11 @@ class NodeLocked(Conflict):
                  "operation is completed.")
 
 
+class ExclusiveLockRequired(NotAuthorized):
+    _msg_fmt = _("An exclusive lock is required, "
+                 "but the current context has a shared lock.")
+
+
 class NodeNotLocked(Invalid):
     _msg_fmt = _("Node %(node)s found not to be locked on release")
 
@@ -279,4 +297,69 @@ class NicNotFound(NotFound):
 
 
 class PluginNotFound(NotFound):
-    _msg_fmt = _("plugin for %(name)s could not been loaded.")
\ No newline at end of file
+    _msg_fmt = _("plugin for %(name)s could not been loaded.")
+
+
+class BMCTimeout(XCAT3Exception):
+    _msg_fmt = _("BMC %(bmc)s did not answer.")
+
+
+class BMCUnreachable(XCAT3Exception):
+    _msg_fmt = _("BMC %(bmc)s is unreachable after %(failures)s consecutive "
+                 "timeouts.")
+
+
+class IPMIFailure(XCAT3Exception):
+    _msg_fmt = _("IPMI call to %(bmc)s failed: %(reason)s")
+
+
+class IPMITimeout(IPMIFailure, BMCTimeout):
+    _msg_fmt = _("IPMI call to %(bmc)s timed out after %(attempts)s "
+                 "attempts.")
+
+
+class IPMISessionInvalid(IPMIFailure):
+    _msg_fmt = _("IPMI session with %(bmc)s is not valid anymore: "
+                 "%(reason)s")
+
+
+class RedfishFailure(XCAT3Exception):
+    _msg_fmt = _("Redfish call to %(bmc)s failed: %(reason)s")
+
+
+class RedfishTimeout(RedfishFailure, BMCTimeout):
+    _msg_fmt = _("Redfish call to %(bmc)s failed to connect or timed out: "
+                 "%(reason)s")
+
+
+class ConsoleNotFound(NotFound):
+    _msg_fmt = _("Console of node %(node)s is not open on this conductor.")
+
+
+class ConsoleLimitReached(TemporaryFailure):
+    _msg_fmt = _("Conductor %(host)s already has %(limit)s consoles open.")
+
+
+class DHCPFailure(XCAT3Exception):
+    _msg_fmt = _("Failed to update the DHCP server: %(reason)s")
+
+
+class OmapiFailure(DHCPFailure):
+    _msg_fmt = _("OMAPI call to %(server)s failed: %(reason)s")
+
+
+class OSImageNotFound(NotFound):
+    _msg_fmt = _("OS image %(name)s could not be found.")
+
+
+class BootFileNotFound(NotFound):
+    _msg_fmt = _("Boot file %(name)s could not be found.")
+
+
+class TemplateError(XCAT3Exception):
+    _msg_fmt = _("Failed to load the template %(template)s: %(reason)s")
+
+
+class StatusQueueFull(TemporaryFailure):
+    _msg_fmt = _("The queue of the node statuses is full, %(size)s nodes "
+                 "at most, try again later.")
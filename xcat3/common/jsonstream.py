@@ -0,0 +1,181 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Read the records of a large JSON document one at a time.
+
+The records may be lines of JSON (NDJSON, as written by the export of the
+nodes), a JSON array, or an object with a single array of records such as
+the {"nodes": [...]} files of examples/create_nodes.py. Only the record
+being decoded is kept in memory.
+"""
+
+import codecs
+import json
+import re
+
+from xcat3.common import exception
+from xcat3.common.i18n import _
+
+_READ_SIZE = 64 * 1024
+# The largest record accepted, in characters.
+MAX_RECORD_SIZE = 1024 * 1024
+
+_SPACES = ' \t\r\n'
+
+
+class RecordReader(object):
+    """Iterate over the records of a file object.
+
+    Yields tuples (record, error): error is None, or the message of a line
+    of NDJSON which is not valid JSON, which is skipped. A document which
+    cannot be read further raises InvalidParameterValue.
+
+    :param fileobj: a file object of bytes.
+    :param key: the key of the array of records when the document is an
+                object.
+    :param max_record_size: the largest record accepted, in characters.
+    """
+
+    def __init__(self, fileobj, key='nodes', max_record_size=MAX_RECORD_SIZE):
+        self._file = fileobj
+        self._wrapper = re.compile(r'\{\s*%s\s*:\s*\[' %
+                                   re.escape(json.dumps(key)))
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._max = max_record_size
+        self._buf = u''
+        self._pos = 0
+        self._eof = False
+        # The number of records read.
+        self.count = 0
+
+    def _read(self):
+        if self._eof:
+            return False
+        data = self._file.read(_READ_SIZE)
+        if not data:
+            self._eof = True
+            self._buf += self._utf8.decode(b'', final=True)
+            return False
+        self._buf = self._buf[self._pos:] + self._utf8.decode(data)
+        self._pos = 0
+        return True
+
+    def _skip(self, chars):
+        while True:
+            buf = self._buf
+            pos = self._pos
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            self._pos = pos
+            if pos < len(buf) or not self._read():
+                return
+
+    def _peek(self):
+        return self._buf[self._pos] if self._pos < len(self._buf) else None
+
+    def _fail(self, reason):
+        raise exception.InvalidParameterValue(
+            _('Invalid JSON after record %(count)d: %(reason)s') %
+            {'count': self.count, 'reason': reason})
+
+    def _decode(self, line=False):
+        """Decode the value at the position.
+
+        :param line: the value is on a single line, it is not valid when
+                     the end of the line is read.
+        """
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if line and self._buf.find(u'\n', self._pos) >= 0:
+                    raise
+                if len(self._buf) - self._pos > self._max:
+                    self._fail(_('a record is larger than %d characters') %
+                               self._max)
+                if not self._eof:
+                    self._read()
+                    continue
+                raise
+            # A number could continue in the next read.
+            if end < len(self._buf) or not self._read():
+                self._pos = end
+                return value
+
+    def _array(self):
+        while True:
+            self._skip(_SPACES)
+            char = self._peek()
+            if char == ']':
+                self._pos += 1
+                return
+            if char is None:
+                self._fail(_('the array is not closed'))
+            try:
+                value = self._decode()
+            except ValueError as e:
+                self._fail(e)
+            self.count += 1
+            yield value, None
+            self._skip(_SPACES)
+            char = self._peek()
+            if char == ',':
+                self._pos += 1
+            elif char != ']':
+                self._fail(_('a comma is missing between two records'))
+
+    def _lines(self):
+        while True:
+            self._skip(_SPACES)
+            if self._peek() is None:
+                return
+            try:
+                value = self._decode(line=True)
+            except ValueError as e:
+                # Resume at the next line.
+                end = self._buf.find(u'\n', self._pos)
+                while end < 0 and self._read():
+                    end = self._buf.find(u'\n', self._pos)
+                self._pos = len(self._buf) if end < 0 else end + 1
+                self.count += 1
+                # Without the position of the error, relative to the
+                # buffer.
+                yield None, _('invalid JSON: %s') % str(e).split(':')[0]
+                continue
+            self.count += 1
+            yield value, None
+
+    def __iter__(self):
+        self._skip(_SPACES)
+        char = self._peek()
+        if char == '[':
+            self._pos += 1
+            for record in self._array():
+                yield record
+        elif char == '{':
+            while len(self._buf) - self._pos < 1024 and self._read():
+                pass
+            match = self._wrapper.match(self._buf, self._pos)
+            if match is None:
+                for record in self._lines():
+                    yield record
+                return
+            self._pos = match.end()
+            for record in self._array():
+                yield record
+            self._skip(_SPACES)
+            if self._peek() != '}':
+                self._fail(_('the object of the records is not closed'))
+        elif char is not None:
+            for record in self._lines():
+                yield record
@@ -0,0 +1,176 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Parse the xCAT noderange expressions.
+
+A noderange is a comma separated list of items applied from left to
+right, an item starting with '-' removes its nodes from the nodes of the
+items before it:
+
+    node[001-500],-node[100-199],node150,mgmt1
+
+An item is the name of a node, or names with numbers in brackets: a
+range of numbers start-end, several ranges separated by commas, or a
+single number. The numbers are padded to the width of the start when it
+starts with 0, so node[001-500] is node001 to node500 and node[1-500] is
+node1 to node500.
+
+The ranges are not expanded into names. The last brackets of an item
+become a :class:`Range` of names with a prefix, a suffix and a range of
+digit strings of a single width, which the database matches with a
+predicate on the name. The brackets before the last ones are expanded
+into as many prefixes.
+"""
+
+import collections
+import re
+
+from xcat3.common import exception
+from xcat3.common.i18n import _
+from xcat3.common import utils
+
+# The Range of a prefix, a suffix and the digits between them, of the
+# width of low and high, from low to high.
+Range = collections.namedtuple('Range', ['prefix', 'suffix', 'low',
+                                         'high'])
+
+# The ranges of the brackets before the last ones expanded for an item.
+MAX_PREFIXES = 1000
+
+_BRACKETS_RE = re.compile(r'\[([^\[\]]*)\]')
+_NUMBERS_RE = re.compile(r'^(\d+)(?:-(\d+))?$')
+
+
+def _split(expression):
+    """Split at the commas which are not in brackets."""
+    items = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(expression):
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            items.append(expression[start:i])
+            start = i + 1
+    items.append(expression[start:])
+    return items
+
+
+def _widths(start, end, pad):
+    """Split a range of numbers into ranges of digit strings of a width."""
+    ranges = []
+    number = start
+    while number <= end:
+        width = len('%0*d' % (pad, number))
+        top = min(end, 10 ** width - 1)
+        ranges.append(('%0*d' % (width, number), '%0*d' % (width, top)))
+        number = top + 1
+    return ranges
+
+
+def _numbers(noderange, text):
+    """Return the ranges of digit strings of the content of brackets."""
+    ranges = []
+    for part in text.split(','):
+        match = _NUMBERS_RE.match(part.strip())
+        if match is None:
+            raise exception.InvalidNoderange(
+                noderange=noderange,
+                reason=_('[%s] is not a list of numbers') % text)
+        start, end = match.group(1), match.group(2) or match.group(1)
+        if int(start) > int(end):
+            raise exception.InvalidNoderange(
+                noderange=noderange,
+                reason=_('%(start)s is greater than %(end)s') %
+                {'start': start, 'end': end})
+        pad = len(start) if start.startswith('0') else 1
+        ranges.extend(_widths(int(start), int(end), pad))
+    return ranges
+
+
+def _expand(ranges):
+    """All the digit strings of ranges."""
+    for low, high in ranges:
+        for number in range(int(low), int(high) + 1):
+            yield '%0*d' % (len(low), number)
+
+
+def _check_name(noderange, name):
+    # The digits of the ranges are valid in a name.
+    if not utils.is_valid_logical_name(name):
+        raise exception.InvalidNoderange(
+            noderange=noderange,
+            reason=_('%s is not a valid node name') % name)
+
+
+def _parse_item(noderange, item):
+    """Return the names and the Ranges of an item."""
+    parts = _BRACKETS_RE.split(item)
+    # parts alternate the text around the brackets and their content.
+    texts = parts[0::2]
+    for text in texts:
+        if '[' in text or ']' in text:
+            raise exception.InvalidNoderange(
+                noderange=noderange,
+                reason=_('the brackets of %s are not balanced') % item)
+    if len(parts) == 1:
+        _check_name(noderange, item)
+        return [item]
+    brackets = [_numbers(noderange, text) for text in parts[1::2]]
+    prefixes = [texts[0]]
+    for text, ranges in zip(texts[1:-1], brackets[:-1]):
+        prefixes = [prefix + digits + text for prefix in prefixes
+                    for digits in _expand(ranges)]
+        if len(prefixes) > MAX_PREFIXES:
+            raise exception.InvalidNoderange(
+                noderange=noderange,
+                reason=_('%(item)s has more than %(max)d prefixes') %
+                {'item': item, 'max': MAX_PREFIXES})
+    suffix = texts[-1]
+    result = []
+    for prefix in prefixes:
+        _check_name(noderange, prefix + '0' + suffix)
+        result.extend(Range(prefix, suffix, low, high)
+                      for low, high in brackets[-1])
+    return result
+
+
+def parse(noderange):
+    """Parse a noderange.
+
+    :param noderange: the noderange expression.
+    :raises: InvalidNoderange if the expression is not valid.
+    :returns: a list of (exclude, terms) tuples in the order of the items,
+              exclude is True for the items removing nodes and terms a
+              list of node names and of :class:`Range`.
+    """
+    result = []
+    for item in _split(noderange.strip()):
+        item = item.strip()
+        exclude = item.startswith('-')
+        if exclude:
+            item = item[1:]
+        if not item:
+            raise exception.InvalidNoderange(
+                noderange=noderange, reason=_('an item is empty'))
+        terms = _parse_item(noderange, item)
+        if result and result[-1][0] == exclude:
+            result[-1][1].extend(terms)
+        else:
+            result.append((exclude, terms))
+    if result[0][0]:
+        raise exception.InvalidNoderange(
+            noderange=noderange,
+            reason=_('it starts with the nodes to exclude'))
+    return result
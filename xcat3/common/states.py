@@ -17,6 +17,11 @@
 """
 Mapping of bare metal node states.
 
+The provisioning `state` of a node only changes through the transitions
+of PROVISION_TRANSITIONS, see :func:`next_provision_state`. While a node
+is in a transient provisioning state, its `task_action` is the action in
+progress.
+
 Setting the node `power_state` is handled by the conductor's power
 synchronization thread. Based on the power state retrieved from the driver
 for the node, the state is set to POWER_ON or POWER_OFF, accordingly.
@@ -30,6 +35,8 @@ maintenance mode in this case.
 
 from oslo_log import log as logging
 
+from xcat3.common import exception
+
 LOG = logging.getLogger(__name__)
 
 ##############
@@ -57,4 +64,94 @@ SOFT_POWER_OFF = 'soft power off'
 
 FAIL = 'failed'
 SUCCESS = 'ok'
-DELETED = 'deleted'
\ No newline at end of file
+DELETED = 'deleted'
+LOCKED = 'locked'
+NOT_FOUND = 'not found'
+
+#####################
+# Provisioning states
+#####################
+
+NOSTATE = None
+""" Node was never provisioned, handled as AVAILABLE. """
+
+AVAILABLE = 'available'
+""" Node is ready to be deployed. """
+
+DEPLOYING = 'deploying'
+""" The boot files of the node are being prepared and the node rebooted. """
+
+DEPLOYWAIT = 'wait call-back'
+""" The OS installer of the node is running, waiting for its status. """
+
+ACTIVE = 'active'
+""" Node is deployed with its OS image. """
+
+DEPLOYFAIL = 'deploy failed'
+""" The deployment of the node failed. """
+
+PROVISION_TRANSITIONS = {
+    # (source state, event): target state
+    (AVAILABLE, 'deploy'): DEPLOYING,
+    (ACTIVE, 'deploy'): DEPLOYING,
+    (DEPLOYFAIL, 'deploy'): DEPLOYING,
+    (DEPLOYING, 'wait'): DEPLOYWAIT,
+    (DEPLOYING, 'done'): ACTIVE,
+    (DEPLOYWAIT, 'done'): ACTIVE,
+    (DEPLOYING, 'fail'): DEPLOYFAIL,
+    (DEPLOYWAIT, 'fail'): DEPLOYFAIL,
+    (ACTIVE, 'undeploy'): AVAILABLE,
+    (DEPLOYFAIL, 'undeploy'): AVAILABLE,
+}
+
+PROVISION_EVENTS = frozenset(event for state, event in PROVISION_TRANSITIONS)
+
+PROVISION_ACTIONS = {
+    # transient state: task_action of the nodes in it
+    DEPLOYING: 'deploy',
+    DEPLOYWAIT: 'deploy',
+}
+
+STATUS_EVENTS = {
+    # status reported by a node: provisioning event it triggers
+    'installing': 'wait',
+    'booted': 'done',
+    'failed': 'fail',
+}
+""" The statuses reported by the nodes which move them through the
+provisioning states, the other statuses are only recorded. """
+
+
+def next_provision_state(state, event, node=None):
+    """Return the provisioning state reached by a node on an event.
+
+    :param state: the current provisioning state of the node.
+    :param event: the provisioning event, one of PROVISION_EVENTS.
+    :param node: the name of the node, for the error message.
+    :raises: InvalidStateRequested if the event is not allowed in the
+             state.
+    """
+    target = PROVISION_TRANSITIONS.get((state or AVAILABLE, event))
+    if target is None:
+        raise exception.InvalidStateRequested(action=event, node=node,
+                                              state=state or AVAILABLE)
+    return target
+
+
+def provision_transitions(event):
+    """Return the transitions of an event from any state.
+
+    :param event: the provisioning event, one of PROVISION_EVENTS.
+    :returns: a sorted list of (source, target, task_action) tuples, the
+              nodes which were never provisioned are included with a None
+              source.
+    """
+    transitions = []
+    for (source, name), target in PROVISION_TRANSITIONS.items():
+        if name != event:
+            continue
+        action = PROVISION_ACTIONS.get(target)
+        transitions.append((source, target, action))
+        if source == AVAILABLE:
+            transitions.append((NOSTATE, target, action))
+    return sorted(transitions, key=lambda t: (t[0] or '', t[1]))
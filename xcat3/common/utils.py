@@ -28,6 +28,7 @@ import re
 import shutil
 import six
 import tempfile
+import zlib
 
 from oslo_concurrency import processutils
 from oslo_log import log as logging
@@ -341,3 +342,20 @@ def warn_about_deprecated_extra_vif_port_id():
                         "extra['vif_port_id'] is deprecated and will not "
                         "be supported in Pike release. API endpoint "
                         "v1/nodes/<node>/vifs should be used instead."))
+
+
+def node_conductor(name, hostnames):
+    """Return the conductor in charge of a node.
+
+    A node is always mapped to the same conductor whatever the other
+    nodes of a request, by a hash of its name, as long as the set of
+    conductors does not change. The state a conductor keeps for a node,
+    its console or the health of its BMC, is found again by later
+    requests.
+
+    :param name: the name of the node.
+    :param hostnames: the sorted list of the hostnames of the conductors.
+    :returns: one of the hostnames.
+    """
+    index = (zlib.crc32(name.encode('utf-8')) & 0xffffffff) % len(hostnames)
+    return hostnames[index]
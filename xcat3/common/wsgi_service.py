@@ -17,6 +17,7 @@ from oslo_service import service
 from oslo_service import wsgi
 
 from xcat3.api import app
+from xcat3.api import status
 from xcat3.common import exception
 from xcat3.common.i18n import _
 from xcat3.conf import CONF
@@ -61,6 +62,7 @@ class WSGIService(service.ServiceBase):
         :returns: None
         """
         self.server.stop()
+        status.stop_queue()
 
     def wait(self):
         """Wait for the service to stop serving this API.
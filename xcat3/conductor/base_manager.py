@@ -25,6 +25,7 @@ from oslo_utils import excutils
 from xcat3.common import exception
 from xcat3.common.i18n import _, _LC, _LE, _LI, _LW
 from xcat3.common import rpc
+from xcat3.conductor import task_manager
 from xcat3.conf import CONF
 from xcat3.db import api as dbapi
 from xcat3 import objects
@@ -178,6 +179,21 @@ class BaseConductorManager(object):
         except futurist.RejectedSubmission:
             raise exception.NoFreeConductorWorker()
 
+    @periodics.periodic(spacing=CONF.conductor.reservation_renew_interval)
+    def _renew_reservation_leases(self, context):
+        """Renew the leases of the nodes reserved by running tasks."""
+        holders = task_manager.active_holders()
+        if not holders:
+            return
+        try:
+            count = objects.Node.renew_reservations(context, holders)
+        except db_exception.DBConnectionError:
+            LOG.warning(_LW('Conductor could not connect to database '
+                            'while renewing reservation leases.'))
+            return
+        LOG.debug('Renewed the reservation leases of %(count)d nodes for '
+                  '%(tasks)d tasks', {'count': count, 'tasks': len(holders)})
+
     def _conductor_service_record_keepalive(self):
         while not self._keepalive_evt.is_set():
             try:
@@ -0,0 +1,509 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Serial consoles of the nodes held open by a conductor.
+
+A conductor keeps thousands of consoles open without a thread per console.
+The output of a console is pushed by the I/O loop of its control plugin
+into a bounded ring buffer, replayed to the clients when they attach, and
+into a pending buffer appended to the console log by a single maintenance
+green thread every [console]log_flush_interval seconds. The same thread
+sends the keepalives of the idle consoles and reopens the lost ones.
+
+Clients attach with a one time token, either on the raw TCP port, where
+the first line sent is the token and the rest of the connection is the
+console stream, or on the websocket port with the token in the query
+string. Only the attached clients cost a green thread.
+"""
+
+import collections
+import errno
+import os
+import time
+import uuid
+
+import eventlet
+from eventlet import greenpool
+from eventlet import queue
+from eventlet import websocket
+from eventlet import wsgi
+from oslo_log import log
+import six
+from six.moves.urllib import parse
+
+from xcat3.common import exception
+from xcat3.common.i18n import _, _LE, _LI, _LW
+from xcat3.common import states
+from xcat3.conf import CONF
+
+LOG = log.getLogger(__name__)
+
+OPENING = 'opening'
+OPEN = 'open'
+ERROR = 'error'
+CLOSED = 'closed'
+
+# Longest token line accepted on the raw TCP port.
+_MAX_TOKEN_LINE = 128
+
+
+class _NullLog(object):
+    def write(self, msg):
+        pass
+
+
+class _NodeInfo(object):
+    """The attributes of a node used by the control plugins.
+
+    Kept instead of the node object to keep idle consoles small.
+    """
+
+    __slots__ = ('name', 'mgt', 'control_info')
+
+    def __init__(self, node):
+        self.name = node.name
+        self.mgt = node.mgt
+        self.control_info = node.control_info
+
+
+class _Client(object):
+    """Output queue of a client attached to a console."""
+
+    __slots__ = ('queue', 'stalled')
+
+    def __init__(self):
+        self.queue = queue.LightQueue(CONF.console.client_queue_size)
+        self.stalled = False
+
+    def put(self, data):
+        try:
+            self.queue.put_nowait(data)
+        except queue.Full:
+            # The client does not read fast enough, it is disconnected
+            # rather than growing the queue.
+            self.stalled = True
+
+
+class Console(object):
+    """An open console and the latest output of the node.
+
+    It is the listener given to the open_console method of the control
+    plugin.
+    """
+
+    __slots__ = ('node', 'plugin', 'state', 'error', 'session', 'retry_at',
+                 'last_activity', 'clients', '_chunks', '_size', '_pending')
+
+    def __init__(self, node, plugin):
+        self.node = node
+        self.plugin = plugin
+        self.state = OPENING
+        self.error = None
+        self.session = None
+        self.retry_at = 0
+        self.last_activity = time.time()
+        # Allocated on first use, most consoles of a conductor are idle.
+        self.clients = None
+        self._chunks = None
+        self._size = 0
+        self._pending = None
+
+    @property
+    def name(self):
+        return self.node.name
+
+    def output(self, data):
+        """Record characters written by the node."""
+        self.last_activity = time.time()
+        if self._chunks is None:
+            self._chunks = collections.deque()
+        self._chunks.append(data)
+        self._size += len(data)
+        excess = self._size - CONF.console.buffer_size
+        while excess > 0:
+            head = self._chunks[0]
+            if len(head) <= excess:
+                self._chunks.popleft()
+                self._size -= len(head)
+                excess -= len(head)
+            else:
+                self._chunks[0] = head[excess:]
+                self._size -= excess
+                excess = 0
+        if CONF.console.log_dir:
+            if self._pending is None:
+                self._pending = []
+            self._pending.append(data)
+        for client in self.clients or ():
+            client.put(data)
+
+    def closed(self, reason):
+        """Called by the plugin when the console is closed by the BMC."""
+        if self.state == OPEN:
+            self.fail(reason)
+
+    def fail(self, reason):
+        LOG.warning(_LW('Console of node %(node)s lost: %(reason)s'),
+                    {'node': self.name, 'reason': reason})
+        if self.session is not None:
+            session, self.session = self.session, None
+            eventlet.spawn_n(_discard, session)
+        self.state = ERROR
+        self.error = six.text_type(reason)
+        self.retry_at = time.time() + CONF.console.reconnect_interval
+
+    def backlog(self):
+        """Return the output kept in the ring buffer."""
+        return b''.join(self._chunks or ())
+
+    def take_pending(self):
+        """Return and forget the output not written to the log yet."""
+        pending, self._pending = self._pending, None
+        return b''.join(pending) if pending else None
+
+    def subscribe(self):
+        client = _Client()
+        backlog = self.backlog()
+        if backlog:
+            client.put(backlog)
+        if self.clients is None:
+            self.clients = []
+        self.clients.append(client)
+        return client
+
+    def unsubscribe(self, client):
+        if client in (self.clients or ()):
+            self.clients.remove(client)
+        if not self.clients:
+            self.clients = None
+        client.put(None)
+
+    def write(self, data):
+        """Send characters typed by a client to the node."""
+        session = self.session
+        if session is None:
+            return
+        try:
+            session.write(data)
+        except Exception as e:
+            if session is self.session:
+                self.fail(e)
+        else:
+            self.last_activity = time.time()
+
+
+def _discard(session):
+    try:
+        session.close()
+    except Exception as e:
+        LOG.debug('Failed to close a console session: %s', e)
+
+
+class ConsoleManager(object):
+    """The consoles open on a conductor.
+
+    :param host: the hostname of the conductor.
+    """
+
+    def __init__(self, host):
+        self.host = host
+        self.consoles = {}
+        self._tokens = {}
+        self._pool = greenpool.GreenPool(CONF.console.open_concurrency)
+        self._threads = []
+        self._running = False
+
+    def start(self):
+        """Start the maintenance thread and the client listeners."""
+        if CONF.console.log_dir:
+            try:
+                os.makedirs(CONF.console.log_dir)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    LOG.error(_LE('Cannot create the console log directory '
+                                  '%(dir)s: %(err)s'),
+                              {'dir': CONF.console.log_dir, 'err': e})
+        self._running = True
+        self._threads.append((None, eventlet.spawn(self._maintain)))
+        if CONF.console.port:
+            sock = eventlet.listen((CONF.console.host_ip, CONF.console.port))
+            self._threads.append((sock, eventlet.spawn(
+                eventlet.serve, sock, self._serve_tcp)))
+        if CONF.console.websocket_port:
+            sock = eventlet.listen((CONF.console.host_ip,
+                                    CONF.console.websocket_port))
+            self._threads.append((sock, eventlet.spawn(
+                wsgi.server, sock, websocket.WebSocketWSGI(self._serve_ws),
+                log=_NullLog(), log_output=False)))
+
+    def stop(self):
+        """Close all the consoles and stop the threads."""
+        self._running = False
+        self.close(list(self.consoles))
+        self._pool.waitall()
+        for sock, thread in self._threads:
+            thread.kill()
+            if sock is not None:
+                sock.close()
+        self._threads = []
+
+    def open(self, groups):
+        """Open the consoles of nodes and wait for the result.
+
+        :param groups: a dict of control plugin and list of nodes, see
+                       :func:`xcat3.plugins.mapping.group_nodes`.
+        :returns: a dict of node name and SUCCESS or the error of the node.
+                  A console which failed to open is retried every
+                  [console]reconnect_interval seconds until it is closed,
+                  unless the plugin does not support consoles.
+        """
+        result = dict()
+        threads = []
+        for plugin, nodes in groups.items():
+            for node in nodes:
+                console = self.consoles.get(node.name)
+                if console is not None:
+                    result[node.name] = (states.SUCCESS
+                                         if console.state == OPEN else
+                                         console.error or console.state)
+                    continue
+                if len(self.consoles) >= CONF.console.max_consoles:
+                    result[node.name] = six.text_type(
+                        exception.ConsoleLimitReached(
+                            host=self.host, limit=CONF.console.max_consoles))
+                    continue
+                try:
+                    plugin.validate(node)
+                except Exception as e:
+                    result[node.name] = six.text_type(e)
+                    continue
+                console = Console(_NodeInfo(node), plugin)
+                self.consoles[node.name] = console
+                threads.append((console, self._pool.spawn(self._open,
+                                                          console)))
+        for console, thread in threads:
+            thread.wait()
+            if console.state == OPEN:
+                result[console.name] = states.SUCCESS
+            else:
+                result[console.name] = console.error
+        return result
+
+    def _open(self, console):
+        console.state = OPENING
+        try:
+            session = console.plugin.open_console(console.node, console)
+        except NotImplementedError:
+            self.consoles.pop(console.name, None)
+            console.state = CLOSED
+            console.error = _('Console is not supported by the control '
+                              'plugin %s.') % console.node.mgt
+            return
+        except Exception as e:
+            console.session = None
+            console.fail(e)
+            return
+        if console.state == CLOSED:
+            # Closed while it was opening.
+            _discard(session)
+            return
+        console.session = session
+        console.state = OPEN
+        console.error = None
+        console.last_activity = time.time()
+        LOG.info(_LI('Console of node %s open.'), console.name)
+
+    def close(self, names):
+        """Close the consoles of nodes.
+
+        :param names: the names of the nodes.
+        :returns: a dict of node name and SUCCESS or the error of the node.
+        """
+        result = dict()
+        for name in names:
+            console = self.consoles.pop(name, None)
+            if console is None:
+                result[name] = six.text_type(
+                    exception.ConsoleNotFound(node=name))
+                continue
+            console.state = CLOSED
+            for client in list(console.clients or ()):
+                console.unsubscribe(client)
+            if console.session is not None:
+                session, console.session = console.session, None
+                self._pool.spawn_n(_discard, session)
+            self._write_log(console)
+            result[name] = states.SUCCESS
+        return result
+
+    def connection_info(self, names):
+        """Return how clients attach to the consoles of nodes.
+
+        A new one time token valid [console]token_ttl seconds is issued
+        for each console.
+
+        :param names: the names of the nodes.
+        :returns: a dict of node name and a dict with the state of the
+                  console, the token and the URLs to attach to it, or the
+                  error of the node.
+        """
+        address = CONF.console.public_address or CONF.host
+        result = dict()
+        for name in names:
+            console = self.consoles.get(name)
+            if console is None:
+                result[name] = six.text_type(
+                    exception.ConsoleNotFound(node=name))
+                continue
+            token = uuid.uuid4().hex
+            self._tokens[token] = (name, time.time() + CONF.console.token_ttl)
+            info = {'state': console.state, 'error': console.error,
+                    'token': token}
+            if CONF.console.port:
+                info['tcp'] = '%s:%d' % (address, CONF.console.port)
+            if CONF.console.websocket_port:
+                info['websocket'] = 'ws://%s:%d/?token=%s' % (
+                    address, CONF.console.websocket_port, token)
+            result[name] = info
+        return result
+
+    def _redeem(self, token):
+        name, expires = self._tokens.pop(token, (None, 0))
+        if expires < time.time():
+            return None
+        return self.consoles.get(name)
+
+    def _attach(self, console, send, receive, disconnect):
+        """Stream a console to a client until either end closes."""
+        client = console.subscribe()
+
+        def _forward():
+            try:
+                while not client.stalled:
+                    data = client.queue.get()
+                    if data is None:
+                        break
+                    send(data)
+            except Exception as e:
+                LOG.debug('Console client of node %(node)s lost: %(err)s',
+                          {'node': console.name, 'err': e})
+            finally:
+                disconnect()
+
+        writer = eventlet.spawn(_forward)
+        try:
+            while True:
+                data = receive()
+                if not data:
+                    break
+                console.write(data)
+        except Exception as e:
+            LOG.debug('Console client of node %(node)s lost: %(err)s',
+                      {'node': console.name, 'err': e})
+        finally:
+            console.unsubscribe(client)
+            writer.wait()
+
+    def _serve_tcp(self, sock, address):
+        try:
+            # Read byte by byte to not consume the console input following
+            # the token.
+            line = b''
+            while len(line) < _MAX_TOKEN_LINE and not line.endswith(b'\n'):
+                data = sock.recv(1)
+                if not data:
+                    return
+                line += data
+            console = self._redeem(line.strip().decode('ascii', 'replace'))
+            if console is None:
+                sock.sendall(b'ERROR: invalid console token\r\n')
+                return
+
+            def _disconnect():
+                try:
+                    sock.shutdown(2)
+                except Exception:
+                    pass
+
+            self._attach(console, sock.sendall, lambda: sock.recv(4096),
+                         _disconnect)
+        finally:
+            sock.close()
+
+    def _serve_ws(self, ws):
+        query = parse.parse_qs(ws.environ.get('QUERY_STRING', ''))
+        console = self._redeem((query.get('token') or [''])[0])
+        if console is None:
+            ws.close()
+            return
+
+        def _receive():
+            data = ws.wait()
+            if isinstance(data, six.text_type):
+                data = data.encode('utf-8')
+            return data
+
+        self._attach(console, ws.send, _receive, ws.close)
+
+    def _write_log(self, console):
+        data = console.take_pending()
+        if not data:
+            return
+        path = os.path.join(CONF.console.log_dir,
+                            console.name.replace(os.sep, '_') + '.log')
+        try:
+            with open(path, 'ab') as f:
+                f.write(data)
+                size = f.tell()
+            if CONF.console.log_max_bytes and (
+                    size > CONF.console.log_max_bytes):
+                os.rename(path, path + '.1')
+        except (IOError, OSError) as e:
+            LOG.error(_LE('Failed to write the console log of node '
+                          '%(node)s: %(err)s'),
+                      {'node': console.name, 'err': e})
+
+    def _maintain(self):
+        """Flush the logs, keep the consoles alive and reopen the lost."""
+        while self._running:
+            eventlet.sleep(CONF.console.log_flush_interval)
+            try:
+                self._maintain_once()
+            except Exception as e:
+                LOG.exception(_LE('Console maintenance failed: %s'), e)
+
+    def _maintain_once(self):
+        now = time.time()
+        for token, (name, expires) in list(self._tokens.items()):
+            if expires < now:
+                del self._tokens[token]
+        for console in list(self.consoles.values()):
+            if CONF.console.log_dir:
+                self._write_log(console)
+            if console.state == ERROR and console.retry_at <= now:
+                console.state = OPENING
+                self._pool.spawn_n(self._open, console)
+            elif console.state == OPEN and (
+                    now - console.last_activity >=
+                    CONF.console.keepalive_interval):
+                console.last_activity = now
+                self._pool.spawn_n(self._keepalive, console)
+
+    def _keepalive(self, console):
+        session = console.session
+        if session is None:
+            return
+        try:
+            session.keepalive()
+        except Exception as e:
+            if session is console.session:
+                console.fail(e)
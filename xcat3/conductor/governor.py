@@ -0,0 +1,200 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Pace the control plugin calls of a conductor.
+
+A call towards the BMC of a node is started once a slot is free under the
+global concurrency cap and both the token bucket of the control plugin of
+the node and the one of the subnet of its BMC have a token. The rate of a
+subnet is halved when its BMCs time out and slowly grows back as calls
+succeed, so a congested management network gets less traffic.
+"""
+
+import collections
+import time
+
+import eventlet
+from eventlet import semaphore
+import netaddr
+
+from xcat3.common import exception
+from xcat3.conf import CONF
+
+GLOBAL = 'global'
+
+
+class TokenBucket(object):
+    """A token bucket refilled at rate tokens per second."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._stamp = time.time()
+
+    def delay(self):
+        """Return the seconds to wait for a token, 0 if one is available."""
+        now = time.time()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class Governor(object):
+    """Admission control of the control plugin calls."""
+
+    def __init__(self):
+        self._slots = semaphore.Semaphore(CONF.governor.max_concurrency)
+        self._plugins = dict()
+        self._subnets = dict()
+        self._last_decrease = dict()
+        self._waiting = collections.Counter()
+        self._running = collections.Counter()
+
+    @staticmethod
+    def subnet(node):
+        """Return the subnet of the BMC of the node, None if unknown."""
+        address = (node.control_info or {}).get('bmc_address')
+        if not address:
+            return None
+        try:
+            ip = netaddr.IPAddress(address)
+        except (netaddr.AddrFormatError, ValueError):
+            # A host name, it is its own group.
+            return address
+        prefix = CONF.governor.subnet_prefix if ip.version == 4 else 64
+        return str(netaddr.IPNetwork('%s/%d' % (ip, prefix)).cidr)
+
+    def _keys(self, node):
+        keys = [GLOBAL, ('plugin', node.mgt)]
+        subnet = self.subnet(node)
+        if subnet is not None:
+            keys.append(('subnet', subnet))
+        return keys, subnet
+
+    def _buckets(self, node, subnet):
+        buckets = []
+        bucket = self._plugins.get(node.mgt)
+        if bucket is None:
+            bucket = self._plugins[node.mgt] = TokenBucket(
+                CONF.governor.plugin_rate, CONF.governor.plugin_burst)
+        buckets.append(bucket)
+        if subnet is not None:
+            bucket = self._subnets.get(subnet)
+            if bucket is None:
+                bucket = self._subnets[subnet] = TokenBucket(
+                    CONF.governor.subnet_rate, CONF.governor.subnet_burst)
+            buckets.append(bucket)
+        return buckets
+
+    def done(self, node, result=None):
+        """Release the call of the node and adapt the rate of its subnet.
+
+        :param node: the node yielded by :meth:`admit`.
+        :param result: the result of the call, an exception if it failed.
+        """
+        keys, subnet = self._keys(node)
+        self._running.subtract(keys)
+        self._slots.release()
+        bucket = self._subnets.get(subnet)
+        if bucket is None:
+            return
+        if isinstance(result, exception.BMCTimeout):
+            # Lower the rate at most once per second, all the calls in
+            # flight time out together when the network is congested.
+            now = time.time()
+            if now - self._last_decrease.get(subnet, 0) >= 1:
+                self._last_decrease[subnet] = now
+                bucket.rate = max(CONF.governor.subnet_min_rate,
+                                  bucket.rate / 2)
+        elif not isinstance(result, Exception):
+            bucket.rate = min(CONF.governor.subnet_rate, bucket.rate + 1)
+
+    def admit(self, nodes, admitted=None):
+        """Yield the nodes as their calls are allowed to start.
+
+        The nodes are served round robin by subnet, so a subnet waiting for
+        tokens does not hold back the nodes of the other subnets. Every
+        node yielded must be reported to :meth:`done`.
+
+        :param nodes: an iterable of nodes.
+        :param admitted: optional list the admitted nodes are appended to.
+        """
+        queues = collections.OrderedDict()
+        for node in nodes:
+            keys, subnet = self._keys(node)
+            self._waiting.update(keys)
+            queues.setdefault(subnet, collections.deque()).append(
+                (node, keys, self._buckets(node, subnet)))
+        try:
+            while queues:
+                self._slots.acquire()
+                try:
+                    node, keys = self._next(queues)
+                except BaseException:
+                    self._slots.release()
+                    raise
+                self._waiting.subtract(keys)
+                self._running.update(keys)
+                if admitted is not None:
+                    admitted.append(node)
+                yield node
+        finally:
+            for queue in queues.values():
+                for node, keys, buckets in queue:
+                    self._waiting.subtract(keys)
+
+    @staticmethod
+    def _next(queues):
+        """Pop the first node whose buckets have a token, wait if none."""
+        while True:
+            delays = []
+            for subnet, queue in queues.items():
+                node, keys, buckets = queue[0]
+                delay = max(bucket.delay() for bucket in buckets)
+                if delay:
+                    delays.append(delay)
+                    continue
+                for bucket in buckets:
+                    bucket.take()
+                queue.popleft()
+                # Move the subnet to the end for the round robin.
+                del queues[subnet]
+                if queue:
+                    queues[subnet] = queue
+                return node, keys
+            eventlet.sleep(min(delays))
+
+    def stats(self):
+        """Return the queue depths and rates of the governor.
+
+        :returns: a dict with the number of calls waiting and running in
+                  total, by plugin and by subnet, and the current rate of
+                  the subnets.
+        """
+        stats = {'waiting': self._waiting[GLOBAL],
+                 'running': self._running[GLOBAL],
+                 'plugins': {}, 'subnets': {}}
+        for kind, buckets in (('plugin', self._plugins),
+                              ('subnet', self._subnets)):
+            for name, bucket in buckets.items():
+                key = (kind, name)
+                stats[kind + 's'][name] = {'waiting': self._waiting[key],
+                                           'running': self._running[key],
+                                           'rate': bucket.rate}
+        return stats
@@ -0,0 +1,112 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Track the health of the BMCs with a circuit breaker per BMC.
+
+A BMC is ``ok`` until [conductor]bmc_failure_threshold calls in a row time
+out. It is then ``unreachable``: the calls towards it fail immediately.
+After [conductor]bmc_probe_interval seconds one call is let through as a
+probe while the others keep failing fast. The BMC is ``ok`` again if the
+probe succeeds, otherwise it stays ``unreachable`` for another interval.
+"""
+
+import time
+
+from xcat3.common import exception
+from xcat3.conf import CONF
+
+OK = 'ok'
+UNREACHABLE = 'unreachable'
+PROBING = 'probing'
+
+
+class _Breaker(object):
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probe_at = None
+
+
+class HealthTracker(object):
+    """Circuit breakers of the BMCs, keyed by BMC address."""
+
+    def __init__(self):
+        # Only the BMCs with failures are tracked.
+        self._breakers = dict()
+
+    @staticmethod
+    def _key(node):
+        return (node.control_info or {}).get('bmc_address')
+
+    def check(self, node):
+        """Check whether a call towards the BMC of the node may start.
+
+        :param node: the node to act on.
+        :raises: BMCUnreachable if the call should fail fast.
+        """
+        breaker = self._breakers.get(self._key(node))
+        if breaker is None or breaker.opened_at is None:
+            return
+        now = time.time()
+        interval = CONF.conductor.bmc_probe_interval
+        if now - breaker.opened_at >= interval and (
+                breaker.probe_at is None or now - breaker.probe_at >= interval):
+            # Half open, let this call probe the BMC. A probe which never
+            # reported back is replaced after an interval.
+            breaker.probe_at = now
+            return
+        raise exception.BMCUnreachable(bmc=self._key(node),
+                                       failures=breaker.failures)
+
+    def record(self, node, result):
+        """Record the result of a call towards the BMC of the node.
+
+        :param node: the node the call was made for.
+        :param result: the result of the call, an exception if it failed.
+            Only :class:`BMCTimeout` counts as a failure, the other errors
+            prove the BMC answers.
+        """
+        key = self._key(node)
+        if key is None:
+            return
+        breaker = self._breakers.get(key)
+        if not isinstance(result, exception.BMCTimeout):
+            if breaker is not None:
+                del self._breakers[key]
+            return
+        if breaker is None:
+            breaker = self._breakers[key] = _Breaker()
+        breaker.failures += 1
+        breaker.probe_at = None
+        if (breaker.opened_at is not None or
+                breaker.failures >= CONF.conductor.bmc_failure_threshold):
+            breaker.opened_at = time.time()
+
+    def state(self, node):
+        """Return the health of the BMC of the node.
+
+        :returns: a dict with the ``state`` of the BMC, the number of
+                  consecutive ``failures`` and, while unreachable, the
+                  seconds until the ``next_probe``.
+        """
+        breaker = self._breakers.get(self._key(node))
+        if breaker is None:
+            return {'state': OK, 'failures': 0}
+        if breaker.opened_at is None:
+            return {'state': OK, 'failures': breaker.failures}
+        now = time.time()
+        if breaker.probe_at is not None and (
+                now - breaker.probe_at < CONF.conductor.bmc_probe_interval):
+            return {'state': PROBING, 'failures': breaker.failures}
+        next_probe = breaker.opened_at + CONF.conductor.bmc_probe_interval
+        return {'state': UNREACHABLE, 'failures': breaker.failures,
+                'next_probe': max(0, int(next_probe - now))}
@@ -0,0 +1,85 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Store the inventory collected from the nodes incrementally.
+
+The inventory of a node is normalized into components keyed by category
+and name. A hash of each component and of the whole inventory is kept in
+the database, a collection whose hash matches the stored one only marks
+the inventory as collected. Otherwise only the components whose hash
+changed are written.
+"""
+
+import hashlib
+import json
+
+import six
+
+from xcat3 import objects
+from xcat3.conf import CONF
+
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+
+
+def _digest(data):
+    text = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def normalize(inventory):
+    """Flatten the inventory returned by a control plugin.
+
+    :param inventory: a dict of category and a dict of component name and
+                      attributes, as returned by the get_inventory method
+                      of the control plugins.
+    :returns: a tuple (content_hash, items), items is a dict of (category,
+              name) and a tuple (content_hash, data) of the component.
+    """
+    items = dict()
+    for category, components in (inventory or {}).items():
+        for name, data in (components or {}).items():
+            key = (six.text_type(category), six.text_type(name))
+            items[key] = (_digest(data), data)
+    content_hash = _digest(sorted('%s/%s/%s' % (key[0], key[1], value[0])
+                                  for key, value in items.items()))
+    return content_hash, items
+
+
+def store(context, collected):
+    """Store the inventory collected from nodes.
+
+    The database is written in batches of [conductor]inventory_batch_size
+    nodes.
+
+    :param context: an admin context.
+    :param collected: a dict of node id and the inventory of the node.
+    :returns: a dict of node id and CHANGED or UNCHANGED.
+    """
+    result = dict()
+    node_ids = list(collected)
+    size = CONF.conductor.inventory_batch_size
+    for i in range(0, len(node_ids), size):
+        batch = node_ids[i:i + size]
+        hashes = objects.Inventory.get_hashes(context, batch)
+        changed = dict()
+        unchanged = []
+        for node_id in batch:
+            content_hash, items = normalize(collected[node_id])
+            if hashes.get(node_id) == content_hash:
+                unchanged.append(node_id)
+                result[node_id] = UNCHANGED
+            else:
+                changed[node_id] = (content_hash, items)
+                result[node_id] = CHANGED
+        objects.Inventory.update_many(context, changed, unchanged)
+    return result
@@ -19,18 +19,32 @@
 
 """
 
+import collections
+import functools
+
 from oslo_log import log
 import oslo_messaging as messaging
+from futurist import periodics
 from futurist import waiters
+import six
 
 from xcat3.common import exception
+from xcat3.common import utils
 from xcat3.conductor import base_manager
+from xcat3.conductor import console
+from xcat3.conductor import governor
+from xcat3.conductor import health
+from xcat3.conductor import inventory
+from xcat3.conductor import provision
+from xcat3.conductor import sensors
 from xcat3.conductor import task_manager
 from xcat3.conf import CONF
 from xcat3 import objects
+from xcat3.plugins.boot import dhcp
+from xcat3.plugins.boot import fileserver
+from xcat3.plugins import mapping
 from xcat3.common import states as xcat3_states
 from xcat3.common.i18n import _, _LE, _LI, _LW
-from xcat3.plugins import mapping
 
 MANAGER_TOPIC = 'xcat3.conductor_manager'
 
@@ -46,39 +60,225 @@ class ConductorManager(base_manager.BaseConductorManager):
 
     def __init__(self, host, topic):
         super(ConductorManager, self).__init__(host, topic)
+        self.governor = governor.Governor()
+        self.health = health.HealthTracker()
+        self.consoles = console.ConsoleManager(self.host)
+        self.boot_files = fileserver.BootFileServer()
+        self._dhcp_hosts = None
+
+    def init_host(self, admin_context=None):
+        super(ConductorManager, self).init_host(admin_context)
+        self.consoles.start()
+        self.boot_files.start()
+
+    def del_host(self, deregister=True):
+        if self._started:
+            self.boot_files.stop()
+            self.consoles.stop()
+        super(ConductorManager, self).del_host(deregister)
+
+    def _finish_node_call(self, node, result):
+        """Account the result of a control plugin call for a node."""
+        self.governor.done(node, result)
+        self.health.record(node, result)
+
+    def _collect_bulk_results(self, results, collector, admitted):
+        """Store the per node results yielded by a bulk plugin method."""
+        try:
+            for node, ret in results:
+                self._finish_node_call(node, ret)
+                collector[node.name] = ret
+        except Exception as e:
+            for node in admitted:
+                if node.name not in collector:
+                    self._finish_node_call(node, e)
+            raise
+
+    @periodics.periodic(spacing=CONF.governor.stats_interval)
+    def _log_governor_stats(self, context):
+        """Log the queue depths of the governor while calls are queued."""
+        stats = self.governor.stats()
+        if not stats['waiting']:
+            return
+        busy = dict((subnet, s['waiting'])
+                    for subnet, s in stats['subnets'].items() if s['waiting'])
+        LOG.info(_LI('Governor: %(running)d plugin calls running, '
+                     '%(waiting)d waiting, waiting by subnet: %(subnets)s'),
+                 {'running': stats['running'], 'waiting': stats['waiting'],
+                  'subnets': busy})
+
+    def _sensor_node_names(self):
+        """Return the names of the nodes whose sensors this conductor reads.
+
+        Each node is sampled by the conductor it is mapped to by
+        :func:`xcat3.common.utils.node_conductor`, the one which keeps the
+        health of its BMC.
+        """
+        hosts = sorted(c.hostname for c in self.dbapi.get_conductors())
+        if self.host not in hosts:
+            return []
+        names = [row[0] for row in self.dbapi.get_nodeinfo_list(
+            columns=['name'], sort_key='id')]
+        return [name for name in names
+                if utils.node_conductor(name, hosts) == self.host]
+
+    @periodics.periodic(spacing=CONF.conductor.send_sensor_data_interval,
+                        enabled=CONF.conductor.send_sensor_data)
+    def _send_sensor_data(self, context):
+        """Read the sensors of the nodes and send them in batches.
 
-    def _process_nodes_worker(self, func, nodes, *args, **kwargs):
-        """Wait the result from rpc call.
-        :param func: the function should be called with green thread
-        :param nodes: the list of rpc nodes
+        The sensors are read through the control plugins, batch by batch,
+        with the same pacing as the power operations. The readings of many
+        nodes are packed into each notification, see
+        :class:`xcat3.conductor.sensors.MessageBuilder`.
+        """
+        names = self._sensor_node_names()
+        builder = sensors.MessageBuilder(
+            self.host, CONF.conductor.send_sensor_data_max_message_size)
+        batch_size = CONF.conductor.send_sensor_data_batch_size
+        sent = failed = messages = 0
+        for i in range(0, len(names), batch_size):
+            try:
+                with task_manager.acquire(
+                        context, names[i:i + batch_size], shared=True,
+                        partial=True,
+                        purpose='sensor data collection') as task:
+                    result = self._process_nodes_worker('get_sensors_data',
+                                                        task)
+            except exception.XCAT3Exception as e:
+                LOG.warning(_LW('Failed to read the sensors of %(count)d '
+                                'nodes: %(err)s'),
+                            {'count': len(names[i:i + batch_size]),
+                             'err': e})
+                continue
+            for name, data in result.items():
+                if not isinstance(data, dict):
+                    failed += 1
+                    continue
+                sent += 1
+                for payload in builder.add(name, data):
+                    self.sensors_notifier.info(context, sensors.EVENT_TYPE,
+                                               payload)
+                    messages += 1
+        for payload in builder.flush():
+            self.sensors_notifier.info(context, sensors.EVENT_TYPE, payload)
+            messages += 1
+        LOG.debug('Sent the sensor data of %(sent)d nodes in %(messages)d '
+                  'notifications, %(failed)d nodes could not be read.',
+                  {'sent': sent, 'messages': messages, 'failed': failed})
+
+    @periodics.periodic(spacing=CONF.dhcp.sync_interval,
+                        enabled=CONF.dhcp.enabled)
+    def _sync_dhcp_hosts(self, context):
+        """Apply the changes of the nics to the local DHCP server.
+
+        Only the entries added, changed or removed since the previous run
+        are applied, see :class:`xcat3.plugins.boot.dhcp.HostTracker`.
+        """
+        if self._dhcp_hosts is None:
+            self._dhcp_hosts = dhcp.HostTracker(self.dbapi)
+        try:
+            self._dhcp_hosts.sync(mapping.get_dhcp_plugin(CONF.dhcp.backend))
+        except exception.XCAT3Exception as e:
+            LOG.error(_LE('Failed to synchronize the DHCP host entries: '
+                          '%s'), e)
+
+    def _release_node_call(self, node, future):
+        self._finish_node_call(node, future.exception())
+
+    def _process_nodes_worker(self, method, task, *args):
+        """Call the control plugin method for the nodes and wait the result.
+
+        Nodes are grouped by their control plugin. If the plugin implements
+        the bulk variant of the method (``<method>_many``), all the nodes of
+        the plugin are passed to it within one green thread, otherwise one
+        green thread is spawned for each node. In both cases the calls are
+        paced by the governor of the conductor, a node is only handed to
+        the plugin once its call is allowed to start. The nodes whose BMC
+        is unreachable fail fast without calling the plugin.
+
+        :param method: the name of the per node control plugin method.
+        :param task: the task holding the nodes.
+        :param args: additional arguments passed to the plugin method.
+        :returns: a dict of node name and the result for the node.
 
         """
+        nodes = task.nodes
+        plugins, errors = task.plugins
+        result = dict(errors)
+        groups = collections.OrderedDict()
+        for control_plugin, plugin_nodes in plugins.items():
+            for node in plugin_nodes:
+                try:
+                    control_plugin.validate(node)
+                    self.health.check(node)
+                except Exception as e:
+                    result[node.name] = six.text_type(e)
+                    continue
+                groups.setdefault(control_plugin, []).append(node)
+
         futures = []
-        for node in nodes:
-            future = self._spawn_worker(func, node=node, *args, **kwargs)
-            setattr(future, 'node', node)
-            futures.append(future)
+        bulk_results = dict()
+        for control_plugin, plugin_nodes in groups.items():
+            admitted = []
+            try:
+                results = getattr(control_plugin, method + '_many')(
+                    self.governor.admit(plugin_nodes, admitted), *args)
+            except NotImplementedError:
+                for node in self.governor.admit(plugin_nodes):
+                    try:
+                        future = self._spawn_worker(
+                            getattr(control_plugin, method), node, *args)
+                    except Exception as e:
+                        self._finish_node_call(node, e)
+                        raise
+                    setattr(future, 'node', node)
+                    future.add_done_callback(
+                        functools.partial(self._release_node_call, node))
+                    futures.append(future)
+            else:
+                future = self._spawn_worker(self._collect_bulk_results,
+                                            results, bulk_results, admitted)
+                setattr(future, 'nodes', plugin_nodes)
+                futures.append(future)
 
         done, not_done = waiters.wait_for_all(futures, CONF.conductor.timeout)
         msg = "Timeout after waiting %(timeout)d seconds" % {
             "timeout": CONF.conductor.timeout}
-        result = dict((node.name, msg) for node in nodes)
+        for node in nodes:
+            result.setdefault(node.name, msg)
         for r in done:
-            node = getattr(r, 'node')
-            if r.exception():
-                result[node.name] = r.exception().message
-            else:
-                result[node.name] = r.result() if r.result() else \
-                    xcat3_states.SUCCESS
+            node = getattr(r, 'node', None)
+            if node is not None:
+                result[node.name] = r.exception() or r.result()
+            elif r.exception():
+                # The bulk worker failed, nodes without result share its
+                # error.
+                for node in getattr(r, 'nodes'):
+                    bulk_results.setdefault(node.name, r.exception())
+        result.update(bulk_results)
 
+        for name, ret in result.items():
+            if isinstance(ret, Exception):
+                result[name] = six.text_type(ret)
+            elif not ret:
+                result[name] = xcat3_states.SUCCESS
         return result
 
+    @task_manager.require_exclusive_lock
+    def _set_power_state(self, task, target):
+        return self._process_nodes_worker('set_power_state', task, target)
+
     @messaging.expected_exceptions(exception.InvalidParameterValue,
                                    exception.NoFreeConductorWorker,
                                    exception.NodeLocked)
     def change_power_state(self, context, names, target):
         """RPC method to encapsulate changes to a node's state.
 
+        The nodes are locked in partial mode, nodes which are locked by
+        other tasks or do not exist are reported as such in the result
+        rather than failing the whole request.
+
         :param context: an admin context.
         :param names: the names of nodes.
         :param target: the desired power state of the node.
@@ -92,24 +292,22 @@ class ConductorManager(base_manager.BaseConductorManager):
                  "The desired new state is %(target)s.",
                  {'nodes': str(names), 'target': target})
 
-        def _change_power_state(node, target):
-            control_plugin, os_plugin, boot_plugin = mapping.get_plugin(node)
-            control_plugin.validate(node)
-            control_plugin.set_power_state(node, target)
-
-        with task_manager.acquire(context, names,
-                                  purpose='nodes deletion') as task:
-            result = self._process_nodes_worker(_change_power_state,
-                                                nodes=task.nodes,
-                                                target=target)
+        with task_manager.acquire(context, names, partial=True,
+                                  purpose='power state change') as task:
+            result = self._set_power_state(task, target)
+            result.update(task.unavailable)
             return result
 
     @messaging.expected_exceptions(exception.InvalidParameterValue,
                                    exception.NoFreeConductorWorker,
-                                   exception.NodeLocked)
+                                   exception.NodeNotAvailable)
     def get_power_state(self, context, names):
         """RPC method to get a node's power state.
 
+        This is a read-only operation, the nodes are loaded with a shared
+        task so no reservation is written to the database and concurrent
+        power changes on the same nodes are not blocked.
+
         :param context: an admin context.
         :param names: the names of nodes.
         :raises: NoFreeConductorWorker when there is no free worker to start
@@ -121,17 +319,153 @@ class ConductorManager(base_manager.BaseConductorManager):
         LOG.info("RPC get_power_state called for nodes %(nodes)s. " %
                  {'nodes': str(names)})
 
-        def _get_power_state(node):
-            control_plugin, os_plugin, boot_plugin = mapping.get_plugin(node)
-            control_plugin.validate(node)
-            return control_plugin.get_power_state(node)
+        with task_manager.acquire(context, names, shared=True, partial=True,
+                                  purpose='power state query') as task:
+            result = self._process_nodes_worker('get_power_state', task)
+            result.update(task.unavailable)
+            return result
+
+    @messaging.expected_exceptions(exception.NodeNotAvailable)
+    def get_bmc_health(self, context, names):
+        """RPC method to get the health of the BMCs of nodes.
 
-        with task_manager.acquire(context, names,
-                                  purpose='nodes deletion') as task:
-            result = self._process_nodes_worker(_get_power_state,
-                                                nodes=task.nodes)
+        The health is tracked by each conductor for the calls it made.
+
+        :param context: an admin context.
+        :param names: the names of nodes.
+        :returns: a dict of node name and the health of its BMC, see
+                  :meth:`xcat3.conductor.health.HealthTracker.state`.
+
+        """
+        with task_manager.acquire(context, names, shared=True, partial=True,
+                                  purpose='bmc health query') as task:
+            result = dict((node.name, self.health.state(node))
+                          for node in task.nodes)
+            result.update(task.unavailable)
             return result
 
+    def get_governor_stats(self, context):
+        """RPC method to get the queue depths of the governor.
+
+        :param context: an admin context.
+        :returns: a dict, see :meth:`xcat3.conductor.governor.Governor.stats`.
+
+        """
+        return self.governor.stats()
+
+    @messaging.expected_exceptions(exception.InvalidParameterValue,
+                                   exception.NoFreeConductorWorker,
+                                   exception.NodeNotAvailable)
+    def collect_inventory(self, context, names):
+        """RPC method to collect the hardware inventory of nodes.
+
+        The inventory is read through the control plugins with the same
+        pacing as the power operations, then compared with the stored one
+        so only the nodes whose inventory changed are written.
+
+        :param context: an admin context.
+        :param names: the names of nodes.
+        :raises: NoFreeConductorWorker when there is no free worker to start
+                 async task.
+        :returns: a dict of node name and 'changed' or 'unchanged', or the
+                  error of the node.
+
+        """
+        LOG.info("RPC collect_inventory called for nodes %(nodes)s.",
+                 {'nodes': str(names)})
+
+        with task_manager.acquire(context, names, shared=True, partial=True,
+                                  purpose='inventory collection') as task:
+            result = self._process_nodes_worker('get_inventory', task)
+            collected = dict((node.id, result[node.name])
+                             for node in task.nodes
+                             if isinstance(result.get(node.name), dict))
+            stored = inventory.store(context, collected)
+            for node in task.nodes:
+                if node.id in stored:
+                    result[node.name] = stored[node.id]
+            result.update(task.unavailable)
+            return result
+
+    @messaging.expected_exceptions(exception.InvalidParameterValue,
+                                   exception.NodeNotAvailable)
+    def set_provision_state(self, context, names, event):
+        """RPC method to move nodes through the provisioning states.
+
+        The nodes are loaded with a shared task, the transitions are
+        conditioned on the state the nodes were loaded in instead.
+
+        :param context: an admin context.
+        :param names: the names of nodes.
+        :param event: the provisioning event, see
+                      states.PROVISION_EVENTS.
+        :raises: InvalidParameterValue if the event is unknown.
+        :returns: a dict of node name and 'ok' or the error of the node.
+
+        """
+        LOG.info("RPC set_provision_state called for nodes %(nodes)s. "
+                 "The event is %(event)s.",
+                 {'nodes': str(names), 'event': event})
+        if event not in xcat3_states.PROVISION_EVENTS:
+            raise exception.InvalidParameterValue(
+                err=_('Unknown provisioning event %s') % event)
+
+        with task_manager.acquire(context, names, shared=True, partial=True,
+                                  purpose='provision state change') as task:
+            result = provision.transition(context, task.nodes, event)
+            result.update(task.unavailable)
+            return result
+
+    @messaging.expected_exceptions(exception.NodeNotAvailable)
+    def start_console(self, context, names):
+        """RPC method to open the serial consoles of nodes.
+
+        The consoles stay open on this conductor until they are stopped,
+        the lost ones are reopened periodically.
+
+        :param context: an admin context.
+        :param names: the names of nodes.
+        :returns: a dict of node name and 'success' or the error of the
+                  node.
+
+        """
+        LOG.info("RPC start_console called for nodes %(nodes)s.",
+                 {'nodes': str(names)})
+
+        with task_manager.acquire(context, names, shared=True, partial=True,
+                                  purpose='console start') as task:
+            plugins, errors = task.plugins
+            result = dict((name, six.text_type(e))
+                          for name, e in errors.items())
+            result.update(self.consoles.open(plugins))
+            result.update(task.unavailable)
+            return result
+
+    def stop_console(self, context, names):
+        """RPC method to close the serial consoles of nodes.
+
+        :param context: an admin context.
+        :param names: the names of nodes.
+        :returns: a dict of node name and 'success' or the error of the
+                  node.
+
+        """
+        LOG.info("RPC stop_console called for nodes %(nodes)s.",
+                 {'nodes': str(names)})
+        return self.consoles.close(names)
+
+    def get_console(self, context, names):
+        """RPC method to get how to attach to the consoles of nodes.
+
+        :param context: an admin context.
+        :param names: the names of nodes.
+        :returns: a dict of node name and the state of its console, a one
+                  time token and the URLs to attach to it, or the error of
+                  the node.
+
+        """
+        return self.consoles.connection_info(names)
+
     @messaging.expected_exceptions(exception.InvalidParameterValue,
                                    exception.NoFreeConductorWorker,
                                    exception.NodeLocked)
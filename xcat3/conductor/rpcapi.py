@@ -25,7 +25,9 @@ from futurist import waiters
 import oslo_messaging as messaging
 
 from xcat3.common import exception
+from xcat3.common.i18n import _
 from xcat3.common import rpc
+from xcat3.common import utils
 from xcat3.conductor import manager
 from xcat3.conf import CONF
 from xcat3.db import api as dbapi
@@ -117,6 +119,74 @@ class ConductorAPI(object):
 
         return topic_dict
 
+    def get_node_topic_for(self, nodes):
+        """Get the RPC topic of the conductor in charge of each node.
+
+        Unlike :meth:`get_topic_for`, a node is always mapped to the same
+        conductor whatever the other nodes of the request, see
+        :func:`xcat3.common.utils.node_conductor`. It is used by the calls
+        which depend on the state a conductor keeps for a node: its console
+        and the circuit breaker of its BMC.
+
+        :param nodes: the names of nodes
+        :returns: a dict of RPC topic and list of node names.
+        :raises: NoValidHost
+
+        """
+        conductors = self.dbapi.get_conductors()
+        if not conductors:
+            reason = (_('No conductor service registered'))
+            raise exception.NoValidHost(reason=reason)
+
+        hostnames = sorted(c.hostname for c in conductors)
+        topic_dict = dict()
+        for name in nodes:
+            hostname = utils.node_conductor(name, hostnames)
+            topic = '%s.%s' % (self.topic, hostname.encode('utf-8'))
+            topic_dict.setdefault(topic, []).append(name)
+        return topic_dict
+
+    def _call_console(self, context, method, names, **kwargs):
+        def _call(cctxt, names):
+            return cctxt.call(context, method, names=names, **kwargs)
+
+        futures = []
+        for topic, nodes in self.get_node_topic_for(names).items():
+            cctxt = self.client.prepare(topic=topic or self.topic,
+                                        version='1.0')
+            futures.append(self.spawn_worker(_call, cctxt, names=nodes))
+        return futures
+
+    def start_console(self, context, names):
+        """Open the serial consoles of nodes.
+
+        :param context: request context.
+        :param names: names of nodes.
+        :raises: NoFreeAPIWorker when there is no free worker to start
+                 async task.
+        """
+        return self._call_console(context, 'start_console', names)
+
+    def stop_console(self, context, names):
+        """Close the serial consoles of nodes.
+
+        :param context: request context.
+        :param names: names of nodes.
+        :raises: NoFreeAPIWorker when there is no free worker to start
+                 async task.
+        """
+        return self._call_console(context, 'stop_console', names)
+
+    def get_console(self, context, names):
+        """Get how to attach to the serial consoles of nodes.
+
+        :param context: request context.
+        :param names: names of nodes.
+        :raises: NoFreeAPIWorker when there is no free worker to start
+                 async task.
+        """
+        return self._call_console(context, 'get_console', names)
+
     def change_power_state(self, context, names, target):
         """Change a node's power state.
 
@@ -135,7 +205,7 @@ class ConductorAPI(object):
             return cctxt.call(context, 'change_power_state', names=names,
                               target=target)
 
-        topic_dict = self.get_topic_for(names)
+        topic_dict = self.get_node_topic_for(names)
         futures = []
         for topic, nodes in topic_dict.items():
             cctxt = self.client.prepare(topic=topic or self.topic,
@@ -146,6 +216,28 @@ class ConductorAPI(object):
 
         return futures
 
+    def set_provision_state(self, context, names, event):
+        """Move nodes through the provisioning states.
+
+        :param context: request context.
+        :param names: names of nodes.
+        :param event: the provisioning event.
+        :raises: NoFreeConductorWorker when there is no free worker to start
+                 async task.
+        """
+
+        def _set_provision_state(cctxt, names, event):
+            return cctxt.call(context, 'set_provision_state', names=names,
+                              event=event)
+
+        futures = []
+        for topic, nodes in self.get_topic_for(names).items():
+            cctxt = self.client.prepare(topic=topic or self.topic,
+                                        version='1.0')
+            futures.append(self.spawn_worker(_set_provision_state, cctxt,
+                                             names=nodes, event=event))
+        return futures
+
     def get_power_state(self, context, names):
         """Get a node's power state.
 
@@ -161,7 +253,7 @@ class ConductorAPI(object):
         def _get_power_state(cctxt, names):
             return cctxt.call(context, 'get_power_state', names=names)
 
-        topic_dict = self.get_topic_for(names)
+        topic_dict = self.get_node_topic_for(names)
         futures = []
         for topic, nodes in topic_dict.items():
             cctxt = self.client.prepare(topic=topic or self.topic,
@@ -171,6 +263,78 @@ class ConductorAPI(object):
 
         return futures
 
+    def get_bmc_health(self, context, names):
+        """Get the health of the BMCs of nodes.
+
+        :param context: request context.
+        :param names: names of nodes.
+        :raises: NoFreeAPIWorker when there is no free worker to start
+                 async task.
+        """
+
+        def _get_bmc_health(cctxt, names):
+            return cctxt.call(context, 'get_bmc_health', names=names)
+
+        topic_dict = self.get_node_topic_for(names)
+        futures = []
+        for topic, nodes in topic_dict.items():
+            cctxt = self.client.prepare(topic=topic or self.topic,
+                                        version='1.0')
+            future = self.spawn_worker(_get_bmc_health, cctxt, names=nodes)
+            futures.append(future)
+
+        return futures
+
+    def get_governor_stats(self, context):
+        """Get the queue depths of the governors of all the conductors.
+
+        :param context: request context.
+        :raises: NoValidHost if no conductor is alive.
+        :raises: NoFreeAPIWorker when there is no free worker to start
+                 async task.
+        :returns: a list of futures, the hostname of its conductor is the
+                  conductor attribute of each one.
+        """
+
+        def _get_governor_stats(cctxt):
+            return cctxt.call(context, 'get_governor_stats')
+
+        conductors = self.dbapi.get_conductors()
+        if not conductors:
+            reason = (_('No conductor service registered'))
+            raise exception.NoValidHost(reason=reason)
+        futures = []
+        for conductor in conductors:
+            topic = '%s.%s' % (self.topic, conductor.hostname.encode('utf-8'))
+            cctxt = self.client.prepare(topic=topic, version='1.0')
+            future = self.spawn_worker(_get_governor_stats, cctxt)
+            setattr(future, 'conductor', conductor.hostname)
+            futures.append(future)
+
+        return futures
+
+    def collect_inventory(self, context, names):
+        """Collect the hardware inventory of nodes.
+
+        :param context: request context.
+        :param names: names of nodes.
+        :raises: NoFreeAPIWorker when there is no free worker to start
+                 async task.
+        """
+
+        def _collect_inventory(cctxt, names):
+            return cctxt.call(context, 'collect_inventory', names=names)
+
+        topic_dict = self.get_node_topic_for(names)
+        futures = []
+        for topic, nodes in topic_dict.items():
+            cctxt = self.client.prepare(topic=topic or self.topic,
+                                        version='1.0')
+            future = self.spawn_worker(_collect_inventory, cctxt, names=nodes)
+            futures.append(future)
+
+        return futures
+
     def destroy_nodes(self, context, names):
         """Change a node's power state.
 
@@ -0,0 +1,78 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Pack the sensor readings of many nodes into few notifications.
+
+Sending one notification per node floods the notification bus with small
+messages once thousands of nodes are sampled. The readings of a conductor
+are appended to a message until its JSON payload would exceed
+[conductor]send_sensor_data_max_message_size, then a new message is
+started.
+"""
+
+import json
+
+from oslo_utils import timeutils
+
+EVENT_TYPE = 'hardware.metrics'
+
+
+class MessageBuilder(object):
+    """Accumulate the sensor readings of nodes into notification payloads.
+
+    :param host: the conductor sending the readings.
+    :param max_size: maximum size in bytes of a serialized payload. The
+                     readings of a single node larger than it are sent in a
+                     message of their own.
+    """
+
+    def __init__(self, host, max_size):
+        self.host = host
+        self.max_size = max_size
+        self._entries = []
+        self._size = 0
+
+    def _empty_size(self):
+        return len(json.dumps(self._payload([])))
+
+    def _payload(self, entries):
+        return {'conductor': self.host,
+                'timestamp': timeutils.utcnow().isoformat(),
+                'nodes': entries}
+
+    def add(self, node_name, data):
+        """Add the readings of a node.
+
+        :param node_name: the name of the node.
+        :param data: the sensors data returned by the control plugin.
+        :returns: a list of the payloads which are full, to be sent.
+        """
+        entry = {'node_name': node_name, 'sensors': data}
+        # Account the ', ' separator between the entries of the list.
+        size = len(json.dumps(entry)) + 2
+        full = []
+        if self._entries and self._size + size > self.max_size:
+            full.append(self._payload(self._entries))
+            self._entries = []
+        if not self._entries:
+            self._size = self._empty_size()
+        self._entries.append(entry)
+        self._size += size
+        return full
+
+    def flush(self):
+        """Return the payload of the readings not sent yet, if any."""
+        if not self._entries:
+            return []
+        payload = self._payload(self._entries)
+        self._entries = []
+        return [payload]
@@ -89,23 +89,36 @@ raised in the background thread.):
 """
 
 import copy
+import time
 
 import futurist
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import excutils
 from oslo_utils import timeutils
+from oslo_utils import uuidutils
 import retrying
 import six
 
 from xcat3.common import exception
 from xcat3.common.i18n import _, _LE, _LI, _LW
+from xcat3.common import states
 from xcat3 import objects
+from xcat3.plugins import mapping
 
 LOG = logging.getLogger(__name__)
 
 CONF = cfg.CONF
 
+# The reservation holder IDs of the exclusive tasks running in this
+# conductor, the leases of their nodes are renewed periodically.
+_active_holders = set()
+
+
+def active_holders():
+    """Return the holder IDs of the tasks holding node reservations."""
+    return list(_active_holders)
+
 
 def require_exclusive_lock(f):
     """Decorator to require an exclusive lock.
@@ -136,7 +149,7 @@ def require_exclusive_lock(f):
 
 
 def acquire(context, node_names, shared=False, driver_name=None,
-            purpose='unspecified action'):
+            purpose='unspecified action', partial=False):
     """Shortcut for acquiring a lock on a Node.
 
     :param context: Request context.
@@ -144,12 +157,16 @@ def acquire(context, node_names, shared=False, driver_name=None,
     :param shared: Boolean indicating whether to take a shared or exclusive
                    lock. Default: False.
     :param purpose: human-readable purpose to put to debug logs.
+    :param partial: Boolean indicating whether to work on the available
+                    nodes only instead of failing the whole task when some
+                    nodes are locked or missing. Default: False.
     :returns: An instance of :class:`TaskManager`.
 
     """
     # NOTE(lintan): This is a workaround to set the context of periodic tasks.
     context.ensure_thread_contain_context()
-    return TaskManager(context, node_names, shared=shared, purpose=purpose)
+    return TaskManager(context, node_names, shared=shared, purpose=purpose,
+                       partial=partial)
 
 
 class TaskManager(object):
@@ -161,7 +178,7 @@ class TaskManager(object):
     """
 
     def __init__(self, context, node_names, shared=False,
-                 purpose='unspecified action'):
+                 purpose='unspecified action', partial=False):
         """Create a new TaskManager.
 
         Acquire a lock on nodes. The lock can be either shared or
@@ -174,6 +191,10 @@ class TaskManager(object):
         :param shared: Boolean indicating whether to take a shared or exclusive
                        lock. Default: False.
         :param purpose: human-readable purpose to put to debug logs.
+        :param partial: Boolean indicating whether to lock whatever nodes
+                        are free. The nodes which can not be used are
+                        reported in the ``unavailable`` attribute instead
+                        of raising an exception. Default: False.
         :raises: NodeNotFound
         :raises: NodeLocked
 
@@ -183,30 +204,51 @@ class TaskManager(object):
 
         self.context = context
         self._nodes = None
+        self._plugins = None
         self.node_names = node_names
         self.shared = shared
+        self.partial = partial
+        # name -> reason for the nodes excluded from a partial task
+        self.unavailable = dict()
+        # Identify the reservation of this task, so that the lease can be
+        # renewed while the task is running.
+        self.holder = None if shared else uuidutils.generate_uuid()
 
         self._purpose = purpose
         self._debug_timer = timeutils.StopWatch()
 
-        nodes = objects.Node.list_in(context, node_names, ['reservation'])
+        if shared:
+            # NOTE: A shared task never touches the reservation column, so
+            # nodes reserved by other tasks are still visible to read-only
+            # operations.
+            nodes = objects.Node.list_in(context, node_names)
+        elif not partial:
+            nodes = objects.Node.list_in(context, node_names, ['reservation'])
         # As lock for multiple nodes is hard to detect the real problem, check
-        # posibble error at first.
-        if len(nodes) != node_names:
-            nodes = [node.name for node in nodes]
+        # posibble error at first. Partial exclusive task will learn about the
+        # unavailable nodes while reserving them.
+        if (shared or not partial) and len(nodes) != len(node_names):
+            found = set(node.name for node in nodes)
             for name in node_names:
-                if name not in nodes:
+                if name in found:
+                    continue
+                if not partial:
                     raise exception.NodeNotAvailable(node=name)
+                self.unavailable[name] = states.NOT_FOUND
         try:
             LOG.debug("Attempting to get %(type)s lock on nodes %(names)s (for"
                       " %(purpose)s)",
                       {'type': 'shared' if shared else 'exclusive',
                        'names': node_names, 'purpose': purpose})
             if not self.shared:
-                self._lock()
-            else:
+                _active_holders.add(self.holder)
+            if self.shared:
                 self._debug_timer.restart()
                 self.nodes = nodes
+            elif self.partial:
+                self._lock_partial()
+            else:
+                self._lock()
 
         except Exception:
             with excutils.save_and_reraise_exception():
@@ -219,6 +261,17 @@ class TaskManager(object):
     @nodes.setter
     def nodes(self, nodes):
         self._nodes = nodes
+        self._plugins = None
+
+    @property
+    def plugins(self):
+        """The nodes of the task grouped by control plugin.
+
+        Resolved once per task, see :func:`xcat3.plugins.mapping.group_nodes`.
+        """
+        if self._plugins is None:
+            self._plugins = mapping.group_nodes(self._nodes or [])
+        return self._plugins
 
     def _lock(self):
         self._debug_timer.restart()
@@ -232,7 +285,8 @@ class TaskManager(object):
             wait_fixed=CONF.conductor.node_locked_retry_interval * 1000)
         def reserve_nodes():
             self.nodes = objects.Node.reserve_nodes(self.context, CONF.host,
-                                                    self.node_names)
+                                                    self.node_names,
+                                                    holder=self.holder)
             LOG.debug("Node %(names)s successfully reserved for %(purpose)s "
                       "(took %(time).2f seconds)",
                       {'names': self.node_names, 'purpose': self._purpose,
@@ -241,6 +295,43 @@ class TaskManager(object):
 
         reserve_nodes()
 
+    def _lock_partial(self):
+        """Reserve the free nodes and retry the busy ones with backoff.
+
+        Only the nodes which were found locked are retried, each attempt
+        doubles the sleep interval up to node_locked_retry_max_interval.
+        """
+        self._debug_timer.restart()
+        self.nodes, locked, missing = objects.Node.reserve_nodes_partial(
+            self.context, CONF.host, self.node_names, holder=self.holder)
+
+        interval = CONF.conductor.node_locked_retry_interval
+        for attempt in range(1, CONF.conductor.node_locked_retry_attempts):
+            if not locked:
+                break
+            LOG.debug("Nodes %(names)s are locked, retry in %(interval)d "
+                      "seconds (attempt %(attempt)d)",
+                      {'names': locked, 'interval': interval,
+                       'attempt': attempt})
+            time.sleep(interval)
+            interval = min(interval * 2,
+                           CONF.conductor.node_locked_retry_max_interval)
+            nodes, locked, gone = objects.Node.reserve_nodes_partial(
+                self.context, CONF.host, locked, holder=self.holder)
+            self.nodes.extend(nodes)
+            missing.extend(gone)
+
+        for name in missing:
+            self.unavailable[name] = states.NOT_FOUND
+        for name in locked:
+            self.unavailable[name] = states.LOCKED
+        LOG.debug("%(count)d of %(total)d nodes successfully reserved for "
+                  "%(purpose)s (took %(time).2f seconds)",
+                  {'count': len(self.nodes), 'total': len(self.node_names),
+                   'purpose': self._purpose,
+                   'time': self._debug_timer.elapsed()})
+        self._debug_timer.restart()
+
     def upgrade_lock(self, purpose=None):
         """Upgrade a shared lock to an exclusive lock.
 
@@ -305,12 +396,23 @@ class TaskManager(object):
         if not self.shared:
             try:
                 if self.nodes:
-                    objects.Node.release_nodes(self.context, CONF.host,
-                                               self.node_names)
+                    # Partial task only holds the nodes it could reserve
+                    objects.Node.release_nodes(
+                        self.context, CONF.host,
+                        [node.name for node in self.nodes],
+                        holder=self.holder)
             except exception.NodeNotFound:
                 # squelch the exception if the nodes was deleted
                 # within the task's context.
                 pass
+            except exception.NodeLocked:
+                LOG.warning(_LW("The reservation lease on some of nodes "
+                                "%(names)s expired and was taken over while "
+                                "running %(purpose)s"),
+                            {'names': self.node_names,
+                             'purpose': self._purpose})
+            finally:
+                _active_holders.discard(self.holder)
         if self.nodes:
             LOG.debug("Successfully released %(type)s lock for %(purpose)s "
                       "on nodes %(names)s (lock was held %(time).2f sec)",
@@ -396,7 +498,7 @@ class TaskManager(object):
                         LOG.warning(_LW("Task's on_error hook failed to "
                                         "call %(method)s on nodes %(names)s"),
                                     {'method': self._on_error_method.__name__,
-                                     'names': self.names})
+                                     'names': self.node_names})
 
                     if fut is not None:
                         # This means the add_done_callback() failed for some
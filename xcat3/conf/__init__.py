@@ -16,14 +16,28 @@
 from oslo_config import cfg
 
 from xcat3.conf import api
+from xcat3.conf import boot
 from xcat3.conf import conductor
+from xcat3.conf import console
 from xcat3.conf import database
 from xcat3.conf import default
+from xcat3.conf import dhcp
+from xcat3.conf import governor
+from xcat3.conf import ipmi
+from xcat3.conf import provision
+from xcat3.conf import redfish
 
 
 CONF = cfg.CONF
 
 api.register_opts(CONF)
+boot.register_opts(CONF)
 conductor.register_opts(CONF)
+console.register_opts(CONF)
 database.register_opts(CONF)
-default.register_opts(CONF)
\ No newline at end of file
+default.register_opts(CONF)
+dhcp.register_opts(CONF)
+governor.register_opts(CONF)
+ipmi.register_opts(CONF)
+provision.register_opts(CONF)
+redfish.register_opts(CONF)
\ No newline at end of file
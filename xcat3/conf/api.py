@@ -55,6 +55,35 @@ opts = [
     cfg.IntOpt('workers_pool_size',
                default=1000, min=10,
                help=_('The size of the workers greenthread pool. ')),
+    cfg.FloatOpt('status_flush_interval',
+                 default=0.3, min=0.01,
+                 help=_('Interval in seconds between two writes of the '
+                        'statuses reported by the nodes. The statuses '
+                        'received meanwhile are written in one batch, only '
+                        'the last status of a node is kept.')),
+    cfg.IntOpt('status_queue_size',
+               default=100000, min=1,
+               help=_('The maximum number of nodes with a status waiting to '
+                      'be written by an API worker. Beyond it, the statuses '
+                      'of the other nodes are refused with HTTP 503.')),
+    cfg.IntOpt('compression_level',
+               default=6, min=0, max=9,
+               help=_('The gzip compression level of the responses sent to '
+                      'the clients accepting it, 0 disables the '
+                      'compression.')),
+    cfg.IntOpt('compression_min_size',
+               default=1024, min=0,
+               help=_('The responses smaller than this number of bytes are '
+                      'not compressed.')),
+    cfg.IntOpt('export_batch_size',
+               default=1000, min=1,
+               help=_('The number of nodes read at a time from the '
+                      'database by the export of the nodes.')),
+    cfg.IntOpt('import_batch_size',
+               default=500, min=1,
+               help=_('The number of records of a bulk import of nodes '
+                      'committed in one transaction. An interrupted import '
+                      'can be resumed after the last batch committed.')),
 ]
 
 opt_group = cfg.OptGroup(name='api',
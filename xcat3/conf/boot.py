@@ -0,0 +1,68 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_config import cfg
+
+from xcat3.common.i18n import _
+
+opts = [
+    cfg.StrOpt('root_dir',
+               default='/tftpboot',
+               help=_('Directory of the kernels, initrds and root images '
+                      'served to the booting nodes.')),
+    cfg.StrOpt('host_ip',
+               default='0.0.0.0',
+               help=_('The IP address on which the conductor serves the '
+                      'boot files.')),
+    cfg.PortOpt('http_port',
+                default=0,
+                help=_('TCP port of the HTTP boot file server, 3017 for '
+                       'instance. 0 disables it.')),
+    cfg.PortOpt('tftp_port',
+                default=0,
+                help=_('UDP port of the TFTP boot file server, 69 for the '
+                       'legacy PXE firmwares. 0 disables it.')),
+    cfg.IntOpt('max_connections',
+               default=5000, min=1,
+               help=_('Maximum number of HTTP connections and TFTP '
+                      'transfers served at the same time. The clients '
+                      'above it are told to retry later.')),
+    cfg.IntOpt('client_timeout',
+               default=60, min=1,
+               help=_('Seconds of inactivity after which a client is '
+                      'disconnected.')),
+    cfg.IntOpt('handle_cache_size',
+               default=256, min=1,
+               help=_('Number of boot files kept open to be served '
+                      'without opening them again.')),
+    cfg.FloatOpt('handle_cache_revalidate',
+                 default=5.0, min=0,
+                 help=_('Seconds an open boot file is served before its '
+                        'path is checked again for a replacement.')),
+    cfg.IntOpt('tftp_max_blksize',
+               default=1468, min=512, max=65464,
+               help=_('Largest TFTP block size granted to the clients '
+                      'asking for the blksize option.')),
+    cfg.IntOpt('tftp_max_window',
+               default=16, min=1, max=64,
+               help=_('Largest number of TFTP blocks sent before an '
+                      'acknowledgement, granted to the clients asking for '
+                      'the windowsize option.')),
+    cfg.IntOpt('tftp_retries',
+               default=5, min=1,
+               help=_('Number of times a TFTP packet is sent before the '
+                      'transfer is abandoned.')),
+]
+
+
+def register_opts(conf):
+    conf.register_opts(opts, group='boot')
@@ -40,6 +40,57 @@ opts = [
     cfg.IntOpt('node_locked_retry_interval',
                default=1,
                help=_('Seconds to sleep between node lock attempts.')),
+    cfg.IntOpt('node_locked_retry_max_interval',
+               default=10,
+               help=_('Maximum seconds to sleep between lock attempts on '
+                      'the busy nodes of a partial lock. The interval is '
+                      'doubled after each attempt, starting from '
+                      'node_locked_retry_interval.')),
+    cfg.IntOpt('reservation_lease_time',
+               default=300,
+               help=_('Seconds a node reservation stays valid without being '
+                      'renewed. A reservation whose lease expired is '
+                      'considered leaked and can be taken over by another '
+                      'task.')),
+    cfg.IntOpt('reservation_renew_interval',
+               default=60,
+               help=_('Seconds between renewals of the reservation leases '
+                      'held by the tasks of this conductor. Should be much '
+                      'smaller than reservation_lease_time.')),
+    cfg.IntOpt('bmc_failure_threshold',
+               default=3, min=1,
+               help=_('Number of consecutive timeouts after which a BMC is '
+                      'considered unreachable. The calls towards an '
+                      'unreachable BMC fail immediately.')),
+    cfg.IntOpt('bmc_probe_interval',
+               default=60,
+               help=_('Seconds between the probes of an unreachable BMC. '
+                      'One call is let through to check whether the BMC '
+                      'answers again.')),
+    cfg.IntOpt('inventory_batch_size',
+               default=500, min=1,
+               help=_('Number of nodes whose collected inventory is compared '
+                      'with the stored one and written in one database '
+                      'transaction.')),
+    cfg.BoolOpt('send_sensor_data',
+                default=False,
+                help=_('Enable sending sensor data message via the '
+                       'notification bus.')),
+    cfg.IntOpt('send_sensor_data_interval',
+               default=600, min=1,
+               help=_('Seconds between sending sensor data message to '
+                      'ceilometer via the notification bus.')),
+    cfg.IntOpt('send_sensor_data_batch_size',
+               default=1000, min=1,
+               help=_('Number of nodes whose sensors are read within one '
+                      'task. The readings are sent as soon as a batch is '
+                      'done, so a smaller batch lowers the memory used by '
+                      'the readings waiting to be sent.')),
+    cfg.IntOpt('send_sensor_data_max_message_size',
+               default=256 * 1024, min=1024,
+               help=_('Maximum size in bytes of the JSON payload of a sensor '
+                      'data notification. The readings of many nodes are '
+                      'packed into each notification up to this size.')),
     cfg.IntOpt('heartbeat_timeout',
                default=60,
                help=_('Maximum time (in seconds) since the last check-in '
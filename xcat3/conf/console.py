@@ -0,0 +1,75 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_config import cfg
+
+from xcat3.common.i18n import _
+
+opts = [
+    cfg.StrOpt('host_ip',
+               default='0.0.0.0',
+               help=_('The IP address on which the conductor accepts the '
+                      'console clients.')),
+    cfg.StrOpt('public_address',
+               help=_('Address given to the clients to reach the consoles '
+                      'of this conductor. Defaults to [DEFAULT]host.')),
+    cfg.PortOpt('port',
+                default=0,
+                help=_('TCP port of the raw console streams, 3015 for '
+                       'instance. 0 disables it.')),
+    cfg.PortOpt('websocket_port',
+                default=0,
+                help=_('TCP port of the console websockets, 3016 for '
+                       'instance. 0 disables it.')),
+    cfg.IntOpt('max_consoles',
+               default=10000, min=1,
+               help=_('Maximum number of consoles open on one conductor.')),
+    cfg.IntOpt('buffer_size',
+               default=16384, min=1024,
+               help=_('Bytes of the latest output of each console kept in '
+                      'memory and replayed to the clients attaching.')),
+    cfg.StrOpt('log_dir',
+               default='/var/log/xcat3/console',
+               help=_('Directory of the console logs, one file per node. '
+                      'Empty to disable the logs.')),
+    cfg.FloatOpt('log_flush_interval',
+                 default=2.0, min=0.1,
+                 help=_('Seconds the console output is buffered before '
+                        'being appended to the logs.')),
+    cfg.IntOpt('log_max_bytes',
+               default=10 * 1024 * 1024, min=0,
+               help=_('Size above which a console log is rotated to a .1 '
+                      'file. 0 disables the rotation.')),
+    cfg.IntOpt('keepalive_interval',
+               default=30, min=1,
+               help=_('Seconds of silence after which a keepalive is sent '
+                      'to the BMC of a console.')),
+    cfg.IntOpt('reconnect_interval',
+               default=60, min=1,
+               help=_('Seconds between two attempts to reopen a console '
+                      'lost because of an error.')),
+    cfg.IntOpt('open_concurrency',
+               default=200, min=1,
+               help=_('Maximum number of consoles opened at the same '
+                      'time.')),
+    cfg.IntOpt('token_ttl',
+               default=600, min=1,
+               help=_('Seconds a console token can be used to attach.')),
+    cfg.IntOpt('client_queue_size',
+               default=1024, min=1,
+               help=_('Number of output chunks queued for a client before '
+                      'a slow client is disconnected.')),
+]
+
+
+def register_opts(conf):
+    conf.register_opts(opts, group='console')
@@ -0,0 +1,71 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_config import cfg
+
+from xcat3.common.i18n import _
+
+opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help=_('Keep the host entries of the DHCP server of this '
+                       'conductor in sync with the nics table.')),
+    cfg.StrOpt('backend',
+               default='file',
+               help=_('Name of the xcat3.plugins.dhcp entry point applying '
+                      'the host entries, "file" or "omapi".')),
+    cfg.IntOpt('sync_interval',
+               default=30, min=1,
+               help=_('Seconds between two synchronizations of the host '
+                      'entries.')),
+    cfg.IntOpt('watermark_margin',
+               default=5, min=0,
+               help=_('Seconds subtracted from the time of the last change '
+                      'seen when looking for new changes. Must cover the '
+                      'clock skew between the xcat3 services writing the '
+                      'database.')),
+    cfg.StrOpt('hosts_file',
+               default='/etc/dhcp/xcat3-hosts.conf',
+               help=_('File rewritten atomically by the file backend.')),
+    cfg.StrOpt('file_format',
+               default='isc',
+               choices=['isc', 'dnsmasq'],
+               help=_('Format of the hosts file, an ISC dhcpd include file '
+                      'or a dnsmasq dhcp-hostsfile.')),
+    cfg.StrOpt('reload_command',
+               default='',
+               help=_('Command run by the file backend after the hosts '
+                      'file changed, e.g. "pkill -HUP dnsmasq".')),
+    cfg.StrOpt('omapi_host',
+               default='127.0.0.1',
+               help=_('Address of the OMAPI service of ISC dhcpd.')),
+    cfg.PortOpt('omapi_port',
+                default=7911,
+                help=_('Port of the OMAPI service of ISC dhcpd.')),
+    cfg.StrOpt('omapi_key_name',
+               help=_('Name of the OMAPI HMAC-MD5 key.')),
+    cfg.StrOpt('omapi_key',
+               secret=True,
+               help=_('Base64 secret of the OMAPI HMAC-MD5 key.')),
+    cfg.FloatOpt('omapi_timeout',
+                 default=10.0,
+                 help=_('Seconds to wait for an answer of the OMAPI '
+                        'service.')),
+    cfg.IntOpt('omapi_window',
+               default=64, min=1,
+               help=_('Number of OMAPI requests sent before waiting for '
+                      'their answers.')),
+]
+
+
+def register_opts(conf):
+    conf.register_opts(opts, group='dhcp')
@@ -0,0 +1,55 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_config import cfg
+
+from xcat3.common.i18n import _
+
+opts = [
+    cfg.IntOpt('max_concurrency',
+               default=2000, min=1,
+               help=_('Maximum number of control plugin calls running at '
+                      'the same time in a conductor.')),
+    cfg.FloatOpt('plugin_rate',
+                 default=2000.0,
+                 help=_('Calls per second started for each control plugin.')),
+    cfg.IntOpt('plugin_burst',
+               default=500, min=1,
+               help=_('Calls of a control plugin which can be started at '
+                      'once after an idle period.')),
+    cfg.IntOpt('subnet_prefix',
+               default=24, min=0, max=32,
+               help=_('Prefix length of the IPv4 subnets the BMC addresses '
+                      'are grouped by. IPv6 BMCs are grouped by /64.')),
+    cfg.FloatOpt('subnet_rate',
+                 default=200.0,
+                 help=_('Maximum calls per second started towards the BMCs '
+                        'of a subnet.')),
+    cfg.FloatOpt('subnet_min_rate',
+                 default=10.0,
+                 help=_('The rate of a subnet is halved when its BMCs time '
+                        'out, and grows back by one call per second for '
+                        'each successful call. This is the lowest rate it '
+                        'can be lowered to.')),
+    cfg.IntOpt('subnet_burst',
+               default=50, min=1,
+               help=_('Calls towards the BMCs of a subnet which can be '
+                      'started at once after an idle period.')),
+    cfg.IntOpt('stats_interval',
+               default=60,
+               help=_('Seconds between the logs of the governor queue '
+                      'depths, when calls are queued.')),
+]
+
+
+def register_opts(conf):
+    conf.register_opts(opts, group='governor')
@@ -0,0 +1,57 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_config import cfg
+
+from xcat3.common.i18n import _
+
+opts = [
+    cfg.PortOpt('port',
+                default=623,
+                help=_('Default UDP port of the BMCs. It can be overridden '
+                       'per node with the bmc_port key of control_info.')),
+    cfg.IntOpt('sockets',
+               default=4, min=1,
+               help=_('Number of UDP sockets shared by all the IPMI '
+                      'sessions of a conductor.')),
+    cfg.FloatOpt('timeout',
+                 default=1.0,
+                 help=_('Seconds to wait for the answer of a BMC before '
+                        'the request is retransmitted.')),
+    cfg.IntOpt('retries',
+               default=3, min=0,
+               help=_('Number of times a request is retransmitted before '
+                      'the BMC is considered unreachable.')),
+    cfg.IntOpt('concurrency',
+               default=1000, min=1,
+               help=_('Maximum number of BMCs a bulk power operation talks '
+                      'to at the same time.')),
+    cfg.IntOpt('max_sessions_per_bmc',
+               default=2, min=1,
+               help=_('Maximum number of sessions opened at the same time '
+                      'with one BMC.')),
+    cfg.IntOpt('session_idle_timeout',
+               default=600,
+               help=_('Seconds an unused session is kept open for reuse '
+                      'by the next operation on the BMC. Set to 0 to close '
+                      'the sessions after each operation.')),
+    cfg.IntOpt('session_keepalive_interval',
+               default=30, min=1,
+               help=_('Seconds between the keepalive messages sent on the '
+                      'idle sessions. Must be shorter than the session '
+                      'inactivity timeout of the BMCs, usually 60 '
+                      'seconds.')),
+]
+
+
+def register_opts(conf):
+    conf.register_opts(opts, group='ipmi')
@@ -0,0 +1,49 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_config import cfg
+
+from xcat3.common.i18n import _
+
+opts = [
+    cfg.IntOpt('template_workers',
+               default=0, min=0,
+               help=_('Number of processes rendering the provisioning '
+                      'files of the nodes in parallel. 0 uses one process '
+                      'per CPU.')),
+    cfg.IntOpt('template_parallel_threshold',
+               default=200, min=1,
+               help=_('Smallest number of files rendered at once for which '
+                      'worker processes are used. The files of smaller '
+                      'batches are rendered by the conductor itself.')),
+    cfg.StrOpt('image_store_dir',
+               default='/install/xcat3/store',
+               help=_('Directory of the image store, where the files of the '
+                      'OS images are kept by content. Files are linked from '
+                      'it, so it should be on the file system of the '
+                      'install directory.')),
+    cfg.IntOpt('image_workers',
+               default=4, min=1,
+               help=_('Number of threads copying or compressing the chunks '
+                      'of an image file in parallel.')),
+    cfg.IntOpt('image_chunk_size',
+               default=8, min=1,
+               help=_('Size in MiB of the chunks of an image file copied or '
+                      'compressed by one thread.')),
+    cfg.IntOpt('image_compress_level',
+               default=6, min=1, max=9,
+               help=_('gzip compression level of the packed images.')),
+]
+
+
+def register_opts(conf):
+    conf.register_opts(opts, group='provision')
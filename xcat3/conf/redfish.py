@@ -0,0 +1,46 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_config import cfg
+
+from xcat3.common.i18n import _
+
+opts = [
+    cfg.StrOpt('scheme',
+               default='https',
+               choices=['http', 'https'],
+               help=_('Scheme of the Redfish service when bmc_address of '
+                      'control_info is not a URL.')),
+    cfg.BoolOpt('verify_ca',
+                default=True,
+                help=_('Verify the TLS certificate of the BMCs.')),
+    cfg.FloatOpt('timeout',
+                 default=10.0,
+                 help=_('Seconds to wait for the answer of a BMC.')),
+    cfg.IntOpt('connections_per_bmc',
+               default=2, min=1,
+               help=_('Maximum number of keep-alive HTTP connections '
+                      'opened with one BMC.')),
+    cfg.IntOpt('session_idle_timeout',
+               default=600, min=1,
+               help=_('Seconds an unused Redfish session and its '
+                      'connections are kept for the next operation on the '
+                      'BMC.')),
+    cfg.IntOpt('concurrency',
+               default=1000, min=1,
+               help=_('Maximum number of BMCs a bulk power operation talks '
+                      'to at the same time.')),
+]
+
+
+def register_opts(conf):
+    conf.register_opts(opts, group='redfish')
@@ -93,6 +93,17 @@ class Connection(object):
         :return: a list of nodes
         """
 
+    @abc.abstractmethod
+    def get_node_names_in_range(self, noderange):
+        """Return the names of the nodes of a parsed noderange.
+
+        The ranges of names are matched by the database, they are not
+        expanded into lists of names.
+
+        :param noderange: the result of xcat3.common.noderange.parse.
+        :returns: a sorted list of node names.
+        """
+
     @abc.abstractmethod
     def reserve_node(self, tag, node_id):
         """Reserve a node.
@@ -120,28 +131,113 @@ class Connection(object):
         """
 
     @abc.abstractmethod
-    def reserve_nodes(self, tag, node_names):
+    def reserve_nodes(self, tag, node_names, holder=None):
         """Reserve nodes.
 
+        A node whose reservation lease has expired is taken over in the
+        same update as the free nodes.
+
         :param tag: A string uniquely identifying the reservation holder.
         :param node_names: The name of nodes.
+        :param holder: The ID of the task holding the reservation. If set,
+                       the reservation is a lease which expires unless it
+                       is renewed with :func:`renew_reservations`.
         :return object of nodes
         :raises: NodeNotFound if the node is not found.
         :raises: NodeLocked if the node is already reserved.
         """
 
     @abc.abstractmethod
-    def release_nodes(self, tag, node_names):
+    def reserve_nodes_partial(self, tag, node_names, holder=None):
+        """Reserve whichever of the nodes are free.
+
+        Unlike :func:`reserve_nodes`, a busy or missing node does not fail
+        the whole batch.
+
+        :param tag: A string uniquely identifying the reservation holder.
+        :param node_names: The name of nodes.
+        :param holder: The ID of the task holding the reservation.
+        :returns: A tuple (nodes, locked, missing) of the reserved nodes,
+                  the names of nodes reserved by another holder and the
+                  names of nodes which could not be found.
+        """
+
+    @abc.abstractmethod
+    def release_nodes(self, tag, node_names, holder=None):
         """Release the reservation on nodes
 
         :param tag: A string uniquely identifying the reservation holder.
         :param node_names: The name of nodes.
+        :param holder: The ID of the task holding the reservation.
         :raises: NodeNotFound if the node is not found.
         :raises: NodeLocked if the node is reserved by another host.
         :raises: NodeNotLocked if the node was found to not have a
                  reservation at all.
         """
 
+    @abc.abstractmethod
+    def renew_reservations(self, holders):
+        """Extend the reservation lease of the nodes held by the holders.
+
+        :param holders: A list of reservation holder IDs.
+        :returns: The number of nodes whose lease was renewed.
+        """
+
+    @abc.abstractmethod
+    def transition_nodes(self, transitions):
+        """Move nodes to new provisioning states.
+
+        Each transition is applied to all its nodes with a single UPDATE,
+        conditioned on the source state: the nodes which left it in the
+        meantime are not moved.
+
+        :param transitions: A list of (source, target, task_action,
+                            node_ids) tuples.
+        :returns: The set of the ids of the nodes moved.
+        """
+
+    @abc.abstractmethod
+    def iter_nodes_with_nics(self, node_columns, nic_columns, batch_size):
+        """Iterate over all the nodes and their nics.
+
+        The nodes are read batch_size at a time in the order of their ids,
+        each batch after the last id of the previous one, then the nics of
+        the batch, by two queries in a transaction of their own.
+
+        :param node_columns: The names of the columns of the nodes.
+        :param nic_columns: The names of the columns of the nics.
+        :param batch_size: The number of nodes read at a time.
+        :returns: An iterator of (node values, list of nic values) tuples,
+                  in the order of the node ids.
+        """
+
+    @abc.abstractmethod
+    def get_nodes_version(self, node_name=None):
+        """Return a value which changes when the nodes change.
+
+        It is made of the number of nodes, their largest id, the sum of
+        their generations, incremented by every update of a node, and
+        their latest created_at, and of the same values for the nics of
+        the nodes.
+
+        :param node_name: The name of a node, all the nodes by default.
+        :returns: A tuple.
+        """
+
+    @abc.abstractmethod
+    def update_node_statuses(self, statuses):
+        """Record the statuses reported by many nodes at once.
+
+        The nodes reporting the same status are updated with a single
+        UPDATE, then each transition of the status moves with a single
+        UPDATE the nodes which are in its source state.
+
+        :param statuses: A list of (status, transitions, node_names)
+                         tuples, transitions being a list of (source,
+                         target, task_action) tuples.
+        :returns: The number of nodes found.
+        """
+
     @abc.abstractmethod
     def create_node(self, values):
         """Create a new node.
@@ -160,6 +256,25 @@ class Connection(object):
         :returns: A node.
         """
 
+    @abc.abstractmethod
+    def create_nodes(self, nodes):
+        """Create many nodes and their nics in one transaction.
+
+        :param nodes: A list of dicts like the values of create_node.
+        :raises: DuplicateName or MACAlreadyExists, then no node is
+                 created.
+        """
+
+    @abc.abstractmethod
+    def get_existing_nodes(self, names, macs):
+        """Return the names and the MAC addresses already used.
+
+        :param names: A list of node names.
+        :param macs: A list of MAC addresses.
+        :returns: A tuple (names, macs) of the sets of the given names of
+                  existing nodes and MAC addresses of existing nics.
+        """
+
     @abc.abstractmethod
     def get_node_by_id(self, node_id):
         """Return a node.
@@ -239,6 +354,91 @@ class Connection(object):
     def destroy_nic(self, nic_id):
         """destroy nic"""
 
+    @abc.abstractmethod
+    def get_inventory_hashes(self, node_ids):
+        """Return the content hash of the stored inventory of nodes.
+
+        :param node_ids: The ids of nodes.
+        :returns: A dict of node id and content hash, nodes without
+                  inventory are left out.
+        """
+
+    @abc.abstractmethod
+    def update_inventories(self, inventories):
+        """Store the changed inventory of nodes.
+
+        Only the components whose content hash changed are written, the
+        components which disappeared are deleted.
+
+        :param inventories: A dict of node id and a tuple (content_hash,
+                            items), items is a dict of (category, name) and
+                            a tuple (content_hash, data) of a component.
+        """
+
+    @abc.abstractmethod
+    def touch_inventories(self, node_ids):
+        """Mark the unchanged inventory of nodes as collected now.
+
+        :param node_ids: The ids of nodes.
+        """
+
+    @abc.abstractmethod
+    def get_inventory_list(self, node_names, category=None):
+        """Return the stored inventory of nodes.
+
+        :param node_names: The names of nodes.
+        :param category: Optional, only return the components of the
+                         category.
+        :returns: A list of dicts with the node name, the content_hash,
+                  collected_at, created_at and updated_at of the inventory
+                  and its items as a dict of category, name and data.
+        """
+
+    @abc.abstractmethod
+    def get_dhcp_hosts(self, since=None):
+        """Return the nics with their node, to build DHCP host entries.
+
+        :param since: Optional, only return the nics created or updated, or
+                      whose node was, at or after this time.
+        :returns: A list of (mac, ip, node name, changed_at) tuples, ip and
+                  node name may be None. changed_at is the time of the
+                  last change of the nic or of its node.
+        """
+
+    @abc.abstractmethod
+    def get_dhcp_host_macs(self, count_only=False):
+        """Return the MAC of the nics with an IP address and a node.
+
+        :param count_only: only return the number of such nics.
+        :returns: A set of MAC addresses, or their number.
+        """
+
+    @abc.abstractmethod
+    def get_osimage_files(self, osimage_name):
+        """Return the files of an OS image in the image store.
+
+        :param osimage_name: The name of the OS image.
+        :raises: OSImageNotFound
+        :returns: A dict of role and a tuple (content_id, size).
+        """
+
+    @abc.abstractmethod
+    def set_osimage_files(self, osimage_name, files):
+        """Replace the files of an OS image.
+
+        :param osimage_name: The name of the OS image.
+        :param files: A dict of role and a tuple (content_id, size), the
+                      roles left out are removed from the image.
+        :raises: OSImageNotFound
+        """
+
+    @abc.abstractmethod
+    def get_osimage_content_ids(self):
+        """Return the content ids used by the OS images.
+
+        :returns: A set of content ids.
+        """
+
     @abc.abstractmethod
     def get_conductors(self):
         """Return conductor nodes
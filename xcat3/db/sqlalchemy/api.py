@@ -28,6 +28,7 @@ from oslo_utils import netutils
 from oslo_utils import strutils
 from oslo_utils import timeutils
 from oslo_utils import uuidutils
+import six
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 from sqlalchemy.orm import joinedload
 from sqlalchemy import sql
@@ -116,12 +117,182 @@ def _paginate_query(model, limit=None, sort_key=None,
     return query.all()
 
 
+def _lease_expiry():
+    return timeutils.utcnow() + datetime.timedelta(
+        seconds=CONF.conductor.reservation_lease_time)
+
+
+def _reservation_values(tag, holder):
+    """Return the column values to reserve (or release) a node.
+
+    Only reservations with a holder carry a lease, a reservation without
+    holder never expires.
+    """
+    return {'reservation': tag,
+            'reservation_holder': holder,
+            'reservation_expires_at': _lease_expiry() if holder else None}
+
+
+def _add_reservable_filter(query):
+    """Filter the nodes which are free or whose lease has expired."""
+    return query.filter(or_(
+        models.Node.reservation == sql.null(),
+        models.Node.reservation_expires_at < timeutils.utcnow()))
+
+
+def _is_reserved_by(node, tag, holder):
+    if holder:
+        return node['reservation_holder'] == holder
+    return node['reservation'] == tag
+
+
+def _like_escape(text):
+    return (text.replace('\\', '\\\\').replace('%', '\\%')
+            .replace('_', '\\_'))
+
+
+def _range_filter(term):
+    """Match the names of a noderange.Range.
+
+    The prefix uses the index of the names, then the digits between the
+    prefix and the suffix are compared as strings of the same width.
+    """
+    name = models.Node.name
+    start = len(term.prefix) + 1
+    width = len(term.low)
+    digits = sql.func.substr(name, start, width)
+    return sql.and_(
+        name.like(_like_escape(term.prefix) + '%' +
+                  _like_escape(term.suffix), escape='\\'),
+        sql.func.length(name) == start - 1 + width + len(term.suffix),
+        digits >= term.low, digits <= term.high,
+        *[sql.func.substr(name, start + i, 1).between('0', '9')
+          for i in range(width)])
+
+
+def _noderange_filter(noderange):
+    """Build the predicate of a parsed noderange, item after item."""
+    predicate = None
+    for exclude, terms in noderange:
+        names = [t for t in terms if isinstance(t, six.string_types)]
+        clauses = [_range_filter(t) for t in terms
+                   if not isinstance(t, six.string_types)]
+        if names:
+            clauses.append(models.Node.name.in_(names))
+        clause = sql.or_(*clauses)
+        if exclude:
+            predicate = sql.and_(predicate, sql.not_(clause))
+        elif predicate is None:
+            predicate = clause
+        else:
+            predicate = sql.or_(predicate, clause)
+    return predicate
+
+
+def _delete_inventories(node_ids):
+    for model in (models.InventoryItem, models.Inventory):
+        model_query(model).filter(model.node_id.in_(node_ids)).delete(
+            synchronize_session=False)
+
+
 class Connection(api.Connection):
     """SqlAlchemy connection."""
 
     def __init__(self):
         pass
 
+    def transition_nodes(self, transitions):
+        moved = set()
+        with _session_for_write():
+            for source, target, task_action, node_ids in transitions:
+                if not node_ids:
+                    continue
+                query = model_query(models.Node.id).filter(
+                    models.Node.id.in_(node_ids))
+                if source is None:
+                    query = query.filter(models.Node.state.is_(None))
+                else:
+                    query = query.filter_by(state=source)
+                # The rows in the source state are locked until the end of
+                # the transaction, the UPDATE changes exactly them.
+                ids = set(row[0] for row in query.with_for_update())
+                if not ids:
+                    continue
+                count = query.filter(models.Node.id.in_(ids)).update(
+                    {'state': target, 'task_action': task_action},
+                    synchronize_session=False)
+                if count == len(ids):
+                    moved.update(ids)
+                elif count:
+                    # Without row locks, some rows left the source state
+                    # after the SELECT: those of ids now in the target
+                    # state were moved by this UPDATE.
+                    query = model_query(models.Node.id).filter(
+                        models.Node.id.in_(ids)).filter_by(state=target)
+                    moved.update(row[0] for row in query)
+        return moved
+
+    def iter_nodes_with_nics(self, node_columns, nic_columns, batch_size):
+        node_columns = [getattr(models.Node, c) for c in node_columns]
+        nic_columns = [getattr(models.Nics, c) for c in nic_columns]
+        last_id = 0
+        while True:
+            # Each batch is read in its own short transaction, nothing is
+            # held open while the previous batch is being sent.
+            with _session_for_read():
+                nodes = (model_query(models.Node.id, *node_columns)
+                         .filter(models.Node.id > last_id)
+                         .order_by(models.Node.id)
+                         .limit(batch_size).all())
+                if not nodes:
+                    return
+                nics = collections.defaultdict(list)
+                query = (model_query(models.Nics.node_id, *nic_columns)
+                         .filter(models.Nics.node_id.in_(
+                             [row[0] for row in nodes]))
+                         .order_by(models.Nics.node_id, models.Nics.id))
+                for row in query:
+                    nics[row[0]].append(tuple(row[1:]))
+            for row in nodes:
+                yield tuple(row[1:]), nics.get(row[0], [])
+            last_id = nodes[-1][0]
+
+    def get_nodes_version(self, node_name=None):
+        def _version(model):
+            # A row inserted changes the count or the largest id, a row
+            # updated the sum of the generations.
+            return model_query(sql.func.count(model.id),
+                               sql.func.max(model.id),
+                               sql.func.sum(model.generation),
+                               sql.func.max(model.created_at))
+
+        nodes = _version(models.Node)
+        nics = _version(models.Nics)
+        if node_name is not None:
+            nodes = nodes.filter(models.Node.name == node_name)
+            node_ids = model_query(models.Node.id).filter(
+                models.Node.name == node_name).subquery()
+            nics = nics.filter(models.Nics.node_id.in_(node_ids))
+        return tuple(nodes.one()) + tuple(nics.one())
+
+    def update_node_statuses(self, statuses):
+        found = 0
+        with _session_for_write():
+            for status, transitions, node_names in statuses:
+                query = model_query(models.Node).filter(
+                    models.Node.name.in_(node_names))
+                found += query.update({'status': status},
+                                      synchronize_session=False)
+                for source, target, task_action in transitions:
+                    if source is None:
+                        moving = query.filter(models.Node.state.is_(None))
+                    else:
+                        moving = query.filter_by(state=source)
+                    moving.update({'state': target,
+                                   'task_action': task_action},
+                                  synchronize_session=False)
+        return found
+
     def create_node(self, values):
         node = models.Node()
         node.update(values)
@@ -146,6 +317,53 @@ class Connection(api.Connection):
                 raise exception.DuplicateName(name=values['name'])
             return node
 
+    def create_nodes(self, nodes):
+        with _session_for_write() as session:
+            try:
+                refs = []
+                for values in nodes:
+                    node = models.Node()
+                    node.update(dict((k, v) for k, v in values.items()
+                                     if k != 'nics_info'))
+                    session.add(node)
+                    refs.append((node, values.get('nics_info')))
+                # The ids of the nodes are needed by their nics.
+                session.flush()
+                nics = []
+                for node, nics_info in refs:
+                    for nic in (nics_info or {}).get('nics', []):
+                        nics.append({'uuid': uuidutils.generate_uuid(),
+                                     'node_id': node.id,
+                                     'mac': nic.get('mac'),
+                                     'ip': nic.get('ip'),
+                                     'netmask': nic.get('netmask'),
+                                     'type': nic.get('type'),
+                                     'extra': nic.get('extra')})
+                if nics:
+                    session.execute(models.Nics.__table__.insert(), nics)
+            except db_exc.DBDuplicateEntry as exc:
+                # The value is not known on sqlite, the values of the
+                # batch are reported instead.
+                if 'mac' in exc.columns:
+                    macs = [nic.get('mac') for values in nodes
+                            for nic in (values.get('nics_info') or
+                                        {}).get('nics', [])]
+                    raise exception.MACAlreadyExists(
+                        mac=exc.value or ', '.join(macs))
+                raise exception.DuplicateName(
+                    name=exc.value or ', '.join(values['name']
+                                                for values in nodes))
+
+    def get_existing_nodes(self, names, macs):
+        with _session_for_read():
+            query = model_query(models.Node.name).filter(
+                models.Node.name.in_(names))
+            found_names = set(name for name, in query) if names else set()
+            query = model_query(models.Nics.mac).filter(
+                models.Nics.mac.in_(macs))
+            found_macs = set(mac for mac, in query) if macs else set()
+        return found_names, found_macs
+
     def get_node_by_id(self, node_id):
         query = model_query(models.Node)
         query = query.filter_by(id=node_id)
@@ -174,6 +392,7 @@ class Connection(api.Connection):
             nics_query = model_query(models.Nics)
             nics_query = nics_query.filter_by(node_id=node['id'])
             nics_query.delete()
+            _delete_inventories([node['id']])
             query.delete()
 
     def destroy_nodes(self, node_ids):
@@ -188,8 +407,22 @@ class Connection(api.Connection):
                 nics_query = model_query(models.Nics)
                 nics_query = nics_query.filter_by(node_id=node['id'])
                 nics_query.delete()
+            _delete_inventories(node_ids)
             query.delete(synchronize_session=False)
 
+    def _add_nodes_filters(self, query, filters):
+        if filters is None:
+            filters = dict()
+        if 'reserved' in filters:
+            if filters['reserved']:
+                query = query.filter(models.Node.reservation != sql.null())
+            else:
+                query = query.filter(models.Node.reservation == sql.null())
+        if 'reserved_by_any_of' in filters:
+            query = query.filter(models.Node.reservation.in_(
+                filters['reserved_by_any_of']))
+        return query
+
     def get_nodeinfo_list(self, columns=None, filters=None, limit=None,
                           marker=None, sort_key=None, sort_dir=None):
         # list-ify columns default values because it is bad form
@@ -208,19 +441,24 @@ class Connection(api.Connection):
         query = model_query(models.Node)
         return _paginate_query(models.Node, limit, sort_key, sort_dir, query)
 
+    def get_node_names_in_range(self, noderange):
+        query = model_query(models.Node.name).filter(
+            _noderange_filter(noderange)).order_by(models.Node.name)
+        return [name for name, in query]
+
     def get_node_in(self, node_names, filters=None):
         query = model_query(models.Node).filter(models.Node.name.in_(
             node_names))
-        if 'reservation' in filters:
-            query = query.filter_by(reservation=None)
+        if filters and 'reservation' in filters:
+            query = _add_reservable_filter(query)
         return query.all()
 
-    def reserve_nodes(self, tag, node_names):
+    def reserve_nodes(self, tag, node_names, holder=None):
         with _session_for_write():
             query = model_query(models.Node).filter(
                 models.Node.name.in_(node_names))
-            count = query.filter_by(reservation=None).update(
-                {'reservation': tag}, synchronize_session=False)
+            count = _add_reservable_filter(query).update(
+                _reservation_values(tag, holder), synchronize_session=False)
 
             nodes = query.all()
             if not nodes:
@@ -229,21 +467,67 @@ class Connection(api.Connection):
                 raise exception.NodeLocked(nodes=node_names)
             return nodes
 
-    def release_nodes(self, tag, node_names):
+    def reserve_nodes_partial(self, tag, node_names, holder=None):
+        with _session_for_write():
+            query = model_query(models.Node.name, models.Node.reservation,
+                                models.Node.reservation_expires_at)
+            rows = query.filter(models.Node.name.in_(node_names)).all()
+            found = set(row[0] for row in rows)
+            missing = [name for name in node_names if name not in found]
+            now = timeutils.utcnow()
+            free = []
+            locked = []
+            for name, reservation, expires_at in rows:
+                if reservation is None or (expires_at and expires_at < now):
+                    free.append(name)
+                else:
+                    locked.append(name)
+            if not free:
+                return [], locked, missing
+
+            query = model_query(models.Node).filter(
+                models.Node.name.in_(free))
+            _add_reservable_filter(query).update(
+                _reservation_values(tag, holder), synchronize_session=False)
+            nodes = []
+            for node in query.all():
+                # The node may be grabbed by others since the first select
+                if _is_reserved_by(node, tag, holder):
+                    nodes.append(node)
+                else:
+                    locked.append(node.name)
+            return nodes, locked, missing
+
+    def release_nodes(self, tag, node_names, holder=None):
         with _session_for_write():
             query = model_query(models.Node).filter(
                 models.Node.name.in_(node_names))
-            count = query.filter_by(reservation=tag).update(
-                {'reservation': None}, synchronize_session=False)
+            query = query.filter_by(reservation=tag)
+            if holder:
+                query = query.filter_by(reservation_holder=holder)
+            count = query.update(_reservation_values(None, None),
+                                 synchronize_session=False)
 
             if count != len(node_names):
+                query = model_query(models.Node).filter(
+                    models.Node.name.in_(node_names))
                 nodes = query.all()
                 if not nodes:
-                    raise exception.NodeNotFound(node_names)
+                    raise exception.NodeNotFound(node=node_names)
                 for node in nodes:
                     if node['reservation']:
-                        raise exception.NodeLocked(node=node.name,
-                                                   host=node['reservation'])
+                        # The lease has expired and was taken over
+                        raise exception.NodeLocked(nodes=node.name)
+
+    def renew_reservations(self, holders):
+        if not holders:
+            return 0
+        with _session_for_write():
+            query = model_query(models.Node).filter(
+                models.Node.reservation_holder.in_(holders))
+            return query.update(
+                {'reservation_expires_at': _lease_expiry()},
+                synchronize_session=False)
 
     def reserve_node(self, tag, node_id):
         with _session_for_write():
@@ -369,6 +653,167 @@ class Connection(api.Connection):
             if count == 0:
                 raise exception.NicNotFound(nic=nic_id)
 
+    def get_inventory_hashes(self, node_ids):
+        if not node_ids:
+            return {}
+        query = model_query(models.Inventory.node_id,
+                            models.Inventory.content_hash)
+        return dict(query.filter(models.Inventory.node_id.in_(node_ids)))
+
+    def update_inventories(self, inventories):
+        if not inventories:
+            return
+        node_ids = list(inventories)
+        now = timeutils.utcnow()
+        with _session_for_write() as session:
+            query = model_query(models.InventoryItem.id,
+                                models.InventoryItem.node_id,
+                                models.InventoryItem.category,
+                                models.InventoryItem.name,
+                                models.InventoryItem.content_hash)
+            stored = collections.defaultdict(dict)
+            for item_id, node_id, category, name, digest in query.filter(
+                    models.InventoryItem.node_id.in_(node_ids)):
+                stored[node_id][(category, name)] = (item_id, digest)
+            query = model_query(models.Inventory).filter(
+                models.Inventory.node_id.in_(node_ids))
+            records = dict((ref.node_id, ref) for ref in query)
+
+            removed = []
+            for node_id, (digest, items) in inventories.items():
+                ref = records.get(node_id)
+                if ref is None:
+                    ref = models.Inventory()
+                    ref.update({'node_id': node_id})
+                    session.add(ref)
+                ref.update({'content_hash': digest, 'collected_at': now})
+                old_items = stored.get(node_id, {})
+                for (category, name), (item_digest, data) in items.items():
+                    old = old_items.pop((category, name), None)
+                    if old is None:
+                        item = models.InventoryItem()
+                        item.update({'node_id': node_id,
+                                     'category': category, 'name': name,
+                                     'content_hash': item_digest,
+                                     'data': data})
+                        session.add(item)
+                    elif old[1] != item_digest:
+                        model_query(models.InventoryItem).filter_by(
+                            id=old[0]).update(
+                            {'content_hash': item_digest, 'data': data},
+                            synchronize_session=False)
+                removed.extend(item_id for item_id, _d in old_items.values())
+            if removed:
+                model_query(models.InventoryItem).filter(
+                    models.InventoryItem.id.in_(removed)).delete(
+                    synchronize_session=False)
+
+    def touch_inventories(self, node_ids):
+        if not node_ids:
+            return
+        with _session_for_write():
+            query = model_query(models.Inventory).filter(
+                models.Inventory.node_id.in_(node_ids))
+            # Keep updated_at as the time of the last change.
+            query.update({'collected_at': timeutils.utcnow(),
+                          'updated_at': models.Inventory.updated_at},
+                         synchronize_session=False)
+
+    def get_inventory_list(self, node_names, category=None):
+        query = model_query(models.Node.id, models.Node.name,
+                            models.Inventory.content_hash,
+                            models.Inventory.collected_at,
+                            models.Inventory.created_at,
+                            models.Inventory.updated_at).join(
+            models.Inventory, models.Inventory.node_id == models.Node.id)
+        inventories = collections.OrderedDict()
+        for row in query.filter(models.Node.name.in_(node_names)):
+            inventories[row[0]] = {'name': row[1], 'content_hash': row[2],
+                                   'collected_at': row[3],
+                                   'created_at': row[4],
+                                   'updated_at': row[5], 'items': {}}
+        if not inventories:
+            return []
+        query = model_query(models.InventoryItem.node_id,
+                            models.InventoryItem.category,
+                            models.InventoryItem.name,
+                            models.InventoryItem.data).filter(
+            models.InventoryItem.node_id.in_(list(inventories)))
+        if category:
+            query = query.filter_by(category=category)
+        for node_id, item_category, name, data in query:
+            items = inventories[node_id]['items']
+            items.setdefault(item_category, {})[name] = data
+        return list(inventories.values())
+
+    def get_dhcp_hosts(self, since=None):
+        columns = (models.Nics.mac, models.Nics.ip, models.Node.name,
+                   models.Nics.created_at, models.Nics.updated_at,
+                   models.Node.created_at, models.Node.updated_at)
+        query = model_query(*columns).outerjoin(
+            models.Node, models.Nics.node_id == models.Node.id).filter(
+            models.Nics.mac.isnot(None))
+        if since is None:
+            queries = [query]
+        else:
+            # Separate queries so each can use the index of its column.
+            queries = [query.filter(models.Nics.created_at >= since),
+                       query.filter(models.Nics.updated_at >= since),
+                       query.filter(or_(models.Node.created_at >= since,
+                                        models.Node.updated_at >= since))]
+        hosts = dict()
+        for query in queries:
+            for row in query:
+                changed_at = max(t for t in row[3:] if t is not None)
+                hosts[row[0]] = (row[0], row[1], row[2], changed_at)
+        return list(hosts.values())
+
+    def get_dhcp_host_macs(self, count_only=False):
+        query = model_query(models.Nics.mac).join(
+            models.Node, models.Nics.node_id == models.Node.id).filter(
+            models.Nics.mac.isnot(None), models.Nics.ip.isnot(None))
+        if count_only:
+            return query.count()
+        return set(row[0] for row in query)
+
+    @staticmethod
+    def _get_osimage_id(osimage_name):
+        query = model_query(models.OSImage.id).filter_by(name=osimage_name)
+        try:
+            return query.one()[0]
+        except NoResultFound:
+            raise exception.OSImageNotFound(name=osimage_name)
+
+    def get_osimage_files(self, osimage_name):
+        osimage_id = self._get_osimage_id(osimage_name)
+        query = model_query(models.OSImageFile.role,
+                            models.OSImageFile.content_id,
+                            models.OSImageFile.size).filter_by(
+            osimage_id=osimage_id)
+        return dict((role, (content_id, size))
+                    for role, content_id, size in query)
+
+    def set_osimage_files(self, osimage_name, files):
+        with _session_for_write() as session:
+            osimage_id = self._get_osimage_id(osimage_name)
+            query = model_query(models.OSImageFile).filter_by(
+                osimage_id=osimage_id)
+            stored = dict((ref.role, ref) for ref in query)
+            for role, (content_id, size) in files.items():
+                ref = stored.pop(role, None)
+                if ref is None:
+                    ref = models.OSImageFile()
+                    ref.update({'osimage_id': osimage_id, 'role': role})
+                    session.add(ref)
+                ref.update({'content_id': content_id, 'size': size})
+            for ref in stored.values():
+                session.delete(ref)
+            session.flush()
+
+    def get_osimage_content_ids(self):
+        query = model_query(models.OSImageFile.content_id).distinct()
+        return set(row[0] for row in query)
+
     def get_conductors(self):
         interval = CONF.conductor.heartbeat_timeout
         limit = timeutils.utcnow() - datetime.timedelta(seconds=interval)
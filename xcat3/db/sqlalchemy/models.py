@@ -23,8 +23,8 @@ from oslo_db.sqlalchemy import models
 from oslo_db.sqlalchemy import types as db_types
 import six.moves.urllib.parse as urlparse
 from sqlalchemy import Boolean, Column, DateTime, Index
-from sqlalchemy import ForeignKey, Integer
-from sqlalchemy import schema, String, Text
+from sqlalchemy import BigInteger, ForeignKey, Integer
+from sqlalchemy import schema, sql, String, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import orm
 
@@ -44,6 +44,16 @@ def table_args():
     return None
 
 
+def _generation():
+    """A counter incremented by every UPDATE of its row.
+
+    Unlike updated_at, it changes even when a row is updated twice within
+    the resolution of the timestamps of the database.
+    """
+    return Column(Integer, nullable=False, default=0, server_default='0',
+                  onupdate=sql.literal_column('generation') + 1)
+
+
 class XCATBase(models.TimestampMixin,
                models.ModelBase):
     metadata = None
@@ -85,15 +95,19 @@ class Node(Base):
     type = Column(String(15), nullable=True)
     state = Column(String(15), nullable=True)
     task_action = Column(String(20), nullable=True)
+    status = Column(String(36), nullable=True)
     osimage_id = Column(Integer, ForeignKey('osimage.id'), nullable=True)
     scripts_names = Column(String(255), nullable=True)
     control_info = Column(db_types.JsonEncodedDict, nullable=True)
     console_info = Column(db_types.JsonEncodedDict, nullable=True)
     reservation = Column(String(255), nullable=True)
+    reservation_holder = Column(String(36), nullable=True, index=True)
+    reservation_expires_at = Column(DateTime, nullable=True, index=True)
     conductor_affinity = Column(Integer,
                                 ForeignKey('conductors.id',
                                            name='nodes_conductor_affinity_fk'),
                                 nullable=True)
+    generation = _generation()
 
 
 class Nics(Base):
@@ -103,6 +117,9 @@ class Nics(Base):
     __table_args__ = (
         schema.UniqueConstraint('mac', name='uniq_nics0mac'),
         schema.UniqueConstraint('uuid', name='uniq_nicss0uuid'),
+        # Used to find the nics changed since the last DHCP sync.
+        Index('nics_created_at_idx', 'created_at'),
+        Index('nics_updated_at_idx', 'updated_at'),
         table_args())
     id = Column(Integer, primary_key=True)
     uuid = Column(String(36))
@@ -113,6 +130,7 @@ class Nics(Base):
                      index=True)
     extra = Column(db_types.JsonEncodedDict, nullable=True)
     type = Column(String(36), nullable=True)
+    generation = _generation()
 
 
 class Networks(Base):
@@ -148,6 +166,22 @@ class OSImage(Base):
     rootfstype = Column(String(36), nullable=True)
 
 
+class OSImageFile(Base):
+    """Represents a file of an Operation System image in the image store."""
+    __tablename__ = 'osimage_files'
+    __table_args__ = (
+        schema.UniqueConstraint('osimage_id', 'role',
+                                name='uniq_osimage_files0osimage_id0role'),
+        table_args())
+    id = Column(Integer, primary_key=True)
+    osimage_id = Column(Integer, ForeignKey('osimage.id'), nullable=False)
+    # kernel, initrd, rootimg...
+    role = Column(String(36), nullable=False)
+    # The sha256 of the content, its name in the image store.
+    content_id = Column(String(64), nullable=False, index=True)
+    size = Column(BigInteger, nullable=True)
+
+
 class Script(Base):
     """Represents scripts after os deployment"""
     __tablename__ = 'scripts'
@@ -158,3 +192,32 @@ class Script(Base):
     name = Column(String(255), nullable=True)
     post = Column(String(255), nullable=True)
     postboot = Column(String(255), nullable=True)
+
+
+class Inventory(Base):
+    """Represents the last inventory collected from a node."""
+    __tablename__ = 'inventory'
+    __table_args__ = (
+        schema.UniqueConstraint('node_id', name='uniq_inventory0node_id'),
+        table_args())
+    id = Column(Integer, primary_key=True)
+    node_id = Column(Integer, ForeignKey('nodes.id'), nullable=False)
+    content_hash = Column(String(64), nullable=True)
+    collected_at = Column(DateTime, nullable=True)
+
+
+class InventoryItem(Base):
+    """Represents a hardware component in the inventory of a node."""
+    __tablename__ = 'inventory_items'
+    __table_args__ = (
+        schema.UniqueConstraint('node_id', 'category', 'name',
+                                name='uniq_inventory_items0node_id0category'
+                                     '0name'),
+        table_args())
+    id = Column(Integer, primary_key=True)
+    node_id = Column(Integer, ForeignKey('nodes.id'), nullable=False,
+                     index=True)
+    category = Column(String(36), nullable=False)
+    name = Column(String(255), nullable=False)
+    content_hash = Column(String(64), nullable=True)
+    data = Column(db_types.JsonEncodedDict, nullable=True)
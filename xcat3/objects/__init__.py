@@ -1,3 +1,4 @@
 def register_all():
     __import__('xcat3.objects.node')
-    __import__('xcat3.objects.conductor')
\ No newline at end of file
+    __import__('xcat3.objects.conductor')
+    __import__('xcat3.objects.inventory')
\ No newline at end of file
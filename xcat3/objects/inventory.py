@@ -0,0 +1,83 @@
+# coding=utf-8
+#
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_versionedobjects import base as object_base
+
+from xcat3.common.i18n import _
+from xcat3.db import api as db_api
+from xcat3.objects import base
+from xcat3.objects import fields as object_fields
+
+
+@base.XCAT3ObjectRegistry.register
+class Inventory(base.XCAT3Object, object_base.VersionedObjectDictCompat):
+    VERSION = '1.0'
+
+    dbapi = db_api.get_instance()
+
+    fields = {
+        'name': object_fields.StringField(),
+        'content_hash': object_fields.StringField(nullable=True),
+        'collected_at': object_fields.DateTimeField(nullable=True),
+        'items': object_fields.FlexibleDictField(nullable=True),
+    }
+
+    # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
+    # methods can be used in the future to replace current explicit RPC calls.
+    # Implications of calling new remote procedures should be thought through.
+    # @object_base.remotable_classmethod
+    @classmethod
+    def list_by_node_names(cls, context, names, category=None):
+        """Return the stored inventory of nodes.
+
+        :param context: Security context.
+        :param names: the names of nodes.
+        :param category: Optional, only return the components of the
+                         category.
+        :returns: a list of :class:`Inventory` object, the nodes whose
+                  inventory was never collected are left out.
+        """
+        db_inventories = cls.dbapi.get_inventory_list(names,
+                                                      category=category)
+        return cls._from_db_object_list(context, db_inventories)
+
+    @classmethod
+    def get_hashes(cls, context, node_ids):
+        """Return the content hash of the stored inventory of nodes.
+
+        :param context: Security context.
+        :param node_ids: the ids of nodes.
+        :returns: a dict of node id and content hash.
+        """
+        return cls.dbapi.get_inventory_hashes(node_ids)
+
+    @classmethod
+    def update_many(cls, context, changed, unchanged):
+        """Store the inventory collected from nodes.
+
+        :param context: Security context.
+        :param changed: a dict of node id and a tuple (content_hash, items)
+                        of the inventories which changed, see
+                        :func:`xcat3.db.api.Connection.update_inventories`.
+        :param unchanged: the ids of the nodes whose inventory is the same
+                          as the stored one.
+        """
+        cls.dbapi.update_inventories(changed)
+        cls.dbapi.touch_inventories(unchanged)
+
+    def save(self, context=None):
+        """Save is not supported by Inventory objects."""
+        raise NotImplementedError(
+            _('Cannot update an inventory record directly.'))
@@ -14,20 +14,26 @@
 #    under the License.
 
 from oslo_utils import strutils
+from oslo_utils import versionutils
 from oslo_versionedobjects import base as object_base
 
 from xcat3.common import exception
+from xcat3.common import noderange
 from xcat3.db import api as db_api
 from xcat3.objects import base
 from xcat3.objects import fields as object_fields
 from xcat3.objects import nics as nics_object
 
 _UNSET_NICS_FIELDS = ('updated_at', 'created_at', 'id', 'node_id')
+# Filled from the other tables, they are not columns of the nodes.
+_RELATED_FIELDS = ('nics_info', 'osimage_info', 'scripts_info')
 
 
 @base.XCAT3ObjectRegistry.register
 class Node(base.XCAT3Object, object_base.VersionedObjectDictCompat):
-    VERSION = '1'
+    # Version 1.0: Initial version
+    # Version 1.1: Add status field
+    VERSION = '1.1'
 
     dbapi = db_api.get_instance()
 
@@ -39,6 +45,7 @@ class Node(base.XCAT3Object, object_base.VersionedObjectDictCompat):
         'reservation': object_fields.StringField(nullable=True),
         'mgt': object_fields.StringField(nullable=True),
         'state': object_fields.StringField(nullable=True),
+        'status': object_fields.StringField(nullable=True),
         'nics_info': object_fields.FlexibleDictField(nullable=True),
         'osimage_info': object_fields.FlexibleDictField(nullable=True),
         'scripts_info': object_fields.FlexibleDictField(nullable=True),
@@ -46,6 +53,12 @@ class Node(base.XCAT3Object, object_base.VersionedObjectDictCompat):
         'console_info': object_fields.FlexibleDictField(nullable=True),
     }
 
+    def obj_make_compatible(self, primitive, target_version):
+        super(Node, self).obj_make_compatible(primitive, target_version)
+        target_version = versionutils.convert_version_to_tuple(target_version)
+        if target_version < (1, 1):
+            primitive.pop('status', None)
+
     @classmethod
     def _get_nics_info(cls, context, node_id):
         nics = nics_object.Nics.list_by_node_id(context, node_id)
@@ -135,6 +148,94 @@ class Node(base.XCAT3Object, object_base.VersionedObjectDictCompat):
             setattr(node, 'nics_info', nics_info)
         return nodes
 
+    @classmethod
+    def list_fields(cls, context, fields, limit=None, sort_key=None,
+                    sort_dir=None, filters=None):
+        """Return some fields of nodes as dicts, without Node objects.
+
+        Only the columns of the fields are read, and the values are coerced
+        like the ones of the objects returned by :meth:`list`.
+
+        :param context: Security context.
+        :param fields: the names of the fields to return, the fields filled
+                       from the other tables are not loaded.
+        :param limit: maximum number of resources to return in a single result.
+        :param sort_key: column to sort results by.
+        :param sort_dir: direction to sort. "asc" or "desc".
+        :param filters: Filters to apply.
+        :returns: a list of dicts of field name and value.
+        """
+        fields = [f for f in fields if f in cls.fields]
+        columns = [f for f in fields if f not in _RELATED_FIELDS]
+        related = [f for f in fields if f in _RELATED_FIELDS]
+        coercions = [(f, cls.fields[f].coerce) for f in columns]
+        rows = cls.dbapi.get_nodeinfo_list(columns=columns or ['id'],
+                                           filters=filters, limit=limit,
+                                           sort_key=sort_key,
+                                           sort_dir=sort_dir)
+        nodes = []
+        for row in rows:
+            node = dict((f, coerce(None, f, value))
+                        for (f, coerce), value in zip(coercions, row))
+            for f in related:
+                node[f] = cls.fields[f].coerce(None, f, None)
+            nodes.append(node)
+        return nodes
+
+    @classmethod
+    def iter_with_nics(cls, context, fields, nic_fields, batch_size):
+        """Iterate over all the nodes as dicts, with their nics.
+
+        The nodes are read as they are iterated, see
+        :meth:`xcat3.db.api.iter_nodes_with_nics`, and their values are
+        coerced like in :meth:`list_fields`.
+
+        :param context: Security context.
+        :param fields: the names of the fields of the nodes to return.
+        :param nic_fields: the names of the columns of the nics to return,
+                           in the 'nics' list of the 'nics_info' field.
+        :param batch_size: the number of nodes read at a time.
+        :returns: an iterator of dicts of field name and value.
+        """
+        columns = [f for f in fields
+                   if f in cls.fields and f not in _RELATED_FIELDS]
+        coercions = [(f, cls.fields[f].coerce) for f in columns]
+        nic_coercions = []
+        for f in nic_fields:
+            field = nics_object.Nics.fields.get(f)
+            nic_coercions.append((f, field.coerce if field else None))
+        for values, nics in cls.dbapi.iter_nodes_with_nics(
+                columns, nic_fields, batch_size):
+            node = dict((f, coerce(None, f, value))
+                        for (f, coerce), value in zip(coercions, values))
+            node['nics_info'] = {'nics': [
+                dict((f, coerce(None, f, value) if coerce else value)
+                     for (f, coerce), value in zip(nic_coercions, nic))
+                for nic in nics]}
+            yield node
+
+    @classmethod
+    def get_version(cls, context, node_name=None):
+        """Return a value which changes when the nodes change.
+
+        :param context: Security context.
+        :param node_name: the name of a node, all the nodes by default.
+        :returns: a tuple, see :meth:`xcat3.db.api.get_nodes_version`.
+        """
+        return cls.dbapi.get_nodes_version(node_name)
+
+    @classmethod
+    def get_names(cls, context, expression):
+        """Return the names of the nodes of a noderange.
+
+        :param context: Security context.
+        :param expression: a noderange, see :mod:`xcat3.common.noderange`.
+        :raises: InvalidNoderange if the noderange is not valid.
+        :returns: a sorted list of node names.
+        """
+        return cls.dbapi.get_node_names_in_range(
+            noderange.parse(expression))
+
     @classmethod
     def list_in(cls, context, names, filters=None):
         """Return a list of Node objects within the names
@@ -188,8 +289,8 @@ class Node(base.XCAT3Object, object_base.VersionedObjectDictCompat):
         cls.dbapi.release_node(tag, node_id)
 
     @classmethod
-    def reserve_nodes(cls, context, tag, node_names):
-        db_nodes = cls.dbapi.reserve_nodes(tag, node_names)
+    def reserve_nodes(cls, context, tag, node_names, holder=None):
+        db_nodes = cls.dbapi.reserve_nodes(tag, node_names, holder=holder)
         nodes = cls._from_db_object_list(context, db_nodes)
         for node in nodes:
             nics_info = cls._get_nics_info(context, node.id)
@@ -197,8 +298,51 @@ class Node(base.XCAT3Object, object_base.VersionedObjectDictCompat):
         return nodes
 
     @classmethod
-    def release_nodes(cls, context, tag, node_names):
-        cls.dbapi.release_nodes(tag, node_names)
+    def reserve_nodes_partial(cls, context, tag, node_names, holder=None):
+        """Reserve the free nodes within the names.
+
+        :param context: Security context.
+        :param tag: A string uniquely identifying the reservation holder.
+        :param node_names: The name of nodes.
+        :param holder: The ID of the task holding the reservation.
+        :returns: a tuple (nodes, locked, missing), nodes is a list of
+                  reserved :class:`Node` object, locked and missing are the
+                  names of nodes reserved by others or not found.
+        """
+        db_nodes, locked, missing = cls.dbapi.reserve_nodes_partial(
+            tag, node_names, holder=holder)
+        nodes = cls._from_db_object_list(context, db_nodes)
+        for node in nodes:
+            nics_info = cls._get_nics_info(context, node.id)
+            setattr(node, 'nics_info', nics_info)
+        return nodes, locked, missing
+
+    @classmethod
+    def transition_nodes(cls, context, transitions):
+        """Move nodes to new provisioning states, see states.py.
+
+        :param context: Security context.
+        :param transitions: A list of (source, target, task_action,
+                            node_ids) tuples, the nodes of a transition are
+                            only moved if they are still in the source
+                            state.
+        :returns: The set of the ids of the nodes moved.
+        """
+        return cls.dbapi.transition_nodes(transitions)
+
+    @classmethod
+    def release_nodes(cls, context, tag, node_names, holder=None):
+        cls.dbapi.release_nodes(tag, node_names, holder=holder)
+
+    @classmethod
+    def renew_reservations(cls, context, holders):
+        """Renew the reservation lease of the nodes held by the holders.
+
+        :param context: Security context.
+        :param holders: A list of reservation holder IDs.
+        :returns: the number of nodes whose lease was renewed.
+        """
+        return cls.dbapi.renew_reservations(holders)
 
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
     # methods can be used in the future to replace current explicit RPC calls.
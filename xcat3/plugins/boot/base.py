@@ -0,0 +1,24 @@
+import abc
+
+import six
+
+
+@six.add_metaclass(abc.ABCMeta)
+class DHCPInterface(object):
+    """Interface applying the host entries to a DHCP server."""
+
+    @abc.abstractmethod
+    def apply(self, changes, hosts):
+        """Apply the changes of the host entries.
+
+        :param changes: a :class:`xcat3.plugins.boot.dhcp.Changes`. When
+                        its ``full`` attribute is set, the entries are the
+                        whole configuration and the DHCP server may still
+                        hold entries of a previous run.
+        :param hosts: a dict of MAC address and
+                      :class:`xcat3.plugins.boot.dhcp.HostEntry` once the
+                      changes are applied, for the backends rewriting the
+                      whole configuration.
+        :raises: DHCPFailure if the changes could not be applied, they are
+                 computed again and retried by the next synchronization.
+        """
@@ -0,0 +1,138 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Incremental generation of the DHCP host entries from the nics table.
+
+The first synchronization reads every nic. The next ones only read the
+nics created or updated, or whose node was, since the latest change seen
+(the watermark), and compare them with the entries already applied, so a
+synchronization emits nothing when nothing changed. Deleted rows leave no
+trace to query; they are detected when the number of valid nics differs
+from the number of entries, which then triggers a scan of the MAC
+addresses alone.
+"""
+
+import collections
+import datetime
+
+from oslo_log import log
+
+from xcat3.conf import CONF
+
+LOG = log.getLogger(__name__)
+
+
+class HostEntry(collections.namedtuple('HostEntry',
+                                       ['mac', 'ip', 'hostname'])):
+    """The fixed address of a nic."""
+
+    __slots__ = ()
+
+    @property
+    def name(self):
+        """Unique name of the host declaration."""
+        return '%s-%s' % (self.hostname, self.mac.replace(':', ''))
+
+
+class Changes(object):
+    """The host entries added, changed and removed by a synchronization.
+
+    ``changed`` is a list of (old, new) entry tuples.
+    """
+
+    def __init__(self, full=False):
+        self.full = full
+        self.added = []
+        self.changed = []
+        self.removed = []
+
+    def __len__(self):
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+    def __bool__(self):
+        return self.full or len(self) > 0
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return ('<Changes full=%s added=%d changed=%d removed=%d>' %
+                (self.full, len(self.added), len(self.changed),
+                 len(self.removed)))
+
+
+def normalize_mac(mac):
+    return mac.strip().lower().replace('-', ':')
+
+
+class HostTracker(object):
+    """The host entries applied to a DHCP server and the watermark.
+
+    :param dbapi: the database API.
+    """
+
+    def __init__(self, dbapi):
+        self.dbapi = dbapi
+        self.hosts = dict()
+        self.watermark = None
+
+    def _changes(self):
+        full = self.watermark is None
+        since = None
+        if not full:
+            since = self.watermark - datetime.timedelta(
+                seconds=CONF.dhcp.watermark_margin)
+        changes = Changes(full=full)
+        hosts = dict(self.hosts)
+        watermark = self.watermark
+        for mac, ip, hostname, changed_at in self.dbapi.get_dhcp_hosts(
+                since):
+            mac = normalize_mac(mac)
+            if watermark is None or changed_at > watermark:
+                watermark = changed_at
+            old = hosts.get(mac)
+            entry = HostEntry(mac, ip, hostname) if ip and hostname else None
+            if entry == old:
+                continue
+            if entry is None:
+                changes.removed.append(hosts.pop(mac))
+            elif old is None:
+                changes.added.append(entry)
+                hosts[mac] = entry
+            else:
+                changes.changed.append((old, entry))
+                hosts[mac] = entry
+        if not full and self.dbapi.get_dhcp_host_macs(
+                count_only=True) != len(hosts):
+            present = set(normalize_mac(mac)
+                          for mac in self.dbapi.get_dhcp_host_macs())
+            for mac in set(hosts) - present:
+                changes.removed.append(hosts.pop(mac))
+        return changes, hosts, watermark
+
+    def sync(self, backend):
+        """Apply the changes since the last synchronization.
+
+        The state of the tracker is only updated once the backend applied
+        the changes, a failed synchronization is retried as a whole.
+
+        :param backend: the :class:`xcat3.plugins.boot.base.DHCPInterface`.
+        :returns: the :class:`Changes` applied.
+        """
+        changes, hosts, watermark = self._changes()
+        if changes:
+            backend.apply(changes, hosts)
+            LOG.info('DHCP host entries synchronized: %(changes)r, '
+                     '%(count)d entries.',
+                     {'changes': changes, 'count': len(hosts)})
+        self.hosts = hosts
+        self.watermark = watermark
+        return changes
@@ -0,0 +1,102 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""DHCP backend rewriting a hosts file atomically.
+
+The file is written next to its destination then renamed over it, so the
+DHCP server never reads a partial file. The rendered text of each entry is
+cached, a synchronization only formats the changed entries, and the file
+is left untouched when its content would not change.
+"""
+
+import hashlib
+import os
+import shlex
+import tempfile
+
+from oslo_concurrency import processutils
+from oslo_log import log
+import six
+
+from xcat3.common import exception
+from xcat3.common import utils
+from xcat3.conf import CONF
+from xcat3.plugins.boot import base
+
+LOG = log.getLogger(__name__)
+
+
+def format_isc(entry):
+    return ('host %(name)s {\n'
+            '  hardware ethernet %(mac)s;\n'
+            '  fixed-address %(ip)s;\n'
+            '  option host-name "%(hostname)s";\n'
+            '}\n' % {'name': entry.name, 'mac': entry.mac, 'ip': entry.ip,
+                     'hostname': entry.hostname})
+
+
+def format_dnsmasq(entry):
+    return '%s,%s,%s\n' % (entry.mac, entry.ip, entry.hostname)
+
+
+_FORMATS = {'isc': format_isc, 'dnsmasq': format_dnsmasq}
+
+
+class FileDHCP(base.DHCPInterface):
+    """Keep an ISC dhcpd include file or a dnsmasq hostsfile."""
+
+    def __init__(self):
+        self._lines = dict()
+        self._digest = None
+
+    def apply(self, changes, hosts):
+        fmt = _FORMATS[CONF.dhcp.file_format]
+        if changes.full:
+            self._lines = dict()
+        for entry in changes.removed:
+            self._lines.pop(entry.mac, None)
+        for entry in changes.added:
+            self._lines[entry.mac] = fmt(entry)
+        for old, entry in changes.changed:
+            self._lines[entry.mac] = fmt(entry)
+        content = ''.join(self._lines[mac]
+                          for mac in sorted(self._lines)).encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()
+        if digest == self._digest and os.path.exists(CONF.dhcp.hosts_file):
+            return
+        self._write(content)
+        self._digest = digest
+        if CONF.dhcp.reload_command:
+            try:
+                utils.execute(*shlex.split(CONF.dhcp.reload_command))
+            except (OSError, processutils.ProcessExecutionError) as e:
+                raise exception.DHCPFailure(reason=six.text_type(e))
+
+    def _write(self, content):
+        path = CONF.dhcp.hosts_file
+        directory = os.path.dirname(path) or '.'
+        try:
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix='.xcat3-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.chmod(tmp, 0o644)
+                os.rename(tmp, path)
+            except Exception:
+                os.unlink(tmp)
+                raise
+        except (IOError, OSError) as e:
+            raise exception.DHCPFailure(reason=six.text_type(e))
+        LOG.debug('Wrote %(count)d DHCP host entries to %(path)s',
+                  {'count': len(self._lines), 'path': path})
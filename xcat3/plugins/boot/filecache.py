@@ -0,0 +1,257 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Open boot files shared by all the clients downloading them.
+
+When thousands of nodes boot, they all fetch the same few kernels,
+initrds and root images. A file is opened and stat-ed once, then the
+same descriptor serves every client: the reads are positional, so the
+clients do not share a file offset. The path is stat-ed again at most
+every [boot]handle_cache_revalidate seconds to pick up a new version of
+the file. The clients still downloading the previous version keep
+reading it until they are done.
+
+Boot files must be replaced by renaming a new file over them, not
+rewritten in place, like any file served while it may change.
+"""
+
+import collections
+import errno
+import mmap
+import os
+import stat
+import time
+
+import eventlet
+from eventlet import hubs
+from eventlet.green import socket
+import six
+
+try:
+    # os.sendfile only exists on python 3, pysendfile provides it on 2.
+    from os import sendfile
+except ImportError:
+    try:
+        from sendfile import sendfile
+    except ImportError:
+        sendfile = None
+
+from xcat3.common import exception
+
+# Largest amount of data handed to a single sendfile call.
+_SENDFILE_CHUNK = 4 * 1024 * 1024
+# Size of the slices of the memory map given to send when sendfile is
+# not available.
+_SEND_CHUNK = 256 * 1024
+
+
+class FileHandle(object):
+    """An open boot file and the metadata served with it."""
+
+    __slots__ = ('name', 'fd', 'size', 'mtime', 'etag', 'users', 'stale',
+                 'checked_at', '_ident', '_map')
+
+    def __init__(self, name, path):
+        self.name = name
+        self.fd = os.open(path, os.O_RDONLY)
+        try:
+            st = os.fstat(self.fd)
+            if not stat.S_ISREG(st.st_mode):
+                raise OSError(errno.EISDIR, os.strerror(errno.EISDIR))
+        except OSError:
+            os.close(self.fd)
+            raise
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.etag = '"%x-%x-%x"' % (st.st_ino, st.st_size,
+                                    int(st.st_mtime * 1000000))
+        self._ident = (st.st_dev, st.st_ino, st.st_size, st.st_mtime)
+        self.users = 0
+        self.stale = False
+        self.checked_at = time.time()
+        self._map = None
+
+    def same_file(self, st):
+        return self._ident == (st.st_dev, st.st_ino, st.st_size,
+                               st.st_mtime)
+
+    @property
+    def map(self):
+        """The read-only memory map of the file, created on first use."""
+        if self._map is None:
+            self._map = mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def read(self, offset, size):
+        """Read up to size bytes at offset, without moving a file offset."""
+        if hasattr(os, 'pread'):
+            return os.pread(self.fd, size, offset)
+        # lseek and read do not yield to other green threads, so nothing
+        # can move the offset of the shared descriptor in between.
+        os.lseek(self.fd, offset, os.SEEK_SET)
+        return os.read(self.fd, size)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class HandleCache(object):
+    """The least recently used boot files, kept open.
+
+    :param root: the directory of the boot files.
+    :param size: the number of files kept open.
+    :param revalidate: seconds a file is served before its path is checked
+                       again.
+    """
+
+    def __init__(self, root, size, revalidate):
+        self.root = os.path.realpath(root)
+        self.size = size
+        self.revalidate = revalidate
+        self._handles = collections.OrderedDict()
+        self.hits = 0
+        self.opens = 0
+
+    @staticmethod
+    def _key(name):
+        parts = [p for p in name.replace('\\', '/').split('/')
+                 if p and p != '.']
+        if not parts or '..' in parts or '\x00' in name:
+            raise exception.BootFileNotFound(name=name)
+        return '/'.join(parts)
+
+    def _path(self, key):
+        # The symbolic links are followed, as long as they stay in the
+        # root directory.
+        path = os.path.realpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise exception.BootFileNotFound(name=key)
+        return path
+
+    def open(self, name):
+        """Get the open handle of a boot file.
+
+        The handle must be given back with :meth:`release`.
+
+        :param name: the path of the file relative to the root directory.
+        :raises: BootFileNotFound if the file does not exist or is not a
+                 regular file of the root directory.
+        """
+        key = self._key(name)
+        handle = self._handles.pop(key, None)
+        if handle is not None and not self._valid(handle):
+            self._discard(handle)
+            handle = None
+        if handle is None:
+            try:
+                handle = FileHandle(key, self._path(key))
+            except (OSError, IOError) as e:
+                if e.errno in (errno.ENOENT, errno.ENOTDIR, errno.EACCES,
+                               errno.EISDIR):
+                    raise exception.BootFileNotFound(name=name)
+                raise
+            self.opens += 1
+            while len(self._handles) >= self.size:
+                self._discard(self._handles.popitem(last=False)[1])
+        else:
+            self.hits += 1
+        # Reinserted last to keep the least recently used file first.
+        self._handles[key] = handle
+        handle.users += 1
+        return handle
+
+    def _valid(self, handle):
+        now = time.time()
+        if now - handle.checked_at < self.revalidate:
+            return True
+        try:
+            st = os.stat(self._path(handle.name))
+        except (OSError, exception.BootFileNotFound):
+            return False
+        handle.checked_at = now
+        return handle.same_file(st)
+
+    def _discard(self, handle):
+        handle.stale = True
+        if not handle.users:
+            handle.close()
+
+    def release(self, handle):
+        """Give back a handle obtained with :meth:`open`."""
+        handle.users -= 1
+        if handle.stale and not handle.users:
+            handle.close()
+
+    def clear(self):
+        """Close the files which are not being served."""
+        while self._handles:
+            self._discard(self._handles.popitem()[1])
+
+
+def _sendfile(sock, handle, offset, length):
+    fd = sock.fileno()
+    while length > 0:
+        try:
+            sent = sendfile(fd, handle.fd, offset,
+                            min(length, _SENDFILE_CHUNK))
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise socket.error(e.errno, e.strerror)
+            # The socket of a green socket is non blocking, wait until it
+            # can take more data.
+            hubs.trampoline(fd, write=True, timeout=sock.gettimeout(),
+                            timeout_exc=socket.timeout)
+            continue
+        if not sent:
+            raise socket.error(errno.EIO, 'boot file %s truncated' %
+                               handle.name)
+        offset += sent
+        length -= sent
+        # Keep the other clients served when the socket buffers are large
+        # enough to never fill up.
+        eventlet.sleep(0)
+
+
+def _send_mapped(sock, handle, offset, length):
+    end = offset + length
+    while offset < end:
+        size = min(end - offset, _SEND_CHUNK)
+        if six.PY2:
+            sock.sendall(buffer(handle.map, offset, size))  # noqa
+        else:
+            view = memoryview(handle.map)
+            try:
+                sock.sendall(view[offset:offset + size])
+            finally:
+                view.release()
+        offset += size
+        eventlet.sleep(0)
+
+
+def send_range(sock, handle, offset, length):
+    """Send a range of a boot file to a green socket without copying it.
+
+    The kernel copies the file to the socket with sendfile when it is
+    available, otherwise the pages of the memory map of the file are
+    given directly to send.
+    """
+    if length <= 0:
+        return
+    if sendfile is not None:
+        _sendfile(sock, handle, offset, length)
+    else:
+        _send_mapped(sock, handle, offset, length)
@@ -0,0 +1,356 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Kernels, initrds and root images served by the conductor.
+
+The files of [boot]root_dir are served over HTTP, and over TFTP for the
+legacy PXE firmwares, from green threads. The body of an HTTP response
+is copied by the kernel from the page cache to the socket, the file data
+never goes through the conductor, and a file is opened once for all the
+clients downloading it, see :mod:`xcat3.plugins.boot.filecache`.
+
+The HTTP server only implements what the boot loaders use: GET and HEAD,
+persistent connections, single byte ranges to resume a download and the
+conditional requests. Beyond [boot]max_connections clients, the new
+connections are answered 503 and the new TFTP requests an error, the
+firmwares retry them later.
+"""
+
+import email.utils
+import mimetypes
+import os
+
+import eventlet
+from eventlet.green import socket
+from oslo_log import log
+from six.moves import http_client
+from six.moves.urllib import parse
+
+from xcat3.common import exception
+from xcat3.common.i18n import _LI, _LW
+from xcat3.conf import CONF
+from xcat3.plugins.boot import filecache
+from xcat3.plugins.boot import tftp
+
+LOG = log.getLogger(__name__)
+
+# Enough for thousands of nodes connecting at the same time, the kernel
+# caps it to net.core.somaxconn.
+_LISTEN_BACKLOG = 4096
+_MAX_LINE = 8192
+_MAX_HEADERS = 100
+# Seconds given to a client refused for lack of connection slots to send
+# its request and read the answer.
+_REJECT_TIMEOUT = 5
+_RETRY_AFTER = 5
+
+_UNSATISFIABLE = object()
+
+
+class _BadRequest(Exception):
+    pass
+
+
+class ConnectionLimit(object):
+    """The number of clients served at the same time."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.peak = 0
+        self.rejected = 0
+
+    def acquire(self):
+        """Take a slot, return False if all the slots are taken."""
+        if self.active >= self.limit:
+            self.rejected += 1
+            return False
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        return True
+
+    def release(self):
+        self.active -= 1
+
+
+def _parse_range(value, size):
+    """Parse a Range header into the first and last bytes to send.
+
+    :returns: None to send the whole file, either because there is no
+              range or because it is not understood or has several
+              ranges, or _UNSATISFIABLE.
+    """
+    if not value or not value.startswith('bytes='):
+        return None
+    specs = value[len('bytes='):].split(',')
+    if len(specs) != 1:
+        return None
+    start, sep, end = specs[0].strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not start:
+            suffix = int(end)
+            if suffix <= 0 or not size:
+                return _UNSATISFIABLE
+            return max(size - suffix, 0), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return _UNSATISFIABLE
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def _http_date(timestamp=None):
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+
+def _not_modified(headers, handle):
+    etags = headers.get('if-none-match')
+    if etags is not None:
+        etags = [tag.strip() for tag in etags.split(',')]
+        return '*' in etags or handle.etag in etags
+    since = headers.get('if-modified-since')
+    if since is not None:
+        parsed = email.utils.parsedate_tz(since)
+        if parsed is not None:
+            return int(handle.mtime) <= email.utils.mktime_tz(parsed)
+    return False
+
+
+class HTTPServer(object):
+    """Serve the boot files over HTTP/1.1.
+
+    :param files: the :class:`filecache.HandleCache` of the boot files.
+    :param limit: the :class:`ConnectionLimit` shared with TFTP.
+    """
+
+    def __init__(self, files, limit):
+        self.files = files
+        self.limit = limit
+        self.requests = 0
+
+    def serve(self, sock):
+        """Accept the connections of the clients until killed."""
+        while True:
+            try:
+                client, address = sock.accept()
+            except socket.error as e:
+                # Out of file descriptors most likely, the pending
+                # connections wait in the backlog.
+                LOG.warning(_LW('Cannot accept boot file clients: %s'), e)
+                eventlet.sleep(0.1)
+                continue
+            if self.limit.acquire():
+                eventlet.spawn_n(self._serve, client, address)
+            else:
+                eventlet.spawn_n(self._reject, client)
+
+    def _reject(self, sock):
+        try:
+            sock.settimeout(_REJECT_TIMEOUT)
+            # Answering before reading the request could reset the
+            # connection before the client reads the answer.
+            sock.recv(_MAX_LINE)
+            self._send_head(sock, http_client.SERVICE_UNAVAILABLE,
+                            [('Retry-After', str(_RETRY_AFTER)),
+                             ('Content-Length', '0')], False)
+        except socket.error:
+            pass
+        finally:
+            sock.close()
+
+    def _serve(self, sock, address):
+        sock.settimeout(CONF.boot.client_timeout)
+        rfile = sock.makefile('rb')
+        try:
+            while True:
+                try:
+                    request = self._read_request(rfile)
+                except _BadRequest:
+                    self._send_head(sock, http_client.BAD_REQUEST,
+                                    [('Content-Length', '0')], False)
+                    break
+                if request is None or not self._handle(sock, *request):
+                    break
+        except socket.error as e:
+            LOG.debug('Boot file client %(addr)s lost: %(err)s',
+                      {'addr': address[0], 'err': e})
+        finally:
+            rfile.close()
+            sock.close()
+            self.limit.release()
+
+    @staticmethod
+    def _readline(rfile):
+        line = rfile.readline(_MAX_LINE + 1)
+        if len(line) > _MAX_LINE:
+            raise _BadRequest()
+        return line.decode('latin-1')
+
+    def _read_request(self, rfile):
+        """Read a request line and its headers.
+
+        :returns: a (method, target, version, headers) tuple, or None when
+                  the client closed the connection.
+        """
+        line = self._readline(rfile)
+        # Empty lines are allowed before a request.
+        while line in ('\r\n', '\n'):
+            line = self._readline(rfile)
+        if not line:
+            return None
+        parts = line.split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise _BadRequest()
+        headers = {}
+        while True:
+            line = self._readline(rfile)
+            if line in ('\r\n', '\n', ''):
+                break
+            name, sep, value = line.partition(':')
+            if not sep or len(headers) >= _MAX_HEADERS:
+                raise _BadRequest()
+            headers[name.strip().lower()] = value.strip()
+        return parts[0], parts[1], parts[2], headers
+
+    @staticmethod
+    def _send_head(sock, status, headers, keep_alive):
+        lines = ['HTTP/1.1 %d %s' % (status, http_client.responses[status]),
+                 'Date: %s' % _http_date(),
+                 'Server: xcat3',
+                 'Connection: %s' % ('keep-alive' if keep_alive else 'close')]
+        lines.extend('%s: %s' % header for header in headers)
+        lines.extend(['', ''])
+        sock.sendall('\r\n'.join(lines).encode('latin-1'))
+
+    def _handle(self, sock, method, target, version, headers):
+        """Answer a request, return whether the connection is kept."""
+        self.requests += 1
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.0':
+            keep_alive = connection == 'keep-alive'
+        else:
+            keep_alive = connection != 'close'
+        if method not in ('GET', 'HEAD'):
+            self._send_head(sock, http_client.METHOD_NOT_ALLOWED,
+                            [('Allow', 'GET, HEAD'),
+                             ('Content-Length', '0')], keep_alive)
+            return keep_alive
+        name = parse.unquote(parse.urlsplit(target).path)
+        try:
+            handle = self.files.open(name)
+        except exception.BootFileNotFound:
+            self._send_head(sock, http_client.NOT_FOUND,
+                            [('Content-Length', '0')], keep_alive)
+            return keep_alive
+        try:
+            return self._send_file(sock, method, headers, handle, keep_alive)
+        finally:
+            self.files.release(handle)
+
+    def _send_file(self, sock, method, headers, handle, keep_alive):
+        content_type = (mimetypes.guess_type(handle.name)[0] or
+                        'application/octet-stream')
+        common = [('ETag', handle.etag),
+                  ('Last-Modified', _http_date(handle.mtime)),
+                  ('Accept-Ranges', 'bytes')]
+        if _not_modified(headers, handle):
+            self._send_head(sock, http_client.NOT_MODIFIED, common,
+                            keep_alive)
+            return keep_alive
+        byte_range = None
+        if headers.get('if-range', handle.etag) == handle.etag:
+            byte_range = _parse_range(headers.get('range'), handle.size)
+        if byte_range is _UNSATISFIABLE:
+            self._send_head(sock, http_client.REQUESTED_RANGE_NOT_SATISFIABLE,
+                            common + [
+                                ('Content-Range', 'bytes */%d' % handle.size),
+                                ('Content-Length', '0')], keep_alive)
+            return keep_alive
+        if byte_range is None:
+            status = http_client.OK
+            offset, length = 0, handle.size
+            extra = []
+        else:
+            status = http_client.PARTIAL_CONTENT
+            offset, length = byte_range[0], byte_range[1] - byte_range[0] + 1
+            extra = [('Content-Range', 'bytes %d-%d/%d' % (
+                byte_range[0], byte_range[1], handle.size))]
+        self._send_head(sock, status, common + extra + [
+            ('Content-Type', content_type),
+            ('Content-Length', str(length))], keep_alive)
+        if method == 'GET':
+            filecache.send_range(sock, handle, offset, length)
+        return keep_alive
+
+
+class BootFileServer(object):
+    """The HTTP and TFTP boot file servers of a conductor."""
+
+    def __init__(self):
+        self.files = filecache.HandleCache(CONF.boot.root_dir,
+                                           CONF.boot.handle_cache_size,
+                                           CONF.boot.handle_cache_revalidate)
+        self.limit = ConnectionLimit(CONF.boot.max_connections)
+        self.http = HTTPServer(self.files, self.limit)
+        self.tftp = tftp.TFTPServer(self.files, self.limit)
+        self.http_address = None
+        self.tftp_address = None
+        self._threads = []
+
+    def start(self):
+        """Start the servers enabled in the configuration."""
+        if not (CONF.boot.http_port or CONF.boot.tftp_port):
+            return
+        if not os.path.isdir(CONF.boot.root_dir):
+            LOG.warning(_LW('The boot file directory %s does not exist, '
+                            'nothing will be served until it is created.'),
+                        CONF.boot.root_dir)
+        if CONF.boot.http_port:
+            sock = eventlet.listen((CONF.boot.host_ip, CONF.boot.http_port),
+                                   backlog=_LISTEN_BACKLOG)
+            self.http_address = sock.getsockname()
+            self._threads.append((sock, eventlet.spawn(self.http.serve,
+                                                       sock)))
+        if CONF.boot.tftp_port:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((CONF.boot.host_ip, CONF.boot.tftp_port))
+            self.tftp_address = sock.getsockname()
+            self._threads.append((sock, eventlet.spawn(self.tftp.serve,
+                                                       sock)))
+        if self._threads:
+            LOG.info(_LI('Serving the boot files of %(dir)s, HTTP on '
+                         '%(http)s, TFTP on %(tftp)s.'),
+                     {'dir': CONF.boot.root_dir,
+                      'http': self.http_address, 'tftp': self.tftp_address})
+
+    def stop(self):
+        """Stop accepting clients and close the cached files."""
+        for sock, thread in self._threads:
+            thread.kill()
+            sock.close()
+        self._threads = []
+        self.files.clear()
+
+    def stats(self):
+        return {'active': self.limit.active,
+                'peak': self.limit.peak,
+                'rejected': self.limit.rejected,
+                'http_requests': self.http.requests,
+                'tftp_transfers': self.tftp.transfers,
+                'files_opened': self.files.opens,
+                'cache_hits': self.files.hits}
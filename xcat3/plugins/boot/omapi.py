@@ -0,0 +1,294 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""DHCP backend updating ISC dhcpd through OMAPI.
+
+The host objects are created and deleted one by one in the running
+server, which persists them in its lease file, so no restart is needed.
+The requests of a synchronization are pipelined on one connection,
+[dhcp]omapi_window requests are in flight at a time.
+
+Only the subset of the protocol needed for host objects is implemented,
+with the HMAC-MD5 authenticator of dhcpd.
+"""
+
+import binascii
+import hashlib
+import hmac
+import random
+import struct
+
+from eventlet.green import socket
+from oslo_log import log
+import six
+
+from xcat3.common import exception
+from xcat3.common.i18n import _
+from xcat3.conf import CONF
+from xcat3.plugins.boot import base
+
+LOG = log.getLogger(__name__)
+
+PROTOCOL_VERSION = 100
+HEADER_SIZE = 24
+
+OP_OPEN = 1
+OP_REFRESH = 2
+OP_UPDATE = 3
+OP_NOTIFY = 4
+OP_STATUS = 5
+OP_DELETE = 6
+
+HMAC_MD5 = b'hmac-md5.SIG-ALG.REG.INT.'
+HARDWARE_ETHERNET = struct.pack('!I', 1)
+TRUE = struct.pack('!I', 1)
+
+
+def _pack_items(items):
+    data = b''
+    for key, value in items:
+        data += struct.pack('!H', len(key)) + key
+        data += struct.pack('!I', len(value)) + value
+    return data + b'\x00\x00'
+
+
+class Message(object):
+    """An OMAPI message, see omapip/protocol.c of ISC dhcp."""
+
+    def __init__(self, opcode, handle=0, message=None, obj=None, tid=None,
+                 rid=0):
+        self.opcode = opcode
+        self.handle = handle
+        self.message = message or []
+        self.obj = obj or []
+        self.tid = random.randint(0, 0xffffffff) if tid is None else tid
+        self.rid = rid
+        self.authid = 0
+        self.signature = b''
+
+    @classmethod
+    def open(cls, typename, obj, create=False):
+        message = [(b'type', typename)]
+        if create:
+            message += [(b'create', TRUE), (b'exclusive', TRUE)]
+        return cls(OP_OPEN, message=message, obj=obj)
+
+    def _signed_part(self, authlen):
+        return (struct.pack('!IIIII', authlen, self.opcode, self.handle,
+                            self.tid, self.rid) +
+                _pack_items(self.message) + _pack_items(self.obj))
+
+    def pack(self, authid=0, key=None):
+        """Serialize the message, signed when a key is given."""
+        signature = b''
+        if key is not None:
+            signature = hmac.new(key, self._signed_part(16),
+                                 hashlib.md5).digest()
+        return (struct.pack('!I', authid) +
+                self._signed_part(len(signature)) + signature)
+
+    def verify(self, key):
+        if key is None:
+            return not self.signature
+        expected = hmac.new(key, self._signed_part(len(self.signature)),
+                            hashlib.md5).digest()
+        return hmac.compare_digest(expected, self.signature)
+
+    def get(self, name, default=None):
+        for key, value in self.message + self.obj:
+            if key == name:
+                return value
+        return default
+
+    @property
+    def result(self):
+        """Result code of a status message, 0 is success."""
+        value = self.get(b'result')
+        return struct.unpack('!I', value)[0] if value else 0
+
+
+class Client(object):
+    """A connection to the OMAPI service of a DHCP server."""
+
+    def __init__(self, host, port, key_name=None, key=None, timeout=None):
+        self.server = '%s:%d' % (host, port)
+        self._address = (host, port)
+        self._key_name = key_name
+        self._key = binascii.a2b_base64(key) if key else None
+        self._timeout = timeout
+        self._sock = None
+        self._authid = 0
+
+    def _fail(self, reason):
+        raise exception.OmapiFailure(server=self.server, reason=reason)
+
+    def connect(self):
+        try:
+            self._sock = socket.create_connection(self._address,
+                                                  self._timeout)
+            self._sock.sendall(struct.pack('!II', PROTOCOL_VERSION,
+                                           HEADER_SIZE))
+            version, size = struct.unpack('!II', self._read(8))
+        except socket.error as e:
+            self.close()
+            self._fail(six.text_type(e))
+        if (version, size) != (PROTOCOL_VERSION, HEADER_SIZE):
+            self.close()
+            self._fail(_('unsupported protocol version %d') % version)
+        if self._key is not None:
+            resp = self.call(Message.open(
+                b'authenticator', [(b'name', self._key_name.encode('utf-8')),
+                                   (b'algorithm', HMAC_MD5)]), sign=False)
+            if resp.opcode != OP_UPDATE or not resp.handle:
+                self.close()
+                self._fail(_('authentication refused'))
+            self._authid = resp.handle
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        self._authid = 0
+
+    def _read(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self._sock.recv(size - len(data))
+            if not chunk:
+                raise socket.error(_('connection closed by the server'))
+            data += chunk
+        return data
+
+    def _read_items(self):
+        items = []
+        while True:
+            key = self._read(struct.unpack('!H', self._read(2))[0])
+            if not key:
+                return items
+            value = self._read(struct.unpack('!I', self._read(4))[0])
+            items.append((key, value))
+
+    def _receive(self):
+        authid, authlen, opcode, handle, tid, rid = struct.unpack(
+            '!IIIIII', self._read(HEADER_SIZE))
+        msg = Message(opcode, handle, self._read_items(), self._read_items(),
+                      tid=tid, rid=rid)
+        msg.authid = authid
+        msg.signature = self._read(authlen)
+        if not msg.verify(self._key if authid else None):
+            self._fail(_('bad message signature'))
+        return msg
+
+    def _send(self, msg, sign=True):
+        key = self._key if sign and self._authid else None
+        self._sock.sendall(msg.pack(self._authid if key else 0, key))
+
+    def call(self, msg, sign=True):
+        """Send a message and return its answer."""
+        return self.call_many([msg], sign=sign)[0]
+
+    def call_many(self, messages, sign=True):
+        """Send messages, pipelined, and return their answers in order.
+
+        :raises: OmapiFailure if the connection failed.
+        """
+        results = [None] * len(messages)
+        pending = dict()
+        todo = iter(enumerate(messages))
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < CONF.dhcp.omapi_window:
+                    try:
+                        i, msg = next(todo)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    self._send(msg, sign)
+                    pending[msg.tid] = i
+                if not pending:
+                    return results
+                resp = self._receive()
+                i = pending.pop(resp.rid, None)
+                if i is not None:
+                    results[i] = resp
+        except socket.error as e:
+            self.close()
+            self._fail(six.text_type(e))
+
+
+def _host_key(entry):
+    return [(b'hardware-address',
+             binascii.unhexlify(entry.mac.replace(':', ''))),
+            (b'hardware-type', HARDWARE_ETHERNET)]
+
+
+def _host_object(entry):
+    return [(b'name', entry.name.encode('utf-8'))] + _host_key(entry) + [
+        (b'ip-address', socket.inet_aton(entry.ip)),
+        (b'statements',
+         ('supersede host-name "%s";' % entry.hostname).encode('utf-8'))]
+
+
+class OmapiDHCP(base.DHCPInterface):
+    """Create and delete the host objects of ISC dhcpd through OMAPI."""
+
+    def apply(self, changes, hosts):
+        client = Client(CONF.dhcp.omapi_host, CONF.dhcp.omapi_port,
+                        CONF.dhcp.omapi_key_name, CONF.dhcp.omapi_key,
+                        CONF.dhcp.omapi_timeout)
+        client.connect()
+        try:
+            self._delete(client, changes.removed +
+                         [old for old, new in changes.changed])
+            added = changes.added + [new for old, new in changes.changed]
+            failed = self._add(client, added)
+            if failed:
+                # Host objects left by a previous run or created out of
+                # band, replaced by the expected ones.
+                self._delete(client, failed)
+                failed = self._add(client, failed)
+            if failed:
+                raise exception.OmapiFailure(
+                    server=client.server,
+                    reason=_('%(count)d host objects could not be created, '
+                             'e.g. %(name)s') % {'count': len(failed),
+                                                 'name': failed[0].name})
+        finally:
+            client.close()
+
+    def _delete(self, client, entries):
+        if not entries:
+            return
+        found = client.call_many([Message.open(b'host', _host_key(entry))
+                                  for entry in entries])
+        handles = [resp.handle for resp in found
+                   if resp.opcode == OP_UPDATE and resp.handle]
+        results = client.call_many([Message(OP_DELETE, handle)
+                                    for handle in handles])
+        errors = [resp for resp in results
+                  if resp.opcode != OP_STATUS or resp.result]
+        if errors:
+            raise exception.OmapiFailure(
+                server=client.server,
+                reason=_('%(count)d host objects could not be deleted: '
+                         '%(msg)s') % {'count': len(errors),
+                                       'msg': errors[0].get(b'message')})
+
+    def _add(self, client, entries):
+        if not entries:
+            return []
+        results = client.call_many([
+            Message.open(b'host', _host_object(entry), create=True)
+            for entry in entries])
+        return [entry for entry, resp in zip(entries, results)
+                if resp.opcode != OP_UPDATE]
@@ -0,0 +1,237 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Read only TFTP server for the legacy PXE firmwares.
+
+Implements RFC 1350 with the blksize, timeout and tsize options of
+RFC 2347-2349 and the windowsize option of RFC 7440, which lets a client
+receive several blocks per acknowledgement. Each transfer runs in a
+green thread with its own socket, as the protocol requires, and reads
+its blocks from the shared open file.
+"""
+
+import struct
+import time
+
+import eventlet
+from eventlet.green import socket
+from oslo_log import log
+import six
+
+from xcat3.common import exception
+from xcat3.conf import CONF
+
+LOG = log.getLogger(__name__)
+
+OP_RRQ = 1
+OP_WRQ = 2
+OP_DATA = 3
+OP_ACK = 4
+OP_ERROR = 5
+OP_OACK = 6
+
+ERR_UNDEFINED = 0
+ERR_NOT_FOUND = 1
+ERR_ACCESS = 2
+ERR_ILLEGAL = 4
+ERR_UNKNOWN_TID = 5
+
+DEFAULT_BLKSIZE = 512
+# Seconds before a packet is sent again, unless the client asks for
+# another timeout.
+DEFAULT_TIMEOUT = 1
+_MAX_PACKET = 65536
+
+
+class _Aborted(Exception):
+    pass
+
+
+def _error(code, message):
+    return struct.pack('!HH', OP_ERROR, code) + message.encode('ascii') + \
+        b'\x00'
+
+
+def parse_request(data):
+    """Parse a read or write request.
+
+    :returns: the (filename, mode, options) tuple, options being a list of
+              (name, value) with lower case names.
+    :raises: ValueError if the request is malformed.
+    """
+    fields = data[2:].split(b'\x00')
+    # The request ends with a NUL, so the last field is empty.
+    if len(fields) < 3 or fields[-1] or not len(fields) % 2:
+        raise ValueError('malformed request')
+    fields = [f.decode('ascii') for f in fields[:-1]]
+    options = [(fields[i].lower(), fields[i + 1])
+               for i in range(2, len(fields), 2)]
+    return fields[0], fields[1].lower(), options
+
+
+class _Transfer(object):
+    """Send one file to one client."""
+
+    def __init__(self, sock, address, handle, options):
+        self.sock = sock
+        self.address = address
+        self.handle = handle
+        self.blksize = DEFAULT_BLKSIZE
+        self.window = 1
+        self.timeout = DEFAULT_TIMEOUT
+        self.oack = []
+        for name, value in options:
+            try:
+                value = int(value)
+            except ValueError:
+                continue
+            if name == 'blksize' and value >= 8:
+                self.blksize = min(value, CONF.boot.tftp_max_blksize)
+                self.oack.append((name, self.blksize))
+            elif name == 'windowsize' and value >= 1:
+                self.window = min(value, CONF.boot.tftp_max_window)
+                self.oack.append((name, self.window))
+            elif name == 'timeout' and 1 <= value <= 255:
+                self.timeout = value
+                self.oack.append((name, value))
+            elif name == 'tsize':
+                self.oack.append((name, handle.size))
+        # The last block is shorter than the others, empty if the size is
+        # a multiple of the block size.
+        self.blocks = handle.size // self.blksize + 1
+
+    def _data(self, number):
+        return struct.pack('!HH', OP_DATA, number & 0xffff) + \
+            self.handle.read((number - 1) * self.blksize, self.blksize)
+
+    def _wait_ack(self, low, high):
+        """Wait for the acknowledgement of a block after low up to high.
+
+        The block numbers wrap around after 65535.
+
+        :returns: the number of the block acknowledged, None on timeout.
+        """
+        deadline = time.time() + self.timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            self.sock.settimeout(remaining)
+            try:
+                data, address = self.sock.recvfrom(_MAX_PACKET)
+            except socket.timeout:
+                return None
+            if address != self.address:
+                self.sock.sendto(_error(ERR_UNKNOWN_TID,
+                                        'unknown transfer ID'), address)
+                continue
+            if len(data) < 4:
+                continue
+            opcode, number = struct.unpack('!HH', data[:4])
+            if opcode == OP_ERROR:
+                raise _Aborted(data[4:].rstrip(b'\x00'))
+            if opcode != OP_ACK:
+                continue
+            delta = (number - low) & 0xffff
+            if low == high == 0 and delta == 0:
+                # Acknowledgement of the options.
+                return 0
+            # Duplicate acknowledgements are ignored, answering them
+            # would double the traffic from then on.
+            if 0 < delta <= high - low:
+                return low + delta
+
+    def _exchange(self, packets, low, high):
+        for attempt in range(CONF.boot.tftp_retries):
+            for packet in packets:
+                self.sock.sendto(packet, self.address)
+            acked = self._wait_ack(low, high)
+            if acked is not None:
+                return acked
+        raise _Aborted('timed out')
+
+    def run(self):
+        if self.oack:
+            packet = struct.pack('!H', OP_OACK) + b''.join(
+                six.text_type(name).encode('ascii') + b'\x00' +
+                six.text_type(value).encode('ascii') + b'\x00'
+                for name, value in self.oack)
+            self._exchange([packet], 0, 0)
+        acked = 0
+        while acked < self.blocks:
+            high = min(acked + self.window, self.blocks)
+            acked = self._exchange([self._data(number) for number in
+                                    range(acked + 1, high + 1)], acked, high)
+
+
+class TFTPServer(object):
+    """Serve the boot files over TFTP.
+
+    :param files: the :class:`filecache.HandleCache` of the boot files.
+    :param limit: the :class:`fileserver.ConnectionLimit` shared with
+                  HTTP.
+    """
+
+    def __init__(self, files, limit):
+        self.files = files
+        self.limit = limit
+        self.transfers = 0
+
+    def serve(self, sock):
+        """Receive the requests of the clients until killed."""
+        while True:
+            data, address = sock.recvfrom(_MAX_PACKET)
+            if len(data) < 2:
+                continue
+            opcode = struct.unpack('!H', data[:2])[0]
+            if opcode == OP_WRQ:
+                sock.sendto(_error(ERR_ACCESS, 'read only server'), address)
+                continue
+            if opcode != OP_RRQ:
+                continue
+            try:
+                name, mode, options = parse_request(data)
+            except (ValueError, UnicodeError):
+                sock.sendto(_error(ERR_ILLEGAL, 'malformed request'),
+                            address)
+                continue
+            # Boot files are binary, the netascii mode is not supported.
+            if mode != 'octet':
+                sock.sendto(_error(ERR_ILLEGAL, 'unsupported mode'),
+                            address)
+                continue
+            if not self.limit.acquire():
+                sock.sendto(_error(ERR_UNDEFINED, 'server busy'), address)
+                continue
+            self.transfers += 1
+            eventlet.spawn_n(self._transfer, address, name, options)
+
+    def _transfer(self, address, name, options):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        handle = None
+        try:
+            sock.bind((CONF.boot.host_ip, 0))
+            try:
+                handle = self.files.open(name)
+            except exception.BootFileNotFound:
+                sock.sendto(_error(ERR_NOT_FOUND, 'file not found'), address)
+                return
+            _Transfer(sock, address, handle, options).run()
+        except (socket.error, _Aborted) as e:
+            LOG.debug('TFTP transfer of %(name)s to %(addr)s failed: '
+                      '%(err)s', {'name': name, 'addr': address[0],
+                                  'err': e})
+        finally:
+            if handle is not None:
+                self.files.release(handle)
+            sock.close()
+            self.limit.release()
@@ -32,6 +32,60 @@ class ControlInterface(base.BaseInterface):
         :raises: MissingParameterValue if a required parameter is missing.
         """
 
+    def get_power_state_many(self, nodes):
+        """Return the power state of multiple nodes
+
+        Optional bulk variant of :meth:`get_power_state` for the plugins
+        which can multiplex the requests to many nodes within one green
+        thread. The conductor falls back to calling :meth:`get_power_state`
+        for each node when it is not implemented.
+
+        :param nodes: an iterable of the nodes to act on, the conductor
+                      may hand the nodes out gradually to pace the calls.
+        :raises: NotImplementedError if the plugin does not support it.
+        :returns: an iterator of (node, result) tuples. The result is the
+                  power state of the node or the exception raised for it.
+        """
+        raise NotImplementedError()
+
+    def set_power_state_many(self, nodes, power_state):
+        """Set the power state of multiple nodes
+
+        Optional bulk variant of :meth:`set_power_state`, see
+        :meth:`get_power_state_many`.
+
+        :param nodes: an iterable of the nodes to act on.
+        :param power_state: Any power state from :mod:`xcat3.common.states`.
+        :raises: NotImplementedError if the plugin does not support it.
+        :returns: an iterator of (node, result) tuples. The result is None
+                  on success or the exception raised for the node.
+        """
+        raise NotImplementedError()
+
+    def get_sensors_data(self, node):
+        """Read the sensors of the node
+
+        :param node: the node to act on.
+        :raises: NotImplementedError if the plugin does not support it.
+        :returns: a dict of sensor type (e.g. 'Temperature', 'Fan') and a
+                  dict of sensor name and reading attributes. The
+                  attributes must be JSON serializable.
+        """
+        raise NotImplementedError()
+
+    def get_sensors_data_many(self, nodes):
+        """Read the sensors of multiple nodes
+
+        Optional bulk variant of :meth:`get_sensors_data`, see
+        :meth:`get_power_state_many`.
+
+        :param nodes: an iterable of the nodes to act on.
+        :raises: NotImplementedError if the plugin does not support it.
+        :returns: an iterator of (node, result) tuples. The result is the
+                  sensors data of the node or the exception raised for it.
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def reboot(self, node):
         """Perform a hard reboot of the node's node.
@@ -47,4 +101,36 @@ class ControlInterface(base.BaseInterface):
         """Get the inventory information from control module
 
         :param node: the node to act on.
-        """
\ No newline at end of file
+        :returns: a dict of component category (e.g. 'system', 'processors')
+                  and a dict of component name and attributes. The
+                  attributes must be JSON serializable.
+        """
+
+    def get_inventory_many(self, nodes):
+        """Get the inventory information of multiple nodes
+
+        Optional bulk variant of :meth:`get_inventory`, see
+        :meth:`get_power_state_many`.
+
+        :param nodes: an iterable of the nodes to act on.
+        :raises: NotImplementedError if the plugin does not support it.
+        :returns: an iterator of (node, result) tuples. The result is the
+                  inventory of the node or the exception raised for it.
+        """
+        raise NotImplementedError()
+
+    def open_console(self, node, listener):
+        """Attach to the serial console of the node
+
+        :param node: the node to act on.
+        :param listener: an object with an ``output(data)`` method called
+                         with the characters written by the node and a
+                         ``closed(reason)`` method called if the console is
+                         closed by the other end. Both are called from the
+                         I/O loop of the plugin and must not block.
+        :raises: NotImplementedError if the plugin does not support it.
+        :returns: a console object with ``write(data)`` to send characters
+                  to the node, ``keepalive()`` called when the console has
+                  been idle for a while and ``close()``.
+        """
+        raise NotImplementedError()
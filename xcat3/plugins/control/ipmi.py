@@ -1,12 +1,21 @@
 from oslo_log import log
 from xcat3.plugins.control import base
+from xcat3.plugins.control import ipmi_engine
+from xcat3.plugins import utils
 from xcat3.common import exception
 from xcat3.common.i18n import _, _LE, _LI, _LW
 
 from xcat3.common import states
+from xcat3.conf import CONF
 
 LOG = log.getLogger(__name__)
 
+_POWER_ACTIONS = {
+    states.POWER_ON: ipmi_engine.CHASSIS_POWER_UP,
+    states.POWER_OFF: ipmi_engine.CHASSIS_POWER_DOWN,
+    states.SOFT_POWER_OFF: ipmi_engine.CHASSIS_SOFT_SHUTDOWN,
+}
+
 
 class IPMIPlugin(base.ControlInterface):
     def validate(self, node):
@@ -21,14 +30,27 @@ class IPMIPlugin(base.ControlInterface):
             raise exception.MissingParameterValue(
                 _("IPMI username was not specified."))
 
+    def _run(self, node, func):
+        """Call func with a pooled session to the BMC of the node."""
+        info = node.control_info
+        return ipmi_engine.get_pool().run(
+            info['bmc_address'], int(info.get('bmc_port', CONF.ipmi.port)),
+            info['bmc_username'], info.get('bmc_password'), func)
+
     def get_power_state(self, node):
         """Return the power state of the node
 
         :param node: the node to act on.
         :raises: MissingParameterValue if a required parameter is missing.
+        :raises: IPMIFailure if the BMC could not be queried.
         :returns: a power state.
         """
-        return states.POWER_ON
+        def _get_power_state(session):
+            if session.get_power_state():
+                return states.POWER_ON
+            return states.POWER_OFF
+
+        return self._run(node, _get_power_state)
 
     def set_power_state(self, node, power_state):
         """Set the power state of the node's node.
@@ -36,13 +58,46 @@ class IPMIPlugin(base.ControlInterface):
         :param node: the node to act on.
         :param power_state: Any power state.
         :raises: MissingParameterValue if a required parameter is missing.
+        :raises: InvalidParameterValue if the power state is not supported.
+        :raises: IPMIFailure if the BMC could not be controlled.
         """
         LOG.info("RPC change_power_state called for nodes %(node)s. "
                  "The desired new state is %(target)s.",
                  {'node': node.name, 'target': power_state})
-        # Node(chenglch): Just for test
-        if node.name == 'node1':
-            raise exception.InvalidName(name=node.name)
+        if power_state != states.REBOOT and power_state not in _POWER_ACTIONS:
+            raise exception.InvalidParameterValue(
+                err=_("Power state %s is not supported by IPMI.") %
+                power_state)
+
+        def _set_power_state(session):
+            if power_state == states.REBOOT:
+                # A hard reset does not power on a node which is off.
+                if session.get_power_state():
+                    action = ipmi_engine.CHASSIS_HARD_RESET
+                else:
+                    action = ipmi_engine.CHASSIS_POWER_UP
+            else:
+                action = _POWER_ACTIONS[power_state]
+            session.chassis_control(action)
+
+        self._run(node, _set_power_state)
+
+    def get_power_state_many(self, nodes):
+        """Return the power state of multiple nodes
+
+        The requests of all the nodes are multiplexed on the sockets of the
+        IPMI engine, at most [ipmi]concurrency at a time.
+        """
+        return utils.run_many(self.get_power_state, nodes,
+                              CONF.ipmi.concurrency)
+
+    def set_power_state_many(self, nodes, power_state):
+        """Set the power state of multiple nodes
+
+        See :meth:`get_power_state_many`.
+        """
+        return utils.run_many(self.set_power_state, nodes,
+                              CONF.ipmi.concurrency, power_state)
 
     def reboot(self, node):
         """Perform a hard reboot of the node's node.
@@ -53,11 +108,53 @@ class IPMIPlugin(base.ControlInterface):
         :param node: the node to act on.
         :raises: MissingParameterValue if a required parameter is missing.
         """
-        pass
+        self.set_power_state(node, states.REBOOT)
 
     def get_inventory(self, node):
         """Get the inventory information from control module
 
+        Only the identification of the BMC is collected, reading the FRU
+        and SDR repositories is not implemented yet.
+
+        :param node: the node to act on.
+        :raises: IPMIFailure if the BMC could not be queried.
+        :returns: the inventory of the node.
+        """
+        def _get_inventory(session):
+            return {'bmc': {'bmc': session.get_device_id()}}
+
+        return self._run(node, _get_inventory)
+
+    def get_inventory_many(self, nodes):
+        """Get the inventory information of multiple nodes
+
+        See :meth:`get_power_state_many`.
+        """
+        return utils.run_many(self.get_inventory, nodes,
+                              CONF.ipmi.concurrency)
+
+    def open_console(self, node, listener):
+        """Activate Serial over LAN on the BMC of the node
+
+        A session dedicated to the console is opened, the pooled sessions
+        are kept for the short lived commands.
+
         :param node: the node to act on.
+        :param listener: see :meth:`ControlInterface.open_console`.
+        :raises: IPMIFailure if SOL could not be activated.
+        :raises: IPMITimeout if the BMC does not answer.
+        :returns: an :class:`ipmi_engine.SOL`.
         """
-        pass
+        info = node.control_info
+        session = ipmi_engine.Session(
+            ipmi_engine.get_engine(), info['bmc_address'],
+            int(info.get('bmc_port', CONF.ipmi.port)), info['bmc_username'],
+            info.get('bmc_password'))
+        session.open()
+        sol = ipmi_engine.SOL(session, listener)
+        try:
+            sol.activate()
+        except Exception:
+            session.close()
+            raise
+        return sol
@@ -0,0 +1,841 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Asynchronous RMCP+ (IPMI 2.0 over LAN) client engine.
+
+All the sessions of a conductor share a small set of UDP sockets. Every
+socket has a receiver green thread which dispatches the incoming packets
+to the waiting requests by the console session ID and the IPMI sequence
+number (or the message tag during the session setup), so thousands of
+BMCs can be driven concurrently without a socket or a thread per BMC.
+The Serial over LAN payloads of the consoles go through the same sockets.
+
+Only cipher suite 3 (RAKP-HMAC-SHA1, HMAC-SHA1-96, AES-CBC-128) is
+supported, which is the mandatory suite of IPMI 2.0.
+"""
+
+import collections
+import hashlib
+import hmac
+import os
+import random
+import struct
+import time
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import algorithms
+from cryptography.hazmat.primitives.ciphers import Cipher
+from cryptography.hazmat.primitives.ciphers import modes
+import eventlet
+from eventlet import event
+from eventlet.green import socket
+from eventlet import semaphore
+from oslo_log import log
+import six
+
+from xcat3.common import exception
+from xcat3.common.i18n import _, _LE
+from xcat3.conf import CONF
+
+LOG = log.getLogger(__name__)
+
+RMCP_HEADER = b'\x06\x00\xff\x07'
+
+AUTH_TYPE_NONE = 0x00
+AUTH_TYPE_RMCPP = 0x06
+
+PAYLOAD_IPMI = 0x00
+PAYLOAD_SOL = 0x01
+PAYLOAD_OPEN_SESSION_REQUEST = 0x10
+PAYLOAD_OPEN_SESSION_RESPONSE = 0x11
+PAYLOAD_RAKP1 = 0x12
+PAYLOAD_RAKP2 = 0x13
+PAYLOAD_RAKP3 = 0x14
+PAYLOAD_RAKP4 = 0x15
+PAYLOAD_ENCRYPTED = 0x80
+PAYLOAD_AUTHENTICATED = 0x40
+PAYLOAD_TYPE_MASK = 0x3f
+
+AUTH_RAKP_HMAC_SHA1 = 0x01
+INTEGRITY_HMAC_SHA1_96 = 0x01
+CONFIDENTIALITY_AES_CBC_128 = 0x01
+
+PRIV_ADMINISTRATOR = 0x04
+# Username/privilege lookup is done by name only.
+NAME_ONLY_LOOKUP = 0x10
+
+BMC_ADDRESS = 0x20
+SOFTWARE_ID = 0x81
+
+NETFN_CHASSIS = 0x00
+NETFN_APP = 0x06
+
+CMD_GET_CHASSIS_STATUS = 0x01
+CMD_GET_DEVICE_ID = 0x01
+CMD_CHASSIS_CONTROL = 0x02
+CMD_GET_CHANNEL_AUTH_CAP = 0x38
+CMD_ACTIVATE_PAYLOAD = 0x48
+CMD_DEACTIVATE_PAYLOAD = 0x49
+CMD_SET_SESSION_PRIV = 0x3b
+CMD_CLOSE_SESSION = 0x3c
+
+# Completion codes of a request refused because the BMC does not know the
+# session anymore: invalid session ID, invalid session handle, and the
+# insufficient privilege level some BMCs answer once the session expired.
+# The command was not executed, it is safe to send it again.
+SESSION_COMPLETION_CODES = (0x87, 0x88, 0xd4)
+
+CHASSIS_POWER_DOWN = 0x00
+CHASSIS_POWER_UP = 0x01
+CHASSIS_POWER_CYCLE = 0x02
+CHASSIS_HARD_RESET = 0x03
+CHASSIS_SOFT_SHUTDOWN = 0x05
+
+# Status bits of the SOL packets sent by the BMC, see section 15.9 of
+# IPMI 2.0.
+SOL_NACK = 0x40
+SOL_UNAVAILABLE = 0x20
+SOL_DEACTIVATED = 0x10
+# Size of the SOL payload header, before the character data.
+SOL_HEADER = 4
+
+# Length of the HMAC-SHA1-96 integrity check value.
+ICV_LENGTH = 12
+AES_BLOCK = 16
+
+RMCPP_STATUS = {
+    0x01: 'insufficient resources to create a session',
+    0x02: 'invalid session ID',
+    0x0d: 'unauthorized name',
+    0x0f: 'invalid integrity check value',
+    0x12: 'unauthorized role or privilege level',
+}
+
+
+def _checksum(data):
+    return (0x100 - sum(bytearray(data))) & 0xff
+
+
+def _hmac(key, data):
+    return hmac.new(bytes(key), bytes(data), hashlib.sha1).digest()
+
+
+def _aes(key, iv, data, encrypt):
+    cipher = Cipher(algorithms.AES(bytes(key)), modes.CBC(bytes(iv)),
+                    backend=default_backend())
+    ctx = cipher.encryptor() if encrypt else cipher.decryptor()
+    return ctx.update(bytes(data)) + ctx.finalize()
+
+
+def pack_message(netfn, seq, cmd, data, request=True):
+    """Build an IPMI LAN message.
+
+    The requests go from the remote console software ID to the BMC, the
+    responses the other way around. ``data`` of a response starts with the
+    completion code.
+    """
+    if request:
+        addr1, addr2 = BMC_ADDRESS, SOFTWARE_ID
+    else:
+        addr1, addr2 = SOFTWARE_ID, BMC_ADDRESS
+    head = bytearray([addr1, netfn << 2])
+    body = bytearray([addr2, seq << 2, cmd]) + bytearray(data)
+    return bytes(head + bytearray([_checksum(head)]) + body +
+                 bytearray([_checksum(body)]))
+
+
+def unpack_message(msg):
+    """Split an IPMI LAN message.
+
+    :returns: a tuple (netfn, seq, cmd, data).
+    """
+    msg = bytearray(msg)
+    if len(msg) < 7 or _checksum(msg[:3]) or _checksum(msg[3:]):
+        raise ValueError('bad IPMI message checksum')
+    return msg[1] >> 2, msg[4] >> 2, msg[5], msg[6:-1]
+
+
+def pack_packet(payload_type, session_id, seq, payload, keys=None):
+    """Build a RMCP packet.
+
+    IPMI messages sent outside of a session use the IPMI 1.5 format, all
+    the others the RMCP+ one. When the session keys are given, the payload
+    is encrypted and the packet is signed.
+    """
+    if payload_type == PAYLOAD_IPMI and session_id == 0:
+        return (RMCP_HEADER + struct.pack('<BIIB', AUTH_TYPE_NONE, seq,
+                                          session_id, len(payload)) +
+                bytes(payload))
+    if keys is not None:
+        payload = keys.encrypt(payload)
+        payload_type |= PAYLOAD_ENCRYPTED | PAYLOAD_AUTHENTICATED
+    body = struct.pack('<BBIIH', AUTH_TYPE_RMCPP, payload_type, session_id,
+                       seq, len(payload)) + bytes(payload)
+    if keys is None:
+        return RMCP_HEADER + body
+    pad = -(len(body) + 2) % 4
+    body += b'\xff' * pad + struct.pack('BB', pad, 0x07)
+    return RMCP_HEADER + body + keys.sign(body)
+
+
+def unpack_packet(data):
+    """Split a RMCP packet without checking its integrity.
+
+    :returns: a tuple (payload_type, session_id, seq, payload), the
+              payload is still encrypted if the packet is.
+    """
+    data = bytearray(data)
+    if len(data) < 14 or data[:4] != bytearray(RMCP_HEADER):
+        raise ValueError('not an IPMI packet')
+    if data[4] == AUTH_TYPE_NONE:
+        seq, session_id, length = struct.unpack('<IIB', bytes(data[5:14]))
+        return PAYLOAD_IPMI, session_id, seq, data[14:14 + length]
+    if data[4] == AUTH_TYPE_RMCPP and len(data) >= 16:
+        payload_type = data[5]
+        session_id, seq, length = struct.unpack('<IIH', bytes(data[6:16]))
+        return payload_type, session_id, seq, data[16:16 + length]
+    raise ValueError('unsupported authentication type %d' % data[4])
+
+
+class SessionKeys(object):
+    """Integrity and confidentiality keys of an established session."""
+
+    def __init__(self, sik):
+        self.k1 = _hmac(sik, b'\x01' * 20)
+        self.k2 = _hmac(sik, b'\x02' * 20)[:AES_BLOCK]
+
+    def sign(self, data):
+        return _hmac(self.k1, data)[:ICV_LENGTH]
+
+    def verify(self, packet):
+        packet = bytes(packet)
+        if len(packet) < 4 + ICV_LENGTH:
+            return False
+        return hmac.compare_digest(self.sign(packet[4:-ICV_LENGTH]),
+                                   packet[-ICV_LENGTH:])
+
+    def encrypt(self, payload):
+        payload = bytearray(payload)
+        pad = -(len(payload) + 1) % AES_BLOCK
+        payload += bytearray(range(1, pad + 1)) + bytearray([pad])
+        iv = os.urandom(AES_BLOCK)
+        return iv + _aes(self.k2, iv, payload, True)
+
+    def decrypt(self, payload):
+        payload = bytes(payload)
+        if len(payload) < 2 * AES_BLOCK or len(payload) % AES_BLOCK:
+            raise ValueError('bad encrypted payload length')
+        data = bytearray(_aes(self.k2, payload[:AES_BLOCK],
+                              payload[AES_BLOCK:], False))
+        return data[:-1 - data[-1]]
+
+
+def rakp2_hmac(password, console_sid, bmc_sid, rm, rc, guid, role, username):
+    return _hmac(password, struct.pack('<II', console_sid, bmc_sid) + rm +
+                 rc + guid + struct.pack('BB', role, len(username)) +
+                 username)
+
+
+def rakp3_hmac(password, rc, console_sid, role, username):
+    return _hmac(password, rc + struct.pack('<IBB', console_sid, role,
+                                            len(username)) + username)
+
+
+def rakp4_icv(sik, rm, bmc_sid, guid):
+    return _hmac(sik, rm + struct.pack('<I', bmc_sid) + guid)[:ICV_LENGTH]
+
+
+def session_integrity_key(password, rm, rc, role, username):
+    return _hmac(password, rm + rc + struct.pack('BB', role, len(username)) +
+                 username)
+
+
+def algorithm_payloads():
+    """The algorithm proposals of cipher suite 3."""
+    return b''.join(
+        struct.pack('<BHBB3x', index, 0, 8, alg)
+        for index, alg in enumerate((AUTH_RAKP_HMAC_SHA1,
+                                     INTEGRITY_HMAC_SHA1_96,
+                                     CONFIDENTIALITY_AES_CBC_128)))
+
+
+class Session(object):
+    """A RMCP+ session with one BMC.
+
+    Requests on a session are serialized, the concurrency comes from
+    having many sessions in flight on the shared sockets of the engine.
+    """
+
+    def __init__(self, engine, address, port, username, password):
+        self.engine = engine
+        self.bmc = (address, port)
+        self.username = to_bytes(username or '')
+        self.password = to_bytes(password or '')
+        self.sock = None
+        self.console_sid = None
+        self.bmc_sid = 0
+        self.keys = None
+        self.seq = 0
+        self.rq_seq = random.randint(1, 63)
+        self.lock = semaphore.Semaphore()
+        # The SOL payload activated on the session, if any.
+        self.sol = None
+        # Time of the last answer of the BMC and of the last use by a
+        # caller of the session pool.
+        self.last_activity = self.last_used = time.time()
+
+    def __repr__(self):
+        return '%s:%d' % self.bmc
+
+    @property
+    def established(self):
+        return self.keys is not None
+
+    def _next_rq_seq(self):
+        self.rq_seq = self.rq_seq % 63 + 1
+        return self.rq_seq
+
+    def _next_seq(self):
+        self.seq = self.seq % 0xffffffff + 1
+        return self.seq
+
+    def open(self):
+        """Establish the session, see section 13.14 of IPMI 2.0."""
+        try:
+            # The answers are matched against the numeric address.
+            self.bmc = (socket.gethostbyname(self.bmc[0]), self.bmc[1])
+        except socket.error as e:
+            self._fail(six.text_type(e))
+        self.console_sid = self.engine.register(self)
+        try:
+            self._open()
+        except Exception:
+            # Established when only setting the privilege level failed.
+            self.close()
+            raise
+
+    def _open(self):
+        # Some BMCs refuse to open a session if they were not asked for
+        # their capabilities first.
+        seq = self._next_rq_seq()
+        msg = pack_message(NETFN_APP, seq, CMD_GET_CHANNEL_AUTH_CAP,
+                           [0x8e, PRIV_ADMINISTRATOR])
+        data = self._check_completion(self.engine.request(
+            self, ('pre', seq),
+            lambda: pack_packet(PAYLOAD_IPMI, 0, 0, msg)), 'auth cap')
+        if len(data) < 2 or not data[1] & 0x80:
+            self._fail(_('IPMI 2.0 is not supported'))
+
+        tag = self._next_rq_seq()
+        request = (struct.pack('<BBHI', tag, PRIV_ADMINISTRATOR, 0,
+                               self.console_sid) + algorithm_payloads())
+        resp = self._handshake(PAYLOAD_OPEN_SESSION_REQUEST, request, 12)
+        self.bmc_sid = struct.unpack('<I', bytes(resp[8:12]))[0]
+
+        rm = os.urandom(16)
+        role = PRIV_ADMINISTRATOR | NAME_ONLY_LOOKUP
+        request = (struct.pack('<BBHI', self._next_rq_seq(), 0, 0,
+                               self.bmc_sid) + rm +
+                   struct.pack('<BHB', role, 0, len(self.username)) +
+                   self.username)
+        resp = self._handshake(PAYLOAD_RAKP1, request, 60)
+        rc, guid = bytes(resp[8:24]), bytes(resp[24:40])
+        expected = rakp2_hmac(self.password, self.console_sid, self.bmc_sid,
+                              rm, rc, guid, role, self.username)
+        if not hmac.compare_digest(expected, bytes(resp[40:60])):
+            self._fail(_('invalid RAKP 2 authentication code'))
+
+        sik = session_integrity_key(self.password, rm, rc, role,
+                                    self.username)
+        request = (struct.pack('<BBHI', self._next_rq_seq(), 0, 0,
+                               self.bmc_sid) +
+                   rakp3_hmac(self.password, rc, self.console_sid, role,
+                              self.username))
+        resp = self._handshake(PAYLOAD_RAKP3, request, 8 + ICV_LENGTH)
+        if not hmac.compare_digest(rakp4_icv(sik, rm, self.bmc_sid, guid),
+                                   bytes(resp[8:8 + ICV_LENGTH])):
+            self._fail(_('invalid RAKP 4 integrity check value'))
+        self.keys = SessionKeys(sik)
+        # The session starts at user level whatever was negotiated.
+        self.raw_command(NETFN_APP, CMD_SET_SESSION_PRIV,
+                         [PRIV_ADMINISTRATOR])
+
+    def _handshake(self, payload_type, request, min_length):
+        resp = self.engine.request(
+            self, ('rakp', self.console_sid),
+            lambda: pack_packet(payload_type, 0, 0, request))
+        if len(resp) < 2 or resp[1] != 0:
+            status = resp[1] if len(resp) > 1 else None
+            self._fail(_('session setup refused: %s') %
+                       RMCPP_STATUS.get(status, status))
+        if len(resp) < min_length:
+            self._fail(_('truncated session setup message'))
+        return resp
+
+    def _fail(self, reason):
+        raise exception.IPMIFailure(bmc=self, reason=reason)
+
+    def _check_completion(self, msg, name):
+        netfn, seq, cmd, data = unpack_message(msg)
+        if not data:
+            self._fail(_('empty answer to %s') % name)
+        if data[0] != 0:
+            reason = (_('%(cmd)s completed with code 0x%(code)02x') %
+                      {'cmd': name, 'code': data[0]})
+            if data[0] in SESSION_COMPLETION_CODES:
+                raise exception.IPMISessionInvalid(bmc=self, reason=reason)
+            self._fail(reason)
+        return data[1:]
+
+    def raw_command(self, netfn, cmd, data=b''):
+        """Send a command within the session.
+
+        :raises: IPMIFailure if the BMC answers with an error.
+        :raises: IPMITimeout if the BMC does not answer.
+        :returns: the data of the answer without the completion code.
+        """
+        with self.lock:
+            seq = self._next_rq_seq()
+            msg = pack_message(netfn, seq, cmd, data)
+            resp = self.engine.request(
+                self, ('ipmi', self.console_sid, seq),
+                lambda: pack_packet(PAYLOAD_IPMI, self.bmc_sid,
+                                    self._next_seq(), msg, self.keys))
+            self.last_activity = time.time()
+        return self._check_completion(resp, '0x%02x/0x%02x' % (netfn, cmd))
+
+    def close(self):
+        """Close the session, errors are ignored."""
+        if self.console_sid is None:
+            return
+        try:
+            if self.established:
+                self.raw_command(NETFN_APP, CMD_CLOSE_SESSION,
+                                 struct.pack('<I', self.bmc_sid))
+        except exception.IPMIFailure as e:
+            LOG.debug('Failed to close IPMI session with %(bmc)s: %(err)s',
+                      {'bmc': self, 'err': e})
+        finally:
+            self.discard()
+
+    def discard(self):
+        """Forget the session without telling the BMC.
+
+        Used when the session is known to be broken, the BMC drops it
+        after its inactivity timeout.
+        """
+        self.engine.unregister(self)
+        self.console_sid = None
+        self.keys = None
+
+    def get_power_state(self):
+        """Return True if the chassis is powered on."""
+        data = self.raw_command(NETFN_CHASSIS, CMD_GET_CHASSIS_STATUS)
+        if not data:
+            self._fail(_('empty chassis status'))
+        return bool(data[0] & 0x01)
+
+    def get_device_id(self):
+        """Return the identification of the BMC as a dict."""
+        data = self.raw_command(NETFN_APP, CMD_GET_DEVICE_ID)
+        if len(data) < 11:
+            self._fail(_('short device id'))
+        return {
+            'device_id': data[0],
+            'device_revision': data[1] & 0x0f,
+            'firmware_version': '%d.%02x' % (data[2] & 0x7f, data[3]),
+            'ipmi_version': '%d.%d' % (data[4] & 0x0f, data[4] >> 4),
+            'manufacturer_id': data[6] | data[7] << 8 | (data[8] & 0x0f) << 16,
+            'product_id': data[9] | data[10] << 8,
+        }
+
+    def chassis_control(self, action):
+        self.raw_command(NETFN_CHASSIS, CMD_CHASSIS_CONTROL, [action])
+
+
+class SOL(object):
+    """Serial over LAN payload activated on a session.
+
+    The characters sent by the BMC are acknowledged as soon as they are
+    received and handed to the listener from the receiver green thread of
+    the engine, so the listener must not block. The session should be
+    dedicated to the console, it is closed with the payload.
+
+    :param session: an established session.
+    :param listener: an object with an ``output(data)`` method called with
+                     the characters of the console and a ``closed(reason)``
+                     method called when the BMC deactivates the payload.
+    """
+
+    # Size of the character data when the BMC does not tell its own.
+    DEFAULT_CHUNK = 200
+
+    def __init__(self, session, listener):
+        self.session = session
+        self.listener = listener
+        self.chunk = self.DEFAULT_CHUNK
+        self._seq = 0
+        self._last_received = None
+        self._write_lock = semaphore.Semaphore()
+
+    def __repr__(self):
+        return repr(self.session)
+
+    def activate(self):
+        """Activate SOL instance 1, see section 24.1 of IPMI 2.0.
+
+        The payload is expected on the port of the session, the UDP port
+        returned by the BMC is ignored.
+
+        :raises: IPMIFailure if the BMC refuses to activate the payload,
+                 usually because another console is already attached.
+        """
+        data = self.session.raw_command(
+            NETFN_APP, CMD_ACTIVATE_PAYLOAD,
+            [PAYLOAD_SOL, 1, 0xc0, 0, 0, 0])
+        if len(data) >= 6:
+            # The inbound size includes the payload header.
+            size = struct.unpack('<H', bytes(data[4:6]))[0] - SOL_HEADER
+            if size > 0:
+                self.chunk = size
+        self.session.sol = self
+
+    def receive(self, payload):
+        """Handle a SOL payload sent by the BMC."""
+        self.session.last_activity = time.time()
+        seq = payload[0] & 0x0f
+        if not seq:
+            # Acknowledgement only.
+            return
+        data = bytes(payload[SOL_HEADER:])
+        self._send(bytearray([0, seq, len(data), 0]))
+        if seq == self._last_received:
+            # Retransmission of a packet whose acknowledgement was lost.
+            return
+        self._last_received = seq
+        if data:
+            self.listener.output(data)
+        if payload[3] & SOL_DEACTIVATED:
+            self.session.sol = None
+            self.listener.closed(_('SOL deactivated by the BMC'))
+
+    def _send(self, payload):
+        session = self.session
+        session.sock.sendto(
+            pack_packet(PAYLOAD_SOL, session.bmc_sid, session._next_seq(),
+                        payload, session.keys), session.bmc)
+
+    def write(self, data):
+        """Send characters to the console of the node.
+
+        :raises: IPMIFailure if the BMC keeps refusing the characters.
+        :raises: IPMITimeout if the BMC does not acknowledge them.
+        """
+        data = to_bytes(data)
+        with self._write_lock:
+            refused = 0
+            while data:
+                self._seq = self._seq % 15 + 1
+                payload = bytearray([self._seq, 0, 0, 0]) + bytearray(
+                    data[:self.chunk])
+                resp = self.session.engine.request(
+                    self.session, ('sol', self.session.console_sid, self._seq),
+                    lambda: pack_packet(PAYLOAD_SOL, self.session.bmc_sid,
+                                        self.session._next_seq(), payload,
+                                        self.session.keys))
+                accepted = min(resp[2], len(payload) - SOL_HEADER)
+                if resp[3] & SOL_NACK and not accepted:
+                    refused += 1
+                    if (resp[3] & (SOL_UNAVAILABLE | SOL_DEACTIVATED) or
+                            refused > self.session.engine.retries):
+                        self.session._fail(_('SOL characters refused'))
+                    eventlet.sleep(self.session.engine.timeout)
+                    continue
+                refused = 0
+                # The characters not accepted are sent again in a new
+                # packet.
+                data = data[accepted if resp[3] & SOL_NACK else
+                            len(payload) - SOL_HEADER:]
+
+    def keepalive(self):
+        """Keep the session from expiring while the console is idle."""
+        self.session.raw_command(NETFN_APP, CMD_GET_DEVICE_ID)
+
+    def close(self):
+        """Deactivate the payload and close the session."""
+        self.session.sol = None
+        try:
+            if self.session.established:
+                self.session.raw_command(NETFN_APP, CMD_DEACTIVATE_PAYLOAD,
+                                         [PAYLOAD_SOL, 1, 0, 0, 0, 0])
+        except exception.IPMIFailure as e:
+            LOG.debug('Failed to deactivate SOL on %(bmc)s: %(err)s',
+                      {'bmc': self, 'err': e})
+        self.session.close()
+
+
+def to_bytes(value):
+    if isinstance(value, six.text_type):
+        return value.encode('utf-8')
+    return bytes(value)
+
+
+class Engine(object):
+    """Multiplex RMCP+ sessions over a set of shared UDP sockets."""
+
+    def __init__(self, sockets=None, timeout=None, retries=None):
+        self.timeout = timeout or CONF.ipmi.timeout
+        self.retries = CONF.ipmi.retries if retries is None else retries
+        self._sessions = {}
+        self._pending = {}
+        self._sockets = []
+        for i in range(sockets or CONF.ipmi.sockets):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(('', 0))
+            self._sockets.append(sock)
+            eventlet.spawn_n(self._receive, sock)
+
+    def register(self, session):
+        """Allocate a console session ID to a new session."""
+        while True:
+            sid = random.randint(1, 0xffffffff)
+            if sid not in self._sessions:
+                break
+        self._sessions[sid] = session
+        session.sock = self._sockets[sid % len(self._sockets)]
+        return sid
+
+    def unregister(self, session):
+        self._sessions.pop(session.console_sid, None)
+
+    def request(self, session, key, build):
+        """Send a packet and wait for the matching answer.
+
+        :param session: the session the packet belongs to.
+        :param key: the dispatch key of the answer.
+        :param build: a callable returning the packet, it is called again
+                      for each retransmission.
+        :raises: IPMITimeout if no answer came back.
+        :returns: the payload of the answer.
+        """
+        if key[0] == 'pre':
+            key = key + session.bmc
+        for attempt in range(self.retries + 1):
+            waiter = event.Event()
+            self._pending[key] = waiter
+            try:
+                session.sock.sendto(build(), session.bmc)
+                with eventlet.Timeout(self.timeout, False):
+                    return waiter.wait()
+            except socket.error as e:
+                raise exception.IPMIFailure(bmc=session,
+                                            reason=six.text_type(e))
+            finally:
+                if self._pending.get(key) is waiter:
+                    del self._pending[key]
+        raise exception.IPMITimeout(bmc=session, attempts=self.retries + 1)
+
+    def _receive(self, sock):
+        while True:
+            try:
+                data, addr = sock.recvfrom(4096)
+            except socket.error as e:
+                LOG.error(_LE('IPMI socket receive error: %s'), e)
+                eventlet.sleep(self.timeout)
+                continue
+            try:
+                self._dispatch(data, addr)
+            except Exception as e:
+                LOG.debug('Dropped IPMI packet from %(addr)s: %(err)s',
+                          {'addr': addr, 'err': e})
+
+    def _dispatch(self, data, addr):
+        payload_type, sid, seq, payload = unpack_packet(data)
+        if payload_type == PAYLOAD_IPMI and sid == 0:
+            seq = unpack_message(payload)[1]
+            key = ('pre', seq) + addr[:2]
+        elif payload_type in (PAYLOAD_OPEN_SESSION_RESPONSE, PAYLOAD_RAKP2,
+                              PAYLOAD_RAKP4):
+            sid = struct.unpack('<I', bytes(payload[4:8]))[0]
+            key = ('rakp', sid)
+        elif payload_type & PAYLOAD_TYPE_MASK in (PAYLOAD_IPMI, PAYLOAD_SOL):
+            session = self._sessions.get(sid)
+            if session is None or session.keys is None:
+                return
+            if (payload_type & PAYLOAD_AUTHENTICATED and
+                    not session.keys.verify(data)):
+                raise ValueError('bad integrity check value')
+            if payload_type & PAYLOAD_ENCRYPTED:
+                payload = session.keys.decrypt(payload)
+            if payload_type & PAYLOAD_TYPE_MASK == PAYLOAD_IPMI:
+                key = ('ipmi', sid, unpack_message(payload)[1])
+            else:
+                if session.sol is None or len(payload) < SOL_HEADER:
+                    return
+                session.sol.receive(payload)
+                # A SOL packet may carry both characters and the
+                # acknowledgement of a packet sent by the console.
+                if not payload[1] & 0x0f:
+                    return
+                key = ('sol', sid, payload[1] & 0x0f)
+        else:
+            return
+        waiter = self._pending.pop(key, None)
+        if waiter is not None:
+            waiter.send(payload)
+
+
+class SessionPool(object):
+    """Cache of established sessions keyed by BMC address and username.
+
+    Reusing a session saves the four round trips of the session setup.
+    The idle sessions are kept alive with a Get Device ID command and are
+    closed once they have not been used for [ipmi]session_idle_timeout.
+    """
+
+    def __init__(self, engine, max_sessions=None, idle_timeout=None,
+                 keepalive_interval=None):
+        self.engine = engine
+        self.max_sessions = max_sessions or CONF.ipmi.max_sessions_per_bmc
+        self.idle_timeout = (CONF.ipmi.session_idle_timeout
+                             if idle_timeout is None else idle_timeout)
+        self.keepalive_interval = (keepalive_interval or
+                                   CONF.ipmi.session_keepalive_interval)
+        self._idle = collections.defaultdict(list)
+        self._slots = {}
+        self._maintainer = None
+
+    def run(self, address, port, username, password, func):
+        """Call func with a session to the BMC.
+
+        At most max_sessions calls run at the same time for a BMC. If the
+        BMC refuses func on a reused session because the session expired
+        on its side, func is called again on a new session. It is never
+        called again after a timeout: the BMC may have executed the
+        command and only its answer was lost.
+
+        :returns: the return value of func.
+        """
+        key = (address, port, username)
+        slots = self._slots.get(key)
+        if slots is None:
+            slots = self._slots[key] = semaphore.Semaphore(self.max_sessions)
+        with slots:
+            session, reused = self._acquire(key, password)
+            try:
+                try:
+                    result = func(session)
+                except exception.IPMISessionInvalid as e:
+                    if not reused:
+                        raise
+                    LOG.debug('Reopening IPMI session with %(bmc)s: %(err)s',
+                              {'bmc': session, 'err': e})
+                    session.discard()
+                    session, reused = self._open(key, password), False
+                    result = func(session)
+            except Exception as e:
+                self._drop(session, e)
+                raise
+            self._release(key, session)
+        return result
+
+    @staticmethod
+    def _drop(session, error):
+        """Get rid of a session after an error.
+
+        The session is closed on the BMC, which has a small table of
+        sessions, unless the BMC already dropped it.
+        """
+        if (isinstance(error, exception.IPMISessionInvalid) or
+                not session.established):
+            session.discard()
+        elif isinstance(error, exception.IPMITimeout):
+            # The BMC may not answer the Close Session either, it is not
+            # waited for.
+            eventlet.spawn_n(session.close)
+        else:
+            session.close()
+
+    def _open(self, key, password):
+        session = Session(self.engine, key[0], key[1], key[2], password)
+        session.open()
+        return session
+
+    def _acquire(self, key, password):
+        idle = self._idle.get(key)
+        while idle:
+            session = idle.pop()
+            if session.established and session.password == to_bytes(
+                    password or ''):
+                return session, True
+            session.close()
+        return self._open(key, password), False
+
+    def _release(self, key, session):
+        session.last_used = time.time()
+        idle = self._idle[key]
+        if self.idle_timeout <= 0 or len(idle) >= self.max_sessions:
+            session.close()
+            return
+        idle.append(session)
+        if self._maintainer is None:
+            self._maintainer = eventlet.spawn(self._maintain)
+
+    def _maintain(self):
+        while True:
+            eventlet.sleep(self.keepalive_interval)
+            now = time.time()
+            for key, idle in list(self._idle.items()):
+                for session in list(idle):
+                    if now - session.last_used >= self.idle_timeout:
+                        idle.remove(session)
+                        eventlet.spawn_n(session.close)
+                    elif (now - session.last_activity >=
+                          self.keepalive_interval):
+                        idle.remove(session)
+                        eventlet.spawn_n(self._keepalive, key, session)
+                if not idle:
+                    self._idle.pop(key, None)
+
+    def _keepalive(self, key, session):
+        try:
+            session.raw_command(NETFN_APP, CMD_GET_DEVICE_ID)
+        except exception.IPMIFailure as e:
+            LOG.debug('IPMI session with %(bmc)s expired: %(err)s',
+                      {'bmc': session, 'err': e})
+            self._drop(session, e)
+            return
+        idle = self._idle[key]
+        if len(idle) >= self.max_sessions:
+            session.close()
+        else:
+            idle.append(session)
+
+
+_ENGINE = None
+_POOL = None
+
+
+def get_engine():
+    """Return the engine of the process, created on first use."""
+    global _ENGINE
+    if _ENGINE is None:
+        _ENGINE = Engine()
+    return _ENGINE
+
+
+def get_pool():
+    """Return the session pool of the process, created on first use."""
+    global _POOL
+    if _POOL is None:
+        _POOL = SessionPool(get_engine())
+    return _POOL
@@ -0,0 +1,300 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Simulated BMCs speaking RMCP+ on local addresses.
+
+Used to exercise and benchmark :mod:`xcat3.plugins.control.ipmi_engine`
+without hardware. Every virtual BMC listens on its own address and port,
+the whole 127.0.0.0/8 network can be used on Linux without any setup.
+The serial console of a virtual BMC echoes the characters it receives.
+"""
+
+import os
+import random
+import struct
+
+import eventlet
+from eventlet.green import socket
+from oslo_log import log
+
+from xcat3.plugins.control import ipmi_engine as engine
+
+LOG = log.getLogger(__name__)
+
+
+class VirtualBMC(object):
+    """The protocol state of one simulated BMC."""
+
+    def __init__(self, address, port, username, password, power_on=False,
+                 error_rate=0.0):
+        self.address = address
+        self.port = port
+        self.username = engine.to_bytes(username)
+        self.password = engine.to_bytes(password)
+        self.power_on = power_on
+        # Ratio of the commands answered with a "node busy" error.
+        self.error_rate = error_rate
+        self.guid = os.urandom(16)
+        self.sessions = {}
+        # The session with the SOL payload active and the sequence number
+        # of the last SOL packet sent on it.
+        self.sol_sid = None
+        self.sol_seq = 0
+
+    def handle(self, data):
+        """Process a packet, return the answer or None."""
+        payload_type, sid, seq, payload = engine.unpack_packet(data)
+        if payload_type == engine.PAYLOAD_IPMI and sid == 0:
+            netfn, seq, cmd, body = engine.unpack_message(payload)
+            if cmd != engine.CMD_GET_CHANNEL_AUTH_CAP:
+                return None
+            # IPMI 2.0 extended capabilities, channel 1.
+            msg = engine.pack_message(netfn + 1, seq, cmd,
+                                      [0, 0x01, 0x80, 0x04, 0x02, 0, 0, 0, 0],
+                                      request=False)
+            return engine.pack_packet(engine.PAYLOAD_IPMI, 0, 0, msg)
+        if payload_type == engine.PAYLOAD_OPEN_SESSION_REQUEST:
+            return self._open_session(payload)
+        if payload_type == engine.PAYLOAD_RAKP1:
+            return self._rakp1(payload)
+        if payload_type == engine.PAYLOAD_RAKP3:
+            return self._rakp3(payload)
+        if payload_type & engine.PAYLOAD_TYPE_MASK == engine.PAYLOAD_IPMI:
+            return self._command(data, sid, payload)
+        if payload_type & engine.PAYLOAD_TYPE_MASK == engine.PAYLOAD_SOL:
+            return self._sol(data, sid, payload)
+        return None
+
+    def _open_session(self, payload):
+        tag, priv, _, console_sid = struct.unpack('<BBHI',
+                                                  bytes(payload[:8]))
+        bmc_sid = random.randint(1, 0xffffffff)
+        self.sessions[bmc_sid] = {'console_sid': console_sid, 'keys': None,
+                                  'seq': 0}
+        resp = struct.pack('<BBBBII', tag, 0, engine.PRIV_ADMINISTRATOR, 0,
+                           console_sid, bmc_sid) + engine.algorithm_payloads()
+        return engine.pack_packet(engine.PAYLOAD_OPEN_SESSION_RESPONSE, 0, 0,
+                                  resp)
+
+    def _rakp1(self, payload):
+        tag, bmc_sid = payload[0], struct.unpack('<I', bytes(payload[4:8]))[0]
+        session = self.sessions.get(bmc_sid)
+        if session is None:
+            return self._refuse(engine.PAYLOAD_RAKP2, tag, 0, 0x02)
+        username = bytes(payload[28:28 + payload[27]])
+        if username != self.username:
+            return self._refuse(engine.PAYLOAD_RAKP2, tag,
+                                session['console_sid'], 0x0d)
+        session.update(rm=bytes(payload[8:24]), rc=os.urandom(16),
+                       role=payload[24], username=username)
+        auth = engine.rakp2_hmac(self.password, session['console_sid'],
+                                 bmc_sid, session['rm'], session['rc'],
+                                 self.guid, session['role'], username)
+        resp = (struct.pack('<BBHI', tag, 0, 0, session['console_sid']) +
+                session['rc'] + self.guid + auth)
+        return engine.pack_packet(engine.PAYLOAD_RAKP2, 0, 0, resp)
+
+    def _rakp3(self, payload):
+        tag, bmc_sid = payload[0], struct.unpack('<I', bytes(payload[4:8]))[0]
+        session = self.sessions.get(bmc_sid)
+        if session is None or 'rc' not in session:
+            return self._refuse(engine.PAYLOAD_RAKP4, tag, 0, 0x02)
+        expected = engine.rakp3_hmac(self.password, session['rc'],
+                                     session['console_sid'], session['role'],
+                                     session['username'])
+        if bytes(payload[8:28]) != expected:
+            return self._refuse(engine.PAYLOAD_RAKP4, tag,
+                                session['console_sid'], 0x0f)
+        sik = engine.session_integrity_key(self.password, session['rm'],
+                                           session['rc'], session['role'],
+                                           session['username'])
+        session['keys'] = engine.SessionKeys(sik)
+        resp = (struct.pack('<BBHI', tag, 0, 0, session['console_sid']) +
+                engine.rakp4_icv(sik, session['rm'], bmc_sid, self.guid))
+        return engine.pack_packet(engine.PAYLOAD_RAKP4, 0, 0, resp)
+
+    def _refuse(self, payload_type, tag, console_sid, status):
+        return engine.pack_packet(payload_type, 0, 0,
+                                  struct.pack('<BBHI', tag, status, 0,
+                                              console_sid))
+
+    def _command(self, data, bmc_sid, payload):
+        session = self.sessions.get(bmc_sid)
+        if session is None or session['keys'] is None:
+            return None
+        keys = session['keys']
+        if not keys.verify(data):
+            return None
+        netfn, seq, cmd, body = engine.unpack_message(keys.decrypt(payload))
+        if self.error_rate and random.random() < self.error_rate:
+            answer = [0xc0]
+        elif (netfn, cmd) == (engine.NETFN_APP, engine.CMD_SET_SESSION_PRIV):
+            answer = [0, body[0]]
+        elif (netfn, cmd) == (engine.NETFN_APP, engine.CMD_GET_DEVICE_ID):
+            answer = [0, 0x20, 0x01, 0x01, 0x00, 0x02, 0x00, 0, 0, 0, 0, 0]
+        elif (netfn, cmd) == (engine.NETFN_APP, engine.CMD_CLOSE_SESSION):
+            del self.sessions[bmc_sid]
+            if self.sol_sid == bmc_sid:
+                self.sol_sid = None
+            answer = [0]
+        elif (netfn, cmd) == (engine.NETFN_APP, engine.CMD_ACTIVATE_PAYLOAD):
+            if self.sol_sid not in (None, bmc_sid):
+                # Payload already active on another session.
+                answer = [0x80]
+            else:
+                self.sol_sid = bmc_sid
+                # Inbound and outbound payload sizes, port and VLAN.
+                answer = [0, 0, 0, 0, 0] + list(bytearray(struct.pack(
+                    '<HHHH', 252, 252, self.port, 0xffff)))
+        elif (netfn, cmd) == (engine.NETFN_APP,
+                              engine.CMD_DEACTIVATE_PAYLOAD):
+            answer = [0] if self.sol_sid == bmc_sid else [0x80]
+            if self.sol_sid == bmc_sid:
+                self.sol_sid = None
+        elif (netfn, cmd) == (engine.NETFN_CHASSIS,
+                              engine.CMD_GET_CHASSIS_STATUS):
+            answer = [0, int(self.power_on), 0, 0]
+        elif (netfn, cmd) == (engine.NETFN_CHASSIS,
+                              engine.CMD_CHASSIS_CONTROL):
+            self._chassis_control(body[0])
+            answer = [0]
+        else:
+            # Invalid command.
+            answer = [0xc1]
+        session['seq'] += 1
+        msg = engine.pack_message(netfn + 1, seq, cmd, answer, request=False)
+        return engine.pack_packet(engine.PAYLOAD_IPMI, session['console_sid'],
+                                  session['seq'], msg, keys)
+
+    def _sol(self, data, bmc_sid, payload):
+        session = self.sessions.get(bmc_sid)
+        if (bmc_sid != self.sol_sid or session is None or
+                not session['keys'].verify(data)):
+            return None
+        payload = session['keys'].decrypt(payload)
+        seq = payload[0] & 0x0f
+        if not seq:
+            return None
+        # Acknowledge the characters and echo them back in the same packet.
+        data = bytes(payload[engine.SOL_HEADER:])
+        return self._sol_packet(session, seq, data)
+
+    def _sol_packet(self, session, ack, data):
+        self.sol_seq = self.sol_seq % 15 + 1
+        session['seq'] += 1
+        payload = bytearray([self.sol_seq, ack, len(data) if ack else 0,
+                             0]) + bytearray(data)
+        return engine.pack_packet(engine.PAYLOAD_SOL, session['console_sid'],
+                                  session['seq'], payload, session['keys'])
+
+    def console_output(self, data):
+        """Return a SOL packet with characters of the console, or None."""
+        session = self.sessions.get(self.sol_sid)
+        if session is None:
+            return None
+        return self._sol_packet(session, 0, data)
+
+    def _chassis_control(self, action):
+        if action in (engine.CHASSIS_POWER_DOWN,
+                      engine.CHASSIS_SOFT_SHUTDOWN):
+            self.power_on = False
+        elif action in (engine.CHASSIS_POWER_UP, engine.CHASSIS_POWER_CYCLE,
+                        engine.CHASSIS_HARD_RESET):
+            self.power_on = True
+
+
+def latency_distribution(spec):
+    """Build a latency generator from a specification string.
+
+    :param spec: one of ``const:SECONDS``, ``uniform:LOW,HIGH``,
+                 ``normal:MEAN,STDDEV`` or ``exp:MEAN``.
+    :raises: ValueError if the specification is invalid.
+    :returns: a callable returning a latency in seconds.
+    """
+    kind, _sep, args = spec.partition(':')
+    args = [float(arg) for arg in args.split(',') if arg]
+    distributions = {
+        'const': (1, lambda value: value),
+        'uniform': (2, random.uniform),
+        'normal': (2, random.normalvariate),
+        'exp': (1, lambda mean: random.expovariate(1.0 / mean)),
+    }
+    if kind not in distributions or len(args) != distributions[kind][0]:
+        raise ValueError('invalid latency distribution %s' % spec)
+    func = distributions[kind][1]
+    return lambda: max(0.0, func(*args))
+
+
+class BMCSimulator(object):
+    """Serve a set of virtual BMCs from green threads.
+
+    :param bmcs: the list of :class:`VirtualBMC` to serve.
+    :param latency: a callable returning the delay of each answer, see
+                    :func:`latency_distribution`.
+    :param drop_rate: ratio of the incoming packets silently dropped.
+    """
+
+    def __init__(self, bmcs, latency=None, drop_rate=0.0):
+        self.bmcs = bmcs
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.received = 0
+        self.dropped = 0
+        self._threads = []
+        # Socket and address of the last peer of each virtual BMC.
+        self._peers = {}
+
+    def start(self):
+        for bmc in self.bmcs:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((bmc.address, bmc.port))
+            self._threads.append((sock, eventlet.spawn(self._serve, bmc,
+                                                       sock)))
+
+    def stop(self):
+        for sock, thread in self._threads:
+            thread.kill()
+            sock.close()
+        self._threads = []
+        self._peers = {}
+
+    def console_write(self, bmc, data):
+        """Send characters on the serial console of a virtual BMC.
+
+        The characters are dropped if no console is attached. They are not
+        retransmitted when their acknowledgement is lost.
+        """
+        packet = bmc.console_output(data)
+        if packet is not None and bmc in self._peers:
+            sock, addr = self._peers[bmc]
+            sock.sendto(packet, addr)
+
+    def _serve(self, bmc, sock):
+        while True:
+            data, addr = sock.recvfrom(4096)
+            self.received += 1
+            self._peers[bmc] = (sock, addr)
+            if self.drop_rate and random.random() < self.drop_rate:
+                self.dropped += 1
+                continue
+            try:
+                resp = bmc.handle(data)
+            except Exception as e:
+                LOG.debug('Virtual BMC %(bmc)s dropped a packet: %(err)s',
+                          {'bmc': bmc.address, 'err': e})
+                continue
+            if resp is None:
+                continue
+            if self.latency is None:
+                sock.sendto(resp, addr)
+            else:
+                eventlet.spawn_after(self.latency(), sock.sendto, resp, addr)
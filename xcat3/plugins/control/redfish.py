@@ -0,0 +1,191 @@
+from oslo_log import log
+from xcat3.plugins.control import base
+from xcat3.plugins.control import redfish_client
+from xcat3.plugins import utils
+from xcat3.common import exception
+from xcat3.common.i18n import _
+
+from xcat3.common import states
+from xcat3.conf import CONF
+
+LOG = log.getLogger(__name__)
+
+_POWER_STATES = {
+    'On': states.POWER_ON,
+    'PoweringOff': states.POWER_ON,
+    'Off': states.POWER_OFF,
+    'PoweringOn': states.POWER_OFF,
+}
+
+_RESET_TYPES = {
+    states.POWER_ON: 'On',
+    states.POWER_OFF: 'ForceOff',
+    states.REBOOT: 'ForceRestart',
+    states.SOFT_POWER_OFF: 'GracefulShutdown',
+    states.SOFT_REBOOT: 'GracefulRestart',
+}
+
+_SYSTEM_ATTRIBUTES = ('Manufacturer', 'Model', 'SKU', 'SerialNumber',
+                      'PartNumber', 'UUID', 'BiosVersion', 'SystemType')
+
+
+class RedfishPlugin(base.ControlInterface):
+    def validate(self, node):
+        """check the redfish specific attributes"""
+        bmc_address = node.control_info.get('bmc_address')
+        bmc_username = node.control_info.get('bmc_username')
+        if not bmc_address:
+            raise exception.MissingParameterValue(
+                _("Redfish address was not specified."))
+        if not bmc_username:
+            raise exception.MissingParameterValue(
+                _("Redfish username was not specified."))
+
+    def _connection(self, node):
+        info = node.control_info
+        return redfish_client.get_pool().get(
+            info['bmc_address'], info['bmc_username'],
+            info.get('bmc_password'), info.get('redfish_system'))
+
+    def _get_system(self, conn):
+        return conn.request('GET', conn.get_system_uri())
+
+    def get_power_state(self, node):
+        """Return the power state of the node
+
+        :param node: the node to act on.
+        :raises: MissingParameterValue if a required parameter is missing.
+        :raises: RedfishFailure if the BMC could not be queried.
+        :returns: a power state.
+        """
+        conn = self._connection(node)
+        state = self._get_system(conn).get('PowerState')
+        if state not in _POWER_STATES:
+            raise exception.RedfishFailure(
+                bmc=conn, reason=_('unknown power state %s') % state)
+        return _POWER_STATES[state]
+
+    def set_power_state(self, node, power_state):
+        """Set the power state of the node's node.
+
+        :param node: the node to act on.
+        :param power_state: Any power state.
+        :raises: MissingParameterValue if a required parameter is missing.
+        :raises: InvalidParameterValue if the power state is not supported.
+        :raises: RedfishFailure if the BMC could not be controlled.
+        """
+        LOG.info("RPC change_power_state called for nodes %(node)s. "
+                 "The desired new state is %(target)s.",
+                 {'node': node.name, 'target': power_state})
+        if power_state not in _RESET_TYPES:
+            raise exception.InvalidParameterValue(
+                err=_("Power state %s is not supported by Redfish.") %
+                power_state)
+        conn = self._connection(node)
+        system = self._get_system(conn)
+        reset_type = _RESET_TYPES[power_state]
+        if (power_state == states.REBOOT and
+                _POWER_STATES.get(system.get('PowerState')) ==
+                states.POWER_OFF):
+            # A restart does not power on a node which is off.
+            reset_type = 'On'
+        action = system.get('Actions', {}).get('#ComputerSystem.Reset', {})
+        target = action.get('target', conn.get_system_uri() +
+                            '/Actions/ComputerSystem.Reset')
+        conn.request('POST', target, json={'ResetType': reset_type})
+
+    def get_power_state_many(self, nodes):
+        """Return the power state of multiple nodes
+
+        The connections and session tokens of the BMCs are reused, at most
+        [redfish]concurrency BMCs are queried at a time.
+        """
+        return utils.run_many(self.get_power_state, nodes,
+                              CONF.redfish.concurrency)
+
+    def set_power_state_many(self, nodes, power_state):
+        """Set the power state of multiple nodes
+
+        See :meth:`get_power_state_many`.
+        """
+        return utils.run_many(self.set_power_state, nodes,
+                              CONF.redfish.concurrency, power_state)
+
+    def get_sensors_data(self, node):
+        """Read the sensors of the node
+
+        The readings come from the Thermal and Power resources of the
+        chassis of the computer system.
+
+        :param node: the node to act on.
+        :raises: RedfishFailure if the BMC could not be queried.
+        :returns: the sensors data of the node.
+        """
+        conn = self._connection(node)
+        chassis_uri = conn.get_chassis_uri()
+        thermal = conn.request('GET', chassis_uri + '/Thermal') or {}
+        power = conn.request('GET', chassis_uri + '/Power') or {}
+        data = dict()
+        for sensor_type, members, reading, units in (
+                ('Temperature', thermal.get('Temperatures'),
+                 'ReadingCelsius', 'Cel'),
+                ('Fan', thermal.get('Fans'), 'Reading', None),
+                ('Voltage', power.get('Voltages'), 'ReadingVolts', 'V'),
+                ('Power', power.get('PowerControl'), 'PowerConsumedWatts',
+                 'W')):
+            for member in members or []:
+                name = member.get('Name') or member.get('MemberId')
+                data.setdefault(sensor_type, {})[name] = {
+                    'Reading': member.get(reading),
+                    'Units': units or member.get('ReadingUnits'),
+                    'Health': (member.get('Status') or {}).get('Health')}
+        return data
+
+    def get_sensors_data_many(self, nodes):
+        """Read the sensors of multiple nodes
+
+        See :meth:`get_power_state_many`.
+        """
+        return utils.run_many(self.get_sensors_data, nodes,
+                              CONF.redfish.concurrency)
+
+    def reboot(self, node):
+        """Perform a hard reboot of the node's node.
+
+        Drivers are expected to properly handle case when node is powered off
+        by powering it on.
+
+        :param node: the node to act on.
+        :raises: MissingParameterValue if a required parameter is missing.
+        """
+        self.set_power_state(node, states.REBOOT)
+
+    def get_inventory(self, node):
+        """Get the inventory information from control module
+
+        The inventory is built from the computer system resource, so one
+        request is enough for each node.
+
+        :param node: the node to act on.
+        :raises: RedfishFailure if the BMC could not be queried.
+        :returns: the inventory of the node.
+        """
+        system = self._get_system(self._connection(node))
+        inventory = {'system': {system.get('Id', 'system'): dict(
+            (key, system.get(key)) for key in _SYSTEM_ATTRIBUTES)}}
+        for category, key in (('processors', 'ProcessorSummary'),
+                              ('memory', 'MemorySummary')):
+            summary = dict(system.get(key) or {})
+            # The health changes on its own, it is not inventory.
+            summary.pop('Status', None)
+            if summary:
+                inventory[category] = {'summary': summary}
+        return inventory
+
+    def get_inventory_many(self, nodes):
+        """Get the inventory information of multiple nodes
+
+        See :meth:`get_power_state_many`.
+        """
+        return utils.run_many(self.get_inventory, nodes,
+                              CONF.redfish.concurrency)
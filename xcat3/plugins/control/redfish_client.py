@@ -0,0 +1,213 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Pooled Redfish client.
+
+Each BMC gets a :class:`Connection` holding a pool of keep-alive HTTP
+connections and a Redfish session token, both reused by all the operations
+on the BMC until it is idle for [redfish]session_idle_timeout. The conductor
+runs with eventlet monkey patching, so the requests of many BMCs are
+carried concurrently by green threads.
+"""
+
+import time
+
+import eventlet
+from eventlet import semaphore
+from oslo_log import log
+import requests
+from requests import adapters
+import six
+
+from xcat3.common import exception
+from xcat3.conf import CONF
+
+LOG = log.getLogger(__name__)
+
+SESSIONS_PATH = '/redfish/v1/SessionService/Sessions'
+SYSTEMS_PATH = '/redfish/v1/Systems'
+CHASSIS_PATH = '/redfish/v1/Chassis'
+
+
+def base_url(address):
+    """Return the base URL of a BMC from its control_info address."""
+    if '://' in address:
+        return address.rstrip('/')
+    return '%s://%s' % (CONF.redfish.scheme, address)
+
+
+class Connection(object):
+    """HTTP connections and Redfish session with one BMC."""
+
+    def __init__(self, url, username, password):
+        self.url = url
+        self.username = username
+        self.password = password
+        self.http = requests.Session()
+        self.http.verify = CONF.redfish.verify_ca
+        self.http.mount(url, adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=CONF.redfish.connections_per_bmc,
+            pool_block=True))
+        self.token = None
+        self.session_uri = None
+        self.system_uri = None
+        self.chassis_uri = None
+        self.last_used = time.time()
+        # Bumped at each login, so concurrent requests hitting an expired
+        # token log in only once.
+        self._generation = 0
+        self._login_lock = semaphore.Semaphore()
+
+    def __repr__(self):
+        return self.url
+
+    def _send(self, method, path, **kwargs):
+        try:
+            return self.http.request(method, self.url + path,
+                                     timeout=CONF.redfish.timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise exception.RedfishTimeout(bmc=self, reason=six.text_type(e))
+        except requests.RequestException as e:
+            raise exception.RedfishFailure(bmc=self,
+                                           reason=six.text_type(e))
+
+    def _fail(self, resp):
+        reason = '%s %s' % (resp.status_code, resp.reason)
+        try:
+            reason = resp.json()['error']['message']
+        except Exception:
+            pass
+        raise exception.RedfishFailure(bmc=self, reason=reason)
+
+    def login(self, generation):
+        """Open a Redfish session unless another request already did."""
+        with self._login_lock:
+            if self._generation != generation:
+                return
+            resp = self._send('POST', SESSIONS_PATH,
+                              json={'UserName': self.username,
+                                    'Password': self.password})
+            if resp.status_code not in (200, 201):
+                self._fail(resp)
+            self.token = resp.headers.get('X-Auth-Token')
+            self.session_uri = resp.headers.get('Location')
+            self.http.headers['X-Auth-Token'] = self.token
+            self._generation += 1
+
+    def request(self, method, path, **kwargs):
+        """Send a request with the session token.
+
+        The session is opened on first use and opened again when the BMC
+        rejects an expired token.
+
+        :raises: RedfishFailure if the BMC answers with an error.
+        :raises: RedfishTimeout if the BMC can not be reached.
+        :returns: the decoded JSON body of the answer, None if empty.
+        """
+        generation = self._generation
+        if self.token is None:
+            self.login(generation)
+            generation = self._generation
+        resp = self._send(method, path, **kwargs)
+        if resp.status_code == 401:
+            self.login(generation)
+            resp = self._send(method, path, **kwargs)
+        if resp.status_code >= 400:
+            self._fail(resp)
+        self.last_used = time.time()
+        if not resp.content:
+            return None
+        return resp.json()
+
+    def get_system_uri(self):
+        """Return the URI of the first computer system of the BMC."""
+        if self.system_uri is None:
+            members = self.request('GET', SYSTEMS_PATH).get('Members') or []
+            if not members:
+                raise exception.RedfishFailure(
+                    bmc=self, reason='no computer system found')
+            self.system_uri = members[0]['@odata.id']
+        return self.system_uri
+
+    def get_chassis_uri(self):
+        """Return the URI of the chassis of the computer system."""
+        if self.chassis_uri is None:
+            system = self.request('GET', self.get_system_uri())
+            links = (system.get('Links') or {}).get('Chassis') or []
+            if not links:
+                links = self.request('GET', CHASSIS_PATH).get('Members') or []
+            if not links:
+                raise exception.RedfishFailure(
+                    bmc=self, reason='no chassis found')
+            self.chassis_uri = links[0]['@odata.id']
+        return self.chassis_uri
+
+    def close(self):
+        """Delete the Redfish session and close the connections."""
+        try:
+            if self.session_uri:
+                path = self.session_uri
+                if path.startswith(self.url):
+                    path = path[len(self.url):]
+                self._send('DELETE', path)
+        except exception.RedfishFailure as e:
+            LOG.debug('Failed to delete Redfish session of %(bmc)s: %(err)s',
+                      {'bmc': self, 'err': e})
+        finally:
+            self.token = self.session_uri = None
+            self.http.close()
+
+
+class ConnectionPool(object):
+    """Connections keyed by BMC URL and username."""
+
+    def __init__(self, idle_timeout=None):
+        self.idle_timeout = (CONF.redfish.session_idle_timeout
+                             if idle_timeout is None else idle_timeout)
+        self._connections = dict()
+        self._reaper = None
+
+    def get(self, address, username, password, system_uri=None):
+        url = base_url(address)
+        key = (url, username)
+        conn = self._connections.get(key)
+        if conn is None or conn.password != password:
+            if conn is not None:
+                eventlet.spawn_n(conn.close)
+            conn = self._connections[key] = Connection(url, username,
+                                                       password)
+        if system_uri:
+            conn.system_uri = system_uri
+        if self._reaper is None:
+            self._reaper = eventlet.spawn(self._reap)
+        return conn
+
+    def _reap(self):
+        interval = min(60, self.idle_timeout)
+        while True:
+            eventlet.sleep(interval)
+            now = time.time()
+            for key, conn in list(self._connections.items()):
+                if now - conn.last_used >= self.idle_timeout:
+                    del self._connections[key]
+                    eventlet.spawn_n(conn.close)
+
+
+_POOL = None
+
+
+def get_pool():
+    """Return the connection pool of the process, created on first use."""
+    global _POOL
+    if _POOL is None:
+        _POOL = ConnectionPool()
+    return _POOL
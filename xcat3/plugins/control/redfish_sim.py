@@ -0,0 +1,212 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Mock Redfish BMCs served over plain HTTP on local addresses.
+
+Used to exercise and benchmark :mod:`xcat3.plugins.control.redfish` without
+hardware. Only the session service, the computer system, its reset action
+and the thermal and power readings of its chassis are implemented.
+"""
+
+import json
+import random
+import uuid
+
+import eventlet
+from eventlet import wsgi
+from oslo_log import log
+
+from xcat3.plugins.control import redfish_client
+
+LOG = log.getLogger(__name__)
+
+SYSTEM_PATH = redfish_client.SYSTEMS_PATH + '/1'
+CHASSIS_PATH = redfish_client.CHASSIS_PATH + '/1'
+RESET_PATH = SYSTEM_PATH + '/Actions/ComputerSystem.Reset'
+
+
+class _NullLog(object):
+    def write(self, msg):
+        pass
+
+
+class VirtualRedfishBMC(object):
+    """A WSGI application simulating one Redfish BMC."""
+
+    def __init__(self, address, port, username, password, power_on=False,
+                 latency=None):
+        self.address = address
+        self.port = port
+        self.username = username
+        self.password = password
+        self.power_on = power_on
+        # A callable returning the delay of each answer, see
+        # ipmi_sim.latency_distribution.
+        self.latency = latency
+        self.sessions = set()
+        self.uuid = str(uuid.uuid4())
+        self.serial = self.uuid[:8].upper()
+        self.requests = 0
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % (self.address, self.port)
+
+    def __call__(self, environ, start_response):
+        self.requests += 1
+        if self.latency is not None:
+            eventlet.sleep(self.latency())
+        method = environ['REQUEST_METHOD']
+        path = environ['PATH_INFO'].rstrip('/')
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        body = environ['wsgi.input'].read(length) if length else b''
+        if method == 'POST' and path == redfish_client.SESSIONS_PATH:
+            return self._login(body, start_response)
+        if environ.get('HTTP_X_AUTH_TOKEN') not in self.sessions:
+            return self._answer(start_response, '401 Unauthorized',
+                                self._error('Invalid session token.'))
+        if method == 'DELETE' and path.startswith(
+                redfish_client.SESSIONS_PATH + '/'):
+            self.sessions.discard(path.rsplit('/', 1)[1])
+            return self._answer(start_response, '204 No Content')
+        if method == 'GET' and path == redfish_client.SYSTEMS_PATH:
+            return self._answer(start_response, '200 OK', {
+                'Members': [{'@odata.id': SYSTEM_PATH}],
+                'Members@odata.count': 1})
+        if method == 'GET' and path == SYSTEM_PATH:
+            return self._answer(start_response, '200 OK', self._system())
+        if method == 'GET' and path == CHASSIS_PATH + '/Thermal':
+            return self._answer(start_response, '200 OK', self._thermal())
+        if method == 'GET' and path == CHASSIS_PATH + '/Power':
+            return self._answer(start_response, '200 OK', self._power())
+        if method == 'POST' and path == RESET_PATH:
+            return self._reset(body, start_response)
+        return self._answer(start_response, '404 Not Found',
+                            self._error('Resource not found.'))
+
+    @staticmethod
+    def _error(message):
+        return {'error': {'code': 'Base.1.0.GeneralError',
+                          'message': message}}
+
+    @staticmethod
+    def _answer(start_response, status, data=None):
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        headers = [('Content-Length', str(len(body)))]
+        if body:
+            headers.append(('Content-Type', 'application/json'))
+        start_response(status, headers)
+        return [body]
+
+    def _login(self, body, start_response):
+        try:
+            data = json.loads(body.decode('utf-8'))
+        except ValueError:
+            data = {}
+        if (data.get('UserName') != self.username or
+                data.get('Password') != self.password):
+            return self._answer(start_response, '401 Unauthorized',
+                                self._error('Invalid credentials.'))
+        # The token is also the id of the session.
+        token = uuid.uuid4().hex
+        self.sessions.add(token)
+        body = json.dumps({'Id': token, 'UserName': self.username})
+        body = body.encode('utf-8')
+        start_response('201 Created', [
+            ('Content-Length', str(len(body))),
+            ('Content-Type', 'application/json'),
+            ('X-Auth-Token', token),
+            ('Location', redfish_client.SESSIONS_PATH + '/' + token)])
+        return [body]
+
+    def _system(self):
+        return {
+            '@odata.id': SYSTEM_PATH,
+            'Id': '1',
+            'Manufacturer': 'xCAT',
+            'Model': 'Virtual Redfish BMC',
+            'SerialNumber': self.serial,
+            'UUID': self.uuid,
+            'BiosVersion': '1.0.0',
+            'SystemType': 'Physical',
+            'ProcessorSummary': {'Count': 2, 'Model': 'Virtual CPU',
+                                 'Status': {'Health': 'OK'}},
+            'MemorySummary': {'TotalSystemMemoryGiB': 64,
+                              'Status': {'Health': 'OK'}},
+            'PowerState': 'On' if self.power_on else 'Off',
+            'Links': {'Chassis': [{'@odata.id': CHASSIS_PATH}]},
+            'Actions': {'#ComputerSystem.Reset': {
+                'target': RESET_PATH,
+                'ResetType@Redfish.AllowableValues': [
+                    'On', 'ForceOff', 'GracefulShutdown', 'GracefulRestart',
+                    'ForceRestart']}}}
+
+    def _thermal(self):
+        ok = {'State': 'Enabled', 'Health': 'OK'}
+        load = 1 if self.power_on else 0
+        return {
+            '@odata.id': CHASSIS_PATH + '/Thermal',
+            'Temperatures': [
+                {'MemberId': str(i), 'Name': 'CPU%d Temp' % (i + 1),
+                 'ReadingCelsius': 30 + load * random.randint(10, 40),
+                 'Status': ok} for i in range(2)],
+            'Fans': [
+                {'MemberId': str(i), 'Name': 'Fan%d' % (i + 1),
+                 'Reading': 2000 + load * random.randint(1000, 6000),
+                 'ReadingUnits': 'RPM', 'Status': ok} for i in range(4)]}
+
+    def _power(self):
+        ok = {'State': 'Enabled', 'Health': 'OK'}
+        watts = random.randint(150, 450) if self.power_on else 10
+        return {
+            '@odata.id': CHASSIS_PATH + '/Power',
+            'PowerControl': [{'MemberId': '0', 'Name': 'System Power',
+                              'PowerConsumedWatts': watts, 'Status': ok}],
+            'Voltages': [{'MemberId': '0', 'Name': 'PSU1 Input',
+                          'ReadingVolts': 230, 'Status': ok}]}
+
+    def _reset(self, body, start_response):
+        try:
+            reset_type = json.loads(body.decode('utf-8')).get('ResetType')
+        except ValueError:
+            reset_type = None
+        if reset_type in ('On', 'ForceRestart', 'GracefulRestart'):
+            self.power_on = True
+        elif reset_type in ('ForceOff', 'GracefulShutdown'):
+            self.power_on = False
+        else:
+            return self._answer(start_response, '400 Bad Request',
+                                self._error('Invalid ResetType.'))
+        return self._answer(start_response, '204 No Content')
+
+
+class RedfishSimulator(object):
+    """Serve a set of virtual Redfish BMCs from green threads.
+
+    :param bmcs: the list of :class:`VirtualRedfishBMC` to serve.
+    """
+
+    def __init__(self, bmcs):
+        self.bmcs = bmcs
+        self._threads = []
+
+    def start(self):
+        for bmc in self.bmcs:
+            sock = eventlet.listen((bmc.address, bmc.port))
+            self._threads.append((sock, eventlet.spawn(
+                wsgi.server, sock, bmc, log=_NullLog(), log_output=False)))
+
+    def stop(self):
+        for sock, thread in self._threads:
+            thread.kill()
+            sock.close()
+        self._threads = []
@@ -1,20 +1,106 @@
+"""Registry of the plugins.
+
+The plugins are discovered through the entry points of setup.cfg and are
+only imported when a node managed by them is first handled. The loaded
+plugins are cached by the ``mgt`` attribute of the nodes, the DHCP
+plugins by name.
+"""
+
+import collections
+
+from oslo_concurrency import lockutils
 from oslo_log import log
+from stevedore import driver
+
 from xcat3.common import exception
-from xcat3.plugins.control import ipmi
+from xcat3.common.i18n import _LE
 
 LOG = log.getLogger(__name__)
 
-plugin_map = dict()
-plugin_map['ipmi'] = ipmi.IPMIPlugin()
+CONTROL_NAMESPACE = 'xcat3.plugins.control'
+DHCP_NAMESPACE = 'xcat3.plugins.dhcp'
+
+_control_plugins = dict()
+_dhcp_plugins = dict()
+
+
+def get_control_plugin(mgt):
+    """Return the control plugin of the given type.
+
+    :param mgt: the name of the plugin entry point, as in node.mgt.
+    :raises: PluginNotFound if the plugin could not been loaded.
+    :returns: the plugin instance, shared by all the nodes of the type.
+    """
+    plugin = _control_plugins.get(mgt)
+    if plugin is None:
+        plugin = _load_control_plugin(mgt)
+    return plugin
+
+
+@lockutils.synchronized('xcat3-control-plugins')
+def _load_control_plugin(mgt):
+    if mgt in _control_plugins:
+        return _control_plugins[mgt]
+    try:
+        manager = driver.DriverManager(CONTROL_NAMESPACE, mgt,
+                                       invoke_on_load=True)
+    except Exception as e:
+        LOG.error(_LE('Failed to load control plugin %(name)s: %(err)s'),
+                  {'name': mgt, 'err': e})
+        raise exception.PluginNotFound(name=mgt)
+    _control_plugins[mgt] = manager.driver
+    return manager.driver
+
+
+def get_dhcp_plugin(name):
+    """Return the DHCP plugin of the given name.
+
+    :param name: the name of the plugin entry point, see [dhcp]backend.
+    :raises: PluginNotFound if the plugin could not been loaded.
+    :returns: the plugin instance.
+    """
+    plugin = _dhcp_plugins.get(name)
+    if plugin is None:
+        plugin = _load_dhcp_plugin(name)
+    return plugin
+
 
+@lockutils.synchronized('xcat3-dhcp-plugins')
+def _load_dhcp_plugin(name):
+    if name in _dhcp_plugins:
+        return _dhcp_plugins[name]
+    try:
+        manager = driver.DriverManager(DHCP_NAMESPACE, name,
+                                       invoke_on_load=True)
+    except Exception as e:
+        LOG.error(_LE('Failed to load DHCP plugin %(name)s: %(err)s'),
+                  {'name': name, 'err': e})
+        raise exception.PluginNotFound(name=name)
+    _dhcp_plugins[name] = manager.driver
+    return manager.driver
 
-def get_plugin(node):
-    control_plugin = plugin_map.get(node.mgt)
-    os_plugin = None
-    boot_plugin = None
-    if not control_plugin:
-        raise exception.PluginNotFound(name=node.mgt)
-    return control_plugin, os_plugin, boot_plugin
 
+def group_nodes(nodes):
+    """Group the nodes by control plugin.
 
+    The plugin is resolved once for each distinct ``mgt`` of the nodes.
 
+    :param nodes: the list of nodes.
+    :returns: a tuple (groups, errors). groups is an ordered dict of the
+              control plugin and its list of nodes, errors is a dict of
+              node name and the exception for the nodes without plugin.
+    """
+    by_mgt = collections.OrderedDict()
+    for node in nodes:
+        by_mgt.setdefault(node.mgt, []).append(node)
+    groups = collections.OrderedDict()
+    errors = dict()
+    for mgt, mgt_nodes in by_mgt.items():
+        try:
+            plugin = get_control_plugin(mgt)
+        except exception.PluginNotFound as e:
+            for node in mgt_nodes:
+                errors[node.name] = e
+            continue
+        groups.setdefault(plugin, []).extend(mgt_nodes)
+    return groups, errors
@@ -0,0 +1,414 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Files of the OS images, stored by content.
+
+A file added to the store is named by the sha256 of its content, its
+content id, so importing the same kernel or root image again copies
+nothing. The store keeps the checksum of the files it has seen in a
+sqlite database keyed by device, inode, mtime and size: a file which did
+not change since it was last imported is not read again.
+
+The content is cloned into the store with a reflink when the file system
+supports it, otherwise copied in chunks by several threads. The stored
+files are read only, they are hard linked where the images are served,
+or cloned or copied when it is not possible.
+
+The osimage_files table maps the files of an OS image to their content
+ids.
+"""
+
+import errno
+import fcntl
+import hashlib
+import os
+import sqlite3
+import tempfile
+import zlib
+
+from eventlet import greenpool
+from eventlet import tpool
+from oslo_log import log
+
+from xcat3.common.i18n import _LI
+from xcat3.conf import CONF
+
+LOG = log.getLogger(__name__)
+
+# ioctl cloning a file on the file systems with reflinks, btrfs and xfs.
+FICLONE = 0x40049409
+_READ_SIZE = 1024 * 1024
+_CLONE_ERRORS = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL,
+                 errno.EBADF, errno.EPERM)
+_LINK_ERRORS = (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EACCES)
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(_READ_SIZE)
+            if not data:
+                return digest.hexdigest()
+            digest.update(data)
+
+
+def _copy_range(src, dst, offset, size):
+    with open(src, 'rb') as fin:
+        with open(dst, 'r+b') as fout:
+            fin.seek(offset)
+            fout.seek(offset)
+            while size > 0:
+                data = fin.read(min(size, _READ_SIZE))
+                if not data:
+                    raise IOError(errno.EIO, '%s truncated' % src)
+                fout.write(data)
+                size -= len(data)
+
+
+def _compress(data, level):
+    # A complete gzip member, the members of the chunks concatenated are
+    # a valid gzip file.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _read_chunk(path, offset, size):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def _chunks(size):
+    chunk = CONF.provision.image_chunk_size * 1024 * 1024
+    return [(offset, min(chunk, size - offset))
+            for offset in range(0, size, chunk)]
+
+
+def _clone(src, dst):
+    """Share the blocks of src with dst, return False if not supported."""
+    with open(src, 'rb') as fin:
+        with open(dst, 'wb') as fout:
+            try:
+                fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+            except (IOError, OSError) as e:
+                if e.errno in _CLONE_ERRORS:
+                    return False
+                raise
+    return True
+
+
+def _copy(src, dst):
+    """Copy src to dst, in chunks copied by several threads."""
+    if _clone(src, dst):
+        return
+    size = os.path.getsize(src)
+    with open(dst, 'wb') as f:
+        f.truncate(size)
+    pool = greenpool.GreenPool(CONF.provision.image_workers)
+    # The file I/O of the threads release the GIL.
+    threads = [pool.spawn(tpool.execute, _copy_range, src, dst, offset,
+                          length) for offset, length in _chunks(size)]
+    for thread in threads:
+        thread.wait()
+
+
+def _write_hashed(f, digest, data):
+    digest.update(data)
+    f.write(data)
+
+
+def _copy_hashed(src, dst):
+    """Copy src to dst, return the sha256 and the size of the data copied.
+
+    The chunks are read by several threads and hashed in order while they
+    are written, the digest is the one of the content of dst.
+    """
+    digest = hashlib.sha256()
+    if _clone(src, dst):
+        return tpool.execute(_hash_file, dst), os.path.getsize(dst)
+    pool = greenpool.GreenPool(CONF.provision.image_workers)
+
+    def _read(chunk):
+        data = tpool.execute(_read_chunk, src, *chunk)
+        if len(data) != chunk[1]:
+            raise IOError(errno.EIO, '%s truncated' % src)
+        return data
+
+    size = 0
+    with open(dst, 'wb') as f:
+        # imap keeps the order of the chunks and only image_workers chunks
+        # in memory.
+        for data in pool.imap(_read, _chunks(os.path.getsize(src))):
+            tpool.execute(_write_hashed, f, digest, data)
+            size += len(data)
+    return digest.hexdigest(), size
+
+
+def _same_file(st1, st2):
+    return ((st1.st_dev, st1.st_ino, st1.st_mtime, st1.st_size) ==
+            (st2.st_dev, st2.st_ino, st2.st_mtime, st2.st_size))
+
+
+class ChecksumCache(object):
+    """The sha256 of files by device, inode, mtime and size.
+
+    Also records the content id of the compressed version of the contents
+    packed.
+
+    :param path: the path of the sqlite database.
+    """
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS checksums (dev INTEGER, '
+                'ino INTEGER, mtime REAL, size INTEGER, digest TEXT, '
+                'PRIMARY KEY (dev, ino))')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS packed (digest TEXT, '
+                'level INTEGER, content_id TEXT, PRIMARY KEY (digest, '
+                'level))')
+        self.hits = 0
+
+    def get(self, st):
+        """Return the checksum of the file of a stat result, or None."""
+        row = self._db.execute(
+            'SELECT digest FROM checksums WHERE dev = ? AND ino = ? AND '
+            'mtime = ? AND size = ?',
+            (st.st_dev, st.st_ino, st.st_mtime, st.st_size)).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        return str(row[0])
+
+    def put(self, st, digest):
+        with self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO checksums VALUES (?, ?, ?, ?, ?)',
+                (st.st_dev, st.st_ino, st.st_mtime, st.st_size, digest))
+
+    def get_packed(self, digest, level):
+        row = self._db.execute(
+            'SELECT content_id FROM packed WHERE digest = ? AND level = ?',
+            (digest, level)).fetchone()
+        return None if row is None else str(row[0])
+
+    def put_packed(self, digest, level, content_id):
+        with self._db:
+            self._db.execute('INSERT OR REPLACE INTO packed VALUES (?, ?, ?)',
+                             (digest, level, content_id))
+
+    def close(self):
+        self._db.close()
+
+
+class ImageStore(object):
+    """The files of the OS images, named by their content.
+
+    :param root: the directory of the store, [provision]image_store_dir by
+                 default.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or CONF.provision.image_store_dir
+        self._objects = os.path.join(self.root, 'objects')
+        self._tmp = os.path.join(self.root, 'tmp')
+        for directory in (self._objects, self._tmp):
+            try:
+                os.makedirs(directory)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+        self.checksums = ChecksumCache(os.path.join(self.root,
+                                                    'checksums.sqlite'))
+
+    def path(self, content_id):
+        """Return the path of a content in the store."""
+        return os.path.join(self._objects, content_id[:2], content_id)
+
+    def exists(self, content_id):
+        return os.path.exists(self.path(content_id))
+
+    def checksum(self, path):
+        """Return the sha256 of a file, only read if it changed."""
+        st = os.stat(path)
+        digest = self.checksums.get(st)
+        if digest is not None:
+            return digest
+        digest = tpool.execute(_hash_file, path)
+        # Not recorded if the file was modified while being read.
+        if _same_file(st, os.stat(path)):
+            self.checksums.put(st, digest)
+        return digest
+
+    def _mkstemp(self):
+        fd, tmp = tempfile.mkstemp(dir=self._tmp)
+        os.close(fd)
+        return tmp
+
+    def _commit(self, tmp, content_id):
+        dest = self.path(content_id)
+        try:
+            os.makedirs(os.path.dirname(dest))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        os.chmod(tmp, 0o444)
+        os.rename(tmp, dest)
+        self.checksums.put(os.stat(dest), content_id)
+
+    def add(self, path):
+        """Add a file to the store.
+
+        The content id is the digest of the data copied into the store, a
+        file modified during the copy is stored as it was read.
+
+        :returns: a tuple (content_id, size).
+        """
+        st = os.stat(path)
+        content_id = self.checksums.get(st)
+        if content_id is not None and self.exists(content_id):
+            return content_id, st.st_size
+        tmp = self._mkstemp()
+        try:
+            content_id, size = _copy_hashed(path, tmp)
+            if self.exists(content_id):
+                os.unlink(tmp)
+            else:
+                self._commit(tmp, content_id)
+                LOG.info(_LI('Stored %(path)s as %(id)s'),
+                         {'path': path, 'id': content_id})
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        # Not recorded if the file was modified while being copied.
+        if _same_file(st, os.stat(path)):
+            self.checksums.put(st, content_id)
+        return content_id, size
+
+    def pack(self, path):
+        """Add the gzip compressed content of a file to the store.
+
+        The chunks of the file are compressed by several threads. A content
+        already packed is not compressed again.
+
+        :returns: a tuple (content_id, size) of the compressed content.
+        """
+        level = CONF.provision.image_compress_level
+        source_id = self.checksum(path)
+        content_id = self.checksums.get_packed(source_id, level)
+        if content_id is not None and self.exists(content_id):
+            return content_id, os.path.getsize(self.path(content_id))
+        tmp = self._mkstemp()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            pool = greenpool.GreenPool(CONF.provision.image_workers)
+
+            def _compress_chunk(chunk):
+                data = tpool.execute(_read_chunk, path, *chunk)
+                return tpool.execute(_compress, data, level)
+
+            with open(tmp, 'wb') as f:
+                # imap keeps the order of the chunks and only
+                # image_workers chunks in memory.
+                for data in pool.imap(_compress_chunk,
+                                      _chunks(os.path.getsize(path))):
+                    digest.update(data)
+                    f.write(data)
+                    size += len(data)
+            content_id = digest.hexdigest()
+            if self.exists(content_id):
+                os.unlink(tmp)
+            else:
+                self._commit(tmp, content_id)
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        self.checksums.put_packed(source_id, level, content_id)
+        return content_id, size
+
+    def link(self, content_id, dest):
+        """Make a stored content appear at dest.
+
+        dest is a hard link to the store when possible, otherwise a clone
+        or a copy. It replaces atomically the file at dest.
+        """
+        src = self.path(content_id)
+        try:
+            if _same_file(os.stat(src), os.stat(dest)):
+                # Already linked, and rename does nothing between two
+                # links of the same file.
+                return
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        directory = os.path.dirname(os.path.abspath(dest))
+        tmp = os.path.join(directory, '.%s.%s' % (os.path.basename(dest),
+                                                  content_id[:16]))
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+        try:
+            os.link(src, tmp)
+        except OSError as e:
+            if e.errno not in _LINK_ERRORS:
+                raise
+            _copy(src, tmp)
+            os.chmod(tmp, 0o444)
+        try:
+            os.rename(tmp, dest)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    def remove_unused(self, used):
+        """Delete the contents which are not used.
+
+        :param used: the set of the content ids to keep.
+        :returns: the number of contents deleted.
+        """
+        removed = 0
+        for prefix in os.listdir(self._objects):
+            directory = os.path.join(self._objects, prefix)
+            for content_id in os.listdir(directory):
+                if content_id not in used:
+                    os.unlink(os.path.join(directory, content_id))
+                    removed += 1
+        return removed
+
+    def close(self):
+        self.checksums.close()
+
+
+def import_osimage(store, dbapi, osimage_name, files, pack=()):
+    """Store the files of an OS image and record their content ids.
+
+    :param store: the :class:`ImageStore`.
+    :param dbapi: the database API.
+    :param osimage_name: the name of the OS image.
+    :param files: a dict of role and path of the files of the image.
+    :param pack: the roles of the files stored gzip compressed.
+    :raises: OSImageNotFound
+    :returns: a dict of role and content id.
+    """
+    contents = {}
+    for role, path in files.items():
+        if role in pack:
+            contents[role] = store.pack(path)
+        else:
+            contents[role] = store.add(path)
+    dbapi.set_osimage_files(osimage_name, contents)
+    return dict((role, content[0]) for role, content in contents.items())
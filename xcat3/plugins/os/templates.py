@@ -0,0 +1,248 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Render the kickstart, autoinstall and other per node files.
+
+A template is compiled once and kept until its file changes, then every
+node of a batch is rendered with the same compiled template. Large
+batches are split between worker processes forked for the batch: they
+inherit the compiled template and the parameters of the nodes, only the
+results come back through a pipe. The process pools of concurrent.futures
+cannot be used in the eventlet monkey patched conductor.
+
+A file is only written when the digest of its rendered content differs
+from the one of the file on disk, so that unchanged files keep their
+mtime and are not sent again to the caches of the boot file servers.
+"""
+
+import errno
+import hashlib
+import json
+import os
+import tempfile
+
+from eventlet import greenio
+from eventlet.green import os as green_os
+import jinja2
+from oslo_concurrency import processutils
+from oslo_log import log
+import six
+
+from xcat3.common import exception
+from xcat3.common.i18n import _
+from xcat3.conf import CONF
+
+LOG = log.getLogger(__name__)
+
+
+class TemplateCache(object):
+    """The compiled templates, by path and modification time."""
+
+    def __init__(self):
+        self._templates = {}
+        # One environment per directory, the templates can include the
+        # other templates of their directory.
+        self._environments = {}
+
+    def get(self, path):
+        """Return the compiled template of a file.
+
+        :raises: TemplateError if the file cannot be read or compiled.
+        """
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+            version = (st.st_mtime, st.st_size)
+            cached = self._templates.get(path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            directory = os.path.dirname(path)
+            env = self._environments.get(directory)
+            if env is None:
+                env = jinja2.Environment(
+                    loader=jinja2.FileSystemLoader(directory))
+                self._environments[directory] = env
+            with open(path, 'rb') as f:
+                source = f.read().decode('utf-8')
+            template = env.from_string(source)
+        except (IOError, OSError, UnicodeError,
+                jinja2.TemplateError) as e:
+            raise exception.TemplateError(template=path,
+                                          reason=six.text_type(e))
+        self._templates[path] = (version, template)
+        return template
+
+
+def _file_digest(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except IOError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return None
+
+
+def _stat_key(path):
+    """Return what identifies a version of a file, None if it is missing."""
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return None
+    return [st.st_ino, st.st_size, st.st_mtime]
+
+
+def _write(path, data):
+    directory = os.path.dirname(path)
+    try:
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.xcat3-')
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            # Created meanwhile by another worker writing to it.
+            if e.errno != errno.EEXIST:
+                raise
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.xcat3-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # Served to the installers, readable like any file of the
+        # install directory.
+        os.chmod(tmp, 0o644)
+        os.rename(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        raise
+
+
+def _render(template, jobs, digests):
+    """Render and write the files which changed.
+
+    :param digests: a dict of path and [stat key, digest] of the files
+                    known, they are read again when their stat changed.
+    :returns: a list of (path, digest, stat key, written, error) lists.
+    """
+    results = []
+    for path, params in jobs:
+        try:
+            data = template.render(params).encode('utf-8')
+            digest = hashlib.sha256(data).hexdigest()
+            key = _stat_key(path)
+            known = digests.get(path)
+            if known is not None and known[0] == key:
+                known = known[1]
+            elif key is None:
+                known = None
+            else:
+                known = _file_digest(path)
+            written = known != digest
+            if written:
+                _write(path, data)
+                key = _stat_key(path)
+            results.append([path, digest, key, written, None])
+        except Exception as e:
+            results.append([path, None, None, False, six.text_type(e)])
+    return results
+
+
+def _render_child(template, jobs, digests, fd):
+    code = 1
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps(_render(template, jobs, digests)).encode(
+                'utf-8'))
+        code = 0
+    finally:
+        # Leave without running the exit handlers and the finally clauses
+        # of the conductor copied by fork.
+        os._exit(code)
+
+
+class TemplateRenderer(object):
+    """Render templates into the files of many nodes."""
+
+    def __init__(self):
+        self.templates = TemplateCache()
+        # The stat keys and digests of the files rendered, so that they are
+        # not read to be compared again while they are not modified.
+        self._digests = {}
+
+    def render(self, template, jobs):
+        """Render a template for each node and write the changed files.
+
+        :param template: the path of the template file.
+        :param jobs: a list of (output path, template parameters) tuples.
+        :raises: TemplateError if the template cannot be loaded.
+        :returns: a tuple (written, errors). written is the list of the
+                  paths written because their content changed, errors is
+                  a dict of path and error message for the files which
+                  could not be rendered or written.
+        """
+        compiled = self.templates.get(template)
+        jobs = [(os.path.abspath(path), params) for path, params in jobs]
+        workers = (CONF.provision.template_workers or
+                   processutils.get_worker_count())
+        if (workers < 2 or
+                len(jobs) < CONF.provision.template_parallel_threshold):
+            results = _render(compiled, jobs, self._digests)
+        else:
+            results = self._render_parallel(compiled, jobs, workers)
+        written = []
+        errors = {}
+        for path, digest, key, changed, error in results:
+            if error is not None:
+                errors[path] = error
+                self._digests.pop(path, None)
+                continue
+            self._digests[path] = [key, digest]
+            if changed:
+                written.append(path)
+        LOG.debug('Rendered %(count)d files from %(template)s, %(written)d '
+                  'written, %(errors)d errors',
+                  {'count': len(jobs), 'template': template,
+                   'written': len(written), 'errors': len(errors)})
+        return written, errors
+
+    def _render_parallel(self, template, jobs, workers):
+        children = []
+        for i in range(workers):
+            chunk = jobs[i::workers]
+            if not chunk:
+                continue
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                _render_child(template, chunk, self._digests, write_fd)
+            os.close(write_fd)
+            children.append((pid, read_fd, chunk))
+        results = []
+        for pid, read_fd, chunk in children:
+            pipe = greenio.GreenPipe(read_fd, 'rb')
+            try:
+                data = pipe.read()
+            finally:
+                pipe.close()
+            status = green_os.waitpid(pid, 0)[1]
+            if status or not data:
+                reason = _('template worker %(pid)d failed with status '
+                           '%(status)d') % {'pid': pid, 'status': status}
+                results.extend([path, None, None, False, reason]
+                               for path, params in chunk)
+                continue
+            results.extend(json.loads(data.decode('utf-8')))
+        return results
@@ -0,0 +1,51 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+from eventlet import queue
+
+
+def run_many(func, nodes, concurrency, *args):
+    """Call func for each node in green threads.
+
+    Helper of the bulk plugin methods.
+
+    :param func: the per node method, called as func(node, *args).
+    :param nodes: an iterable of nodes, consumed as green threads are free.
+    :param concurrency: maximum number of calls running at the same time.
+    :returns: an iterator of (node, result) tuples in completion order, the
+              result is the exception raised by func if it failed.
+    """
+    results = queue.LightQueue()
+    pool = eventlet.GreenPool(concurrency)
+
+    def _run(node):
+        try:
+            result = func(node, *args)
+        except Exception as e:
+            result = e
+        results.put((node, result))
+
+    def _feed():
+        try:
+            for node in nodes:
+                pool.spawn_n(_run, node)
+            pool.waitall()
+        finally:
+            results.put(None)
+
+    eventlet.spawn_n(_feed)
+    while True:
+        item = results.get()
+        if item is None:
+            return
+        yield item